@@ -3,6 +3,10 @@ ASGI config for ai_career project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Chat async (``/api/ai/chat/message/async/``) chỉ thực sự không chặn worker khi
+chạy qua ASGI, ví dụ: ``uvicorn ai_career.asgi:application --workers 2``.
+Các view DRF (sync) vẫn chạy bình thường trong threadpool của ASGI.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -188,11 +188,144 @@ EMAIL_HOST_USER = config('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD')
 
 # Cache Configuration (for OTP storage)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Có REDIS_URL (vd. redis://localhost:6379/0) thì dùng Redis để cache (và các version/invalidation)
+# được chia sẻ giữa các worker. Chạy nhiều worker (gunicorn/uvicorn) mà không có REDIS_URL:
+# LocMem riêng từng process -> config prompt, context hồ sơ, danh sách Industry... chỉ cache
+# ngắn hạn (các setting *_LOCAL_TTL, xem utils.cache.is_shared_cache).
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
     }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+        }
+    }
+
+# AI / Embedding
+AI_EMBEDDING_CACHE_ENABLED = config('AI_EMBEDDING_CACHE_ENABLED', default=True, cast=bool)
+# Cache hit chỉ cập nhật last_used_at / touch_count nếu lần chạm trước cũ hơn N giây
+# (số hit / miss thật đếm trong từng process, xem embedding_cache.get_cache_stats)
+AI_EMBEDDING_CACHE_TOUCH_INTERVAL = config('AI_EMBEDDING_CACHE_TOUCH_INTERVAL', default=86400, cast=int)
+AI_QUERY_EMBEDDING_CACHE_SIZE = config('AI_QUERY_EMBEDDING_CACHE_SIZE', default=1024, cast=int)
+AI_QUERY_EMBEDDING_CACHE_TTL = config('AI_QUERY_EMBEDDING_CACHE_TTL', default=3600, cast=int)  # giây
+# Số thread chạy query lấy context (hồ sơ, lịch sử, RAG) song song trong luồng chat async (ASGI)
+AI_ASYNC_CONTEXT_WORKERS = config('AI_ASYNC_CONTEXT_WORKERS', default=8, cast=int)
+# Context hồ sơ trong prompt chat (theo version hồ sơ). 0 -> tắt.
+# Không có cache dùng chung (REDIS_URL): chỉ giữ AI_PROFILE_CONTEXT_LOCAL_TTL giây trong mỗi worker
+AI_PROFILE_CONTEXT_CACHE_TTL = config('AI_PROFILE_CONTEXT_CACHE_TTL', default=86400, cast=int)  # giây
+AI_PROFILE_CONTEXT_LOCAL_TTL = config('AI_PROFILE_CONTEXT_LOCAL_TTL', default=30, cast=int)  # giây
+# AIPromptConfig active giữ trong process; không có REDIS_URL thì worker khác thấy config mới sau tối đa N giây
+AI_PROMPT_CONFIG_LOCAL_TTL = config('AI_PROMPT_CONFIG_LOCAL_TTL', default=30, cast=int)  # giây
+
+# Cache câu trả lời chat theo độ giống câu hỏi (chỉ lượt đầu của session, cùng config prompt
+# + cùng nhóm hồ sơ: MBTI, Holland, trình độ, công việc, tập kỹ năng). Tắt mặc định.
+AI_SEMANTIC_CACHE_ENABLED = config('AI_SEMANTIC_CACHE_ENABLED', default=False, cast=bool)
+AI_SEMANTIC_CACHE_THRESHOLD = config('AI_SEMANTIC_CACHE_THRESHOLD', default=0.95, cast=float)  # cosine similarity
+AI_SEMANTIC_CACHE_TTL = config('AI_SEMANTIC_CACHE_TTL', default=86400, cast=int)  # giây
+
+# Gợi ý lĩnh vực được cache theo (MBTI, Holland, danh sách Industry).
+# True -> bio cũng được gửi cho AI và nằm trong key cache (tỉ lệ trúng cache thấp hơn).
+AI_INDUSTRY_SUGGESTION_USE_BIO = config('AI_INDUSTRY_SUGGESTION_USE_BIO', default=False, cast=bool)
+# Không có cache dùng chung (REDIS_URL): danh sách Industry chỉ được giữ N giây trong mỗi worker
+AI_INDUSTRY_CATALOG_LOCAL_TTL = config('AI_INDUSTRY_CATALOG_LOCAL_TTL', default=60, cast=int)
+
+# Template lộ trình học (theo career + trình độ) được sinh lại sau N ngày. 0 -> không hết hạn
+AI_LEARNING_PATH_TEMPLATE_TTL_DAYS = config('AI_LEARNING_PATH_TEMPLATE_TTL_DAYS', default=30, cast=int)
+
+# Số career lưu sẵn cho mỗi (user, industry) trong bảng career_matches
+AI_CAREER_MATCH_TOP_N = config('AI_CAREER_MATCH_TOP_N', default=50, cast=int)
+
+# Lịch sử chat trong prompt = tóm tắt phần cũ + K tin nhắn gần nhất, trong giới hạn token.
+# Tóm tắt được cập nhật (chạy nền) khi có thêm N tin nhắn rơi ra ngoài K tin gần nhất.
+AI_CHAT_RECENT_MESSAGES = config('AI_CHAT_RECENT_MESSAGES', default=6, cast=int)
+AI_CHAT_SUMMARY_EVERY = config('AI_CHAT_SUMMARY_EVERY', default=6, cast=int)
+AI_CHAT_HISTORY_TOKEN_BUDGET = config('AI_CHAT_HISTORY_TOKEN_BUDGET', default=1500, cast=int)
+
+# Ngân sách token cho toàn bộ prompt chat và cho từng phần: (budget, độ ưu tiên).
+# Vượt tổng -> phần có độ ưu tiên thấp bị cắt / bỏ bớt trước.
+AI_PROMPT_TOKEN_BUDGET = config('AI_PROMPT_TOKEN_BUDGET', default=5000, cast=int)
+AI_PROMPT_SECTIONS = {
+    'question': (config('AI_PROMPT_BUDGET_QUESTION', default=1000, cast=int), 100),
+    'role': (config('AI_PROMPT_BUDGET_ROLE', default=400, cast=int), 90),
+    'profile': (config('AI_PROMPT_BUDGET_PROFILE', default=600, cast=int), 70),
+    # Tóm tắt cuộn của hội thoại cũ (gọn nhất) được giữ lâu hơn các tin nhắn nguyên văn
+    'summary': (config('AI_PROMPT_BUDGET_SUMMARY', default=400, cast=int), 60),
+    'history': (AI_CHAT_HISTORY_TOKEN_BUDGET, 50),
+    'rag': (config('AI_PROMPT_BUDGET_RAG', default=1500, cast=int), 40),
+}
+
+# Backend AI: 'gemini' (cần GEMINI_API_KEY) | 'local' (offline, embedding hash + câu trả lời mẫu,
+# kết quả cố định theo input - dùng cho load test / dev). Độ trễ giả lập của local tính bằng ms.
+AI_PROVIDER = config('AI_PROVIDER', default='gemini')
+GEMINI_API_KEY = config('GEMINI_API_KEY', default='')
+AI_LOCAL_LATENCY_MS = config('AI_LOCAL_LATENCY_MS', default=800, cast=int)
+AI_LOCAL_EMBEDDING_LATENCY_MS = config('AI_LOCAL_EMBEDDING_LATENCY_MS', default=50, cast=int)
+
+# Số chiều embedding (text-embedding-004: tối đa 768, cắt được kiểu Matryoshka, vd. 256).
+# Migration luôn tạo cột 768 chiều; khác 768 (hoặc đổi giá trị) -> chạy `manage.py resize_embeddings`
+# sau `migrate` để đổi kiểu mọi cột vector: giảm chiều thì cắt vector cũ tại chỗ (giống kết quả API
+# với output_dimensionality nhỏ hơn), tăng chiều thì cột về NULL và được embed lại qua outbox.
+AI_EMBEDDING_DIMENSIONS = config('AI_EMBEDDING_DIMENSIONS', default=768, cast=int)
+
+# pgvector HNSW (cosine). Migration luôn tạo index với m=16, ef_construction=64;
+# AI_HNSW_M / AI_HNSW_EF_CONSTRUCTION là giá trị mặc định của `manage.py vector_indexes --rebuild`.
+# ef_search đặt cho từng query (SET LOCAL) trong các hàm search vector.
+AI_HNSW_M = config('AI_HNSW_M', default=16, cast=int)
+AI_HNSW_EF_CONSTRUCTION = config('AI_HNSW_EF_CONSTRUCTION', default=64, cast=int)
+AI_HNSW_EF_SEARCH = config('AI_HNSW_EF_SEARCH', default=40, cast=int)
+# Query có filter (scope, content_type, user...) quét tiếp index khi chưa đủ kết quả.
+# 'relaxed_order' | 'strict_order' | '' (tắt); tự bỏ qua nếu pgvector < 0.8.
+AI_HNSW_ITERATIVE_SCAN = config('AI_HNSW_ITERATIVE_SCAN', default='relaxed_order')
+
+# 'exact': index HNSW trên vector đầy đủ. 'halfvec' / 'binary': tìm thô trên index gọn
+# (halfvec: pgvector >= 0.7) rồi tính lại cosine chính xác cho top_k * AI_VECTOR_RESCORE_FACTOR ứng viên.
+# Index gọn là opt-in: `manage.py vector_compact_indexes` (chỉ KnowledgeBase);
+# so sánh recall / latency / dung lượng: `manage.py vector_compact_report`
+AI_VECTOR_SEARCH_MODE = config('AI_VECTOR_SEARCH_MODE', default='exact')
+AI_VECTOR_RESCORE_FACTOR = config('AI_VECTOR_RESCORE_FACTOR', default=4, cast=int)
+
+# Index NumPy trong process cho KnowledgeBase public (tắt -> luôn dùng pgvector).
+# Cần cache dùng chung (REDIS_URL) để các worker thấy version mới; không có thì bị bỏ qua.
+AI_INMEMORY_VECTOR_INDEX = config('AI_INMEMORY_VECTOR_INDEX', default=False, cast=bool)
+# Worker lệch tối đa N dòng so với version mới nhất -> chỉ đọc lại N dòng đó; lệch nhiều hơn
+# (re-embed hàng loạt...) -> nạp lại toàn bộ. 0 = luôn nạp lại toàn bộ.
+AI_INMEMORY_VECTOR_INDEX_INCREMENTAL_MAX = config('AI_INMEMORY_VECTOR_INDEX_INCREMENTAL_MAX', default=500, cast=int)
+
+# RAG: hybrid = full-text (tsvector + GIN) + vector, gộp bằng reciprocal-rank fusion.
+# Embedding query quá AI_RAG_EMBEDDING_TIMEOUT giây hoặc lỗi -> chỉ dùng full-text,
+# bỏ qua embedding trong AI_RAG_EMBEDDING_COOLDOWN giây tiếp theo.
+AI_RAG_HYBRID = config('AI_RAG_HYBRID', default=True, cast=bool)
+AI_RAG_MAX_DISTANCE = config('AI_RAG_MAX_DISTANCE', default=0.6, cast=float)
+AI_RAG_EMBEDDING_TIMEOUT = config('AI_RAG_EMBEDDING_TIMEOUT', default=1.5, cast=float)
+AI_RAG_EMBEDDING_COOLDOWN = config('AI_RAG_EMBEDDING_COOLDOWN', default=30, cast=int)
+
+# Chia tài liệu KnowledgeBase dài thành các đoạn chồng lấn (ước lượng ~4 ký tự / token)
+AI_KB_CHUNK_TOKENS = config('AI_KB_CHUNK_TOKENS', default=200, cast=int)
+AI_KB_CHUNK_OVERLAP_TOKENS = config('AI_KB_CHUNK_OVERLAP_TOKENS', default=40, cast=int)
+
+# Outbox embedding: False (mặc định) -> embed ngay sau khi transaction commit, không cần worker.
+# True -> signal chỉ ghi job; BẮT BUỘC chạy thêm process `manage.py embedding_worker`,
+# không có worker thì không có gì được embed.
+AI_EMBEDDING_OUTBOX = config('AI_EMBEDDING_OUTBOX', default=False, cast=bool)
+AI_EMBEDDING_OUTBOX_MAX_ATTEMPTS = config('AI_EMBEDDING_OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # Log số token từng phần của prompt (apps.ai.services.token_budget)
+        'apps.ai': {'handlers': ['console'], 'level': config('AI_LOG_LEVEL', default='INFO')},
+    },
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
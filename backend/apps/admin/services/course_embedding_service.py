@@ -0,0 +1,70 @@
+import time
+
+from apps.ai.models import ContentType
+from apps.ai.services.ai_service import get_embeddings, EMBEDDING_BATCH_SIZE
+from apps.ai.services.kb_passages import KBDocument, sync_documents
+from apps.ai.signals import course_document_parts
+from apps.career.models import Course
+
+
+def check_embedding_status():
+    """Thống kê số course đã / chưa có embedding"""
+    total = Course.objects.count()
+    with_embedding = Course.objects.filter(embedding__isnull=False).count()
+    return {
+        "total": total,
+        "with_embedding": with_embedding,
+        "without_embedding": total - with_embedding,
+    }
+
+
+def embed_courses_batch(batch_size=50, delay=5, re_embed=False):
+    """
+    Embed courses theo batch: mỗi batch chỉ tốn 1 request embedding.
+    `delay` (giây) là thời gian nghỉ giữa các batch để không vượt quota.
+    """
+    batch_size = max(1, min(int(batch_size), EMBEDDING_BATCH_SIZE))
+    delay = max(0, float(delay))
+
+    queryset = Course.objects.all().order_by('id')
+    if not re_embed:
+        queryset = queryset.filter(embedding__isnull=True)
+    course_ids = list(queryset.values_list('id', flat=True))
+
+    done, failed = 0, 0
+    for start in range(0, len(course_ids), batch_size):
+        if start and delay:
+            time.sleep(delay)
+
+        courses = list(Course.objects.filter(id__in=course_ids[start:start + batch_size]))
+        parts = [course_document_parts(course) for course in courses]
+        texts = [f"{header} {body}" for header, body, _ in parts]
+        vectors = get_embeddings(texts, task_type="retrieval_document")
+
+        updated, documents = [], []
+        for course, (header, body, meta), text, vector in zip(courses, parts, texts, vectors):
+            if not vector:
+                failed += 1
+                continue
+            course.embedding = vector
+            updated.append(course)
+            documents.append(KBDocument(
+                ContentType.COURSE, course.id, header, body, meta, full_text=text, full_vector=vector
+            ))
+
+        # Course dài được chia đoạn -> các đoạn embed chung batch
+        for document, error in zip(documents, sync_documents(documents)):
+            if error:
+                print(f"Embedding course #{document.reference_id}: {error}")
+
+        # bulk_update không bắn post_save -> không embed lại qua signal
+        Course.objects.bulk_update(updated, ['embedding'])
+        done += len(updated)
+        print(f"Embedding courses: {done}/{len(course_ids)} OK, {failed} lỗi")
+
+    return {"embedded": done, "failed": failed}
+
+
+def fix_missing_embeddings(batch_size=50, delay=5):
+    """Chỉ embed những course chưa có vector"""
+    return embed_courses_batch(batch_size, delay, re_embed=False)
@@ -14,6 +14,12 @@ from apps.users.models import User
 from apps.users.serializers import UserSerializer
 from apps.career.models import Career, Industry, Course
 from apps.career.serializers import IndustrySerializer, CareerSerializer, CourseSerializer
+from apps.admin.services.course_embedding_service import (
+    check_embedding_status,
+    embed_courses_batch,
+    fix_missing_embeddings,
+)
+from utils.background import run_in_background
 
 # ============================================================
 # USER MANAGEMENT
@@ -40,7 +46,7 @@ def get_users(request):
 def course_list_create(request):
     try:
         if request.method == 'GET':
-            courses = Course.objects.all().order_by('-created_at')
+            courses = Course.objects.defer('embedding').order_by('-created_at')
             serializer = CourseSerializer(courses, many=True)
             return Response({
                 "message": "Lấy danh sách thành công",
@@ -201,7 +207,7 @@ def career_list_create(request):
 
     try:
         if request.method == 'GET':
-            careers = Career.objects.all()
+            careers = Career.objects.defer('embedding')
 
             serializer = CareerSerializer(careers, many=True)
             
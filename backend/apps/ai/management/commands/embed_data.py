@@ -1,11 +1,13 @@
 from django.core.management.base import BaseCommand
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.db.models import Q
 
 # Import Models
 from apps.ai.models import KnowledgeBase, ContentType
 from apps.career.models import Career, Industry, Course
-from apps.ai.services.ai_service import get_embedding
+from apps.ai.services.ai_service import get_embeddings
+from apps.ai.services.kb_passages import KBDocument, sync_documents
 
 # Cố gắng import User related models
 try:
@@ -45,15 +47,16 @@ class Command(BaseCommand):
     def process_industries(self):
         self.stdout.write("-> 1. Đang xử lý Industries...")
         industries = Industry.objects.all()
-        for ind in industries:
-            text = f"Ngành nghề: {ind.name}. Mô tả: {ind.description}"
-            # Industry thường ít khi search trực tiếp trong RAG, nhưng lưu vào cũng tốt
-            self.save_to_knowledge_base(
-                ref_id=ind.id,
-                type_enum=ContentType.GENERAL_ADVICE, # Hoặc tạo type mới nếu muốn
-                text=text,
-                metadata={"title": ind.name, "type": "industry"}
-            )
+        # Industry thường ít khi search trực tiếp trong RAG, nhưng lưu vào cũng tốt
+        self.save_many_to_knowledge_base([
+            {
+                "id": ind.id,
+                "type": ContentType.GENERAL_ADVICE, # Hoặc tạo type mới nếu muốn
+                "text": f"Ngành nghề: {ind.name}. Mô tả: {ind.description}",
+                "meta": {"title": ind.name, "type": "industry"}
+            }
+            for ind in industries
+        ])
 
     # ---------------------------------------------------------
     # 2. PROCESS SKILLS (Cập nhật vector cho bảng UserSkill)
@@ -67,112 +70,142 @@ class Command(BaseCommand):
         count = skills.count()
         self.stdout.write(f"   Tìm thấy {count} skill chưa có vector.")
 
-        for skill in skills:
-            # Embed tên skill + level
-            text = f"{skill.skill_name} level {skill.proficiency_level}"
-            vector = get_embedding(text)
+        # Embed tên skill + level theo batch (1 request / tối đa 100 skill)
+        skills = list(skills)
+        vectors = get_embeddings(
+            [f"{skill.skill_name} level {skill.proficiency_level}" for skill in skills],
+            task_type="retrieval_query"
+        )
+
+        updated = []
+        for skill, vector in zip(skills, vectors):
             if vector:
                 skill.embedding = vector
-                skill.save()
-                # Lưu ý: UserSkill thường KHÔNG lưu vào KnowledgeBase chung 
-                # vì nó quá vụn vặt, ta chỉ lưu vector vào chính bảng UserSkill để matching.
+                updated.append(skill)
+            else:
+                self.stdout.write(self.style.ERROR(f"   - [FAIL] Skill {skill.skill_name}"))
+
+        # bulk_update không bắn post_save -> tránh signal embed lại lần nữa
+        # Lưu ý: UserSkill thường KHÔNG lưu vào KnowledgeBase chung
+        # vì nó quá vụn vặt, ta chỉ lưu vector vào chính bảng UserSkill để matching.
+        UserSkill.objects.bulk_update(updated, ['embedding'], batch_size=500)
 
     # ---------------------------------------------------------
     # 3. PROCESS CAREERS
     # ---------------------------------------------------------
     def process_careers(self):
         self.stdout.write("-> 3. Đang xử lý Careers...")
-        careers = Career.objects.all()
-        for career in careers:
-            # Tạo nội dung text đại diện
-            text_content = (
+        careers = list(Career.objects.all())
+        # Tạo nội dung text đại diện: header (ngắn, gắn vào mọi đoạn) + body (có thể dài, được chia đoạn)
+        parts = [
+            (
                 f"Nghề nghiệp: {career.title}\n"
                 f"Cấp độ: {career.level}\n"
+                f"Mức lương: {career.salary_min} - {career.salary_max}\n",
                 f"Mô tả: {career.description}\n"
-                f"Mức lương: {career.salary_min} - {career.salary_max}\n"
                 f"Triển vọng: {career.future_outlook}"
             )
-            
-            # Lấy vector
-            vector = get_embedding(text_content, task_type="retrieval_document")
-            
-            if vector:
-                # A. Cập nhật vào chính bảng Career (cho Matching)
-                career.embedding = vector
-                career.save()
-
-                # B. Cập nhật vào KnowledgeBase (cho Chatbot RAG)
-                self.save_to_knowledge_base_with_vector(
-                    ref_id=career.id,
-                    type_enum=ContentType.CAREER,
-                    text=text_content,
-                    vector=vector,
-                    metadata={
-                        "title": career.title,
-                        "salary_min": float(career.salary_min) if career.salary_min else 0,
-                        "type": "career"
-                    }
-                )
+            for career in careers
+        ]
+        texts = [header + body for header, body in parts]
+
+        # Lấy vector theo batch
+        vectors = get_embeddings(texts, task_type="retrieval_document")
+
+        updated, documents = [], []
+        for career, (header, body), text_content, vector in zip(careers, parts, texts, vectors):
+            if not vector:
+                self.stdout.write(self.style.ERROR(f"   - [FAIL] career: {career.title}"))
+                continue
+
+            # A. Cập nhật vào chính bảng Career (cho Matching)
+            career.embedding = vector
+            updated.append(career)
+
+            # B. Các đoạn của tài liệu -> KnowledgeBase (cho Chatbot RAG)
+            documents.append(KBDocument(
+                ContentType.CAREER, career.id, header, body,
+                metadata={
+                    "title": career.title,
+                    "salary_min": float(career.salary_min) if career.salary_min else 0,
+                    "type": "career"
+                },
+                full_text=text_content, full_vector=vector
+            ))
+
+        self.save_documents(documents)
+
+        # bulk_update không bắn post_save (sync_career) -> không embed lại lần 2
+        Career.objects.bulk_update(updated, ['embedding'], batch_size=500)
 
     # ---------------------------------------------------------
     # 4. PROCESS COURSES
     # ---------------------------------------------------------
     def process_courses(self):
         self.stdout.write("-> 4. Đang xử lý Courses...")
-        courses = Course.objects.all()
-        for course in courses:
-            text_content = (
+        courses = list(Course.objects.all())
+        parts = [
+            (
                 f"Khóa học: {course.title}\n"
                 f"Nguồn: {course.provider}\n"
-                f"Mô tả: {course.description}\n"
                 f"Trình độ: {course.level}\n"
-                f"Thời lượng: {course.duration_hours} giờ"
+                f"Thời lượng: {course.duration_hours} giờ\n",
+                f"Mô tả: {course.description}"
             )
+            for course in courses
+        ]
+        texts = [header + body for header, body in parts]
 
-            vector = get_embedding(text_content, task_type="retrieval_document")
+        vectors = get_embeddings(texts, task_type="retrieval_document")
 
-            if vector:
-                # A. Update Model Course
-                course.embedding = vector
-                course.save()
-
-                # B. Update KnowledgeBase
-                self.save_to_knowledge_base_with_vector(
-                    ref_id=course.id,
-                    type_enum=ContentType.COURSE,
-                    text=text_content,
-                    vector=vector,
-                    metadata={
-                        "title": course.title,
-                        "provider": course.provider,
-                        "url": course.url,
-                        "type": "course"
-                    }
-                )
+        updated, documents = [], []
+        for course, (header, body), text_content, vector in zip(courses, parts, texts, vectors):
+            if not vector:
+                self.stdout.write(self.style.ERROR(f"   - [FAIL] course: {course.title}"))
+                continue
+
+            # A. Update Model Course
+            course.embedding = vector
+            updated.append(course)
+
+            # B. Update KnowledgeBase (chia đoạn nếu mô tả dài)
+            documents.append(KBDocument(
+                ContentType.COURSE, course.id, header, body,
+                metadata={
+                    "title": course.title,
+                    "provider": course.provider,
+                    "url": course.url,
+                    "type": "course"
+                },
+                full_text=text_content, full_vector=vector
+            ))
+
+        self.save_documents(documents)
+
+        Course.objects.bulk_update(updated, ['embedding'], batch_size=500)
 
     # ---------------------------------------------------------
     # 5. PROCESS USERS (Quan trọng: Bảo mật)
     # ---------------------------------------------------------
     def process_users(self):
         self.stdout.write("-> 5. Đang xử lý User Profiles...")
-        users = User.objects.filter(is_active=True)
-        
+        users = User.objects.filter(is_active=True).select_related('profile').prefetch_related('skills', 'interests')
+
+        # 1. Gom dữ liệu của tất cả user trước, sau đó embed 1 lần theo batch
+        entries = []
         for user in users:
             try:
                 profile = getattr(user, 'profile', None)
                 if not profile: continue
 
-                # 1. Gom dữ liệu
                 job = profile.current_job_title or "Chưa có việc làm"
                 edu = profile.education_level or "Chưa cập nhật"
-                
+
                 # Lấy Skills
-                skills_qs = getattr(user, 'skills', [])
-                skills_str = ", ".join([f"{s.skill_name} (Lv{s.proficiency_level})" for s in skills_qs.all()]) if skills_qs else ""
-                
+                skills_str = ", ".join([f"{s.skill_name} (Lv{s.proficiency_level})" for s in user.skills.all()])
+
                 # Lấy Interests
-                interests_qs = getattr(user, 'interests', [])
-                inter_str = ", ".join([i.keyword for i in interests_qs.all()]) if interests_qs else ""
+                inter_str = ", ".join([i.keyword for i in user.interests.all()])
 
                 full_text = (
                     f"Hồ sơ người dùng {user.full_name}:\n"
@@ -180,30 +213,38 @@ class Command(BaseCommand):
                     f"- Kỹ năng: {skills_str}.\n"
                     f"- Sở thích: {inter_str}."
                 )
+                entries.append((user, profile, full_text))
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Lỗi user {user.email}: {e}"))
 
-                # 2. Tạo vector
-                vector = get_embedding(full_text, task_type="retrieval_document")
-
-                if vector:
-                    # A. Update UserProfile
-                    UserProfile.objects.filter(id=profile.id).update(profile_vector=vector)
-
-                    # B. Update KnowledgeBase (Loại USER_CONTEXT)
-                    # QUAN TRỌNG: Metadata phải có user_id
-                    self.save_to_knowledge_base_with_vector(
-                        ref_id=user.id,
-                        type_enum=ContentType.USER_CONTEXT, # Đảm bảo model đã có enum này
-                        text=full_text,
-                        vector=vector,
-                        metadata={
-                            "user_id": str(user.id),  # Key bảo mật
-                            "type": "private_profile",
-                            "name": user.full_name
-                        }
-                    )
+        # 2. Tạo vector
+        vectors = get_embeddings([text for _, _, text in entries], task_type="retrieval_document")
+
+        documents = []
+        for (user, profile, full_text), vector in zip(entries, vectors):
+            if not vector:
+                self.stdout.write(self.style.ERROR(f"Lỗi user {user.email}: không tạo được vector"))
+                continue
+            try:
+                # A. Update UserProfile
+                UserProfile.objects.filter(id=profile.id).update(profile_vector=vector, vector_updated_at=timezone.now())
+
+                # B. Update KnowledgeBase (Loại USER_CONTEXT)
+                # QUAN TRỌNG: Metadata phải có user_id
+                documents.append(KBDocument(
+                    ContentType.USER_CONTEXT, user.id, "", full_text,
+                    metadata={
+                        "user_id": str(user.id),  # Key bảo mật
+                        "type": "private_profile",
+                        "name": user.full_name
+                    },
+                    full_text=full_text, full_vector=vector
+                ))
             except Exception as e:
                 self.stdout.write(self.style.ERROR(f"Lỗi user {user.email}: {e}"))
 
+        self.save_documents(documents)
+
     # ---------------------------------------------------------
     # 6. STATIC DATA
     # ---------------------------------------------------------
@@ -225,41 +266,27 @@ class Command(BaseCommand):
              # Thêm các prompt hệ thống vào vector DB để AI hiểu luật chơi cũng là 1 ý hay
         ]
 
-        for item in static_data:
-            self.save_to_knowledge_base(
-                ref_id=item["id"],
-                type_enum=item["type"],
-                text=item["text"],
-                metadata=item["meta"]
-            )
+        self.save_many_to_knowledge_base(static_data)
 
     # ---------------------------------------------------------
     # UTILS: SAVE FUNCTION
     # ---------------------------------------------------------
-    def save_to_knowledge_base(self, ref_id, type_enum, text, metadata):
-        """Hàm này tự gọi API embedding rồi lưu"""
-        text = text.replace("\n", " ").strip()
-        if not text: return
-
-        # Kiểm tra trùng lặp cơ bản (Nếu muốn update đè thì bỏ check này)
-        # if KnowledgeBase.objects.filter(reference_id=str(ref_id), content_type=type_enum).exists():
-        #     return
-
-        vector = get_embedding(text, task_type="retrieval_document")
-        if vector:
-            self.save_to_knowledge_base_with_vector(ref_id, type_enum, text, vector, metadata)
-
-    def save_to_knowledge_base_with_vector(self, ref_id, type_enum, text, vector, metadata):
-        """Hàm này lưu khi đã có sẵn vector (để tránh gọi API 2 lần)"""
-        KnowledgeBase.objects.update_or_create(
-            content_type=type_enum,
-            reference_id=str(ref_id),
-            defaults={
-                'content_text': text,
-                'embedding': vector,
-                'metadata': metadata
-            }
-        )
-        # In ra log gọn hơn
-        title = metadata.get('title') or metadata.get('name') or str(ref_id)
-        self.stdout.write(f"   + [OK] {type_enum}: {title}")
\ No newline at end of file
+    def save_many_to_knowledge_base(self, items):
+        """Chia đoạn + embed cả danh sách item theo batch rồi lưu (item: id, type, text, meta)"""
+        self.save_documents([
+            KBDocument(item["type"], item["id"], "", item["text"], item["meta"])
+            for item in items
+        ])
+
+    def save_documents(self, documents):
+        """Embed các đoạn chưa có vector theo batch (dùng lại vector cả tài liệu nếu chỉ có 1 đoạn) rồi lưu"""
+        documents = [doc for doc in documents if doc.passages]
+        if not documents: return
+
+        for doc, error in zip(documents, sync_documents(documents)):
+            # In ra log gọn hơn
+            title = doc.metadata.get('title') or doc.metadata.get('name') or doc.reference_id
+            if error:
+                self.stdout.write(self.style.ERROR(f"   - [FAIL] {doc.content_type}: {title} ({error})"))
+            else:
+                self.stdout.write(f"   + [OK] {doc.content_type}: {title} ({len(doc.passages)} đoạn)")
@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.ai.services.embedding_outbox import drain_outbox, requeue_stuck_jobs
+
+
+class Command(BaseCommand):
+    help = 'Worker xử lý hàng đợi EmbeddingOutbox: embed theo batch, retry khi lỗi'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Số job mỗi lượt (mặc định 100)')
+        parser.add_argument('--interval', type=float, default=2.0, help='Số giây nghỉ khi hàng đợi trống')
+        parser.add_argument('--max-attempts', type=int, default=settings.AI_EMBEDDING_OUTBOX_MAX_ATTEMPTS,
+                            help='Số lần thử tối đa trước khi đánh dấu FAILED')
+        parser.add_argument('--once', action='store_true', help='Xử lý đến khi hết job rồi thoát')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        self.stdout.write(self.style.WARNING(f"=== EMBEDDING WORKER (batch {batch_size}) ==="))
+
+        requeued = requeue_stuck_jobs()
+        if requeued:
+            self.stdout.write(f"-> Đưa {requeued} job bị kẹt về hàng đợi")
+
+        try:
+            while True:
+                close_old_connections()
+                claimed, stats = drain_outbox(batch_size, options['max_attempts'])
+
+                if claimed:
+                    self.stdout.write(
+                        f"   + {claimed} job: {stats['done']} xong, {stats['retry']} thử lại, {stats['failed']} lỗi"
+                    )
+                    continue
+
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS("=== DỪNG WORKER ==="))
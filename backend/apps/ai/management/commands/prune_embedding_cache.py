@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from apps.ai.services.embedding_cache import prune_embedding_cache, get_cache_stats
+from apps.ai.services.response_cache import prune_response_cache
+
+
+class Command(BaseCommand):
+    help = 'Xóa các embedding trong cache không được dùng trong N ngày gần nhất (và câu trả lời chat đã hết hạn)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Số ngày không được đọc (mặc định 30)')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days < 1:
+            self.stdout.write(self.style.ERROR("--days phải >= 1"))
+            return
+
+        deleted = prune_embedding_cache(days)
+        stats = get_cache_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã xóa {deleted} embedding không dùng trong {days} ngày. Còn lại {stats['entries']} entry."
+        ))
+
+        deleted = prune_response_cache()
+        self.stdout.write(self.style.SUCCESS(f"Đã xóa {deleted} câu trả lời chat hết hạn trong cache."))
@@ -0,0 +1,64 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.ai.services.embedding_outbox import enqueue_missing_embeddings
+from apps.ai.services.vector_index import bump_index_version
+from apps.ai.services.vector_resize import VECTOR_COLUMNS, compact_index_names, existing_indexes, resize_vector_column
+
+
+class Command(BaseCommand):
+    help = 'Đổi mọi cột vector về AI_EMBEDDING_DIMENSIONS (giảm: cắt vector cũ, tăng: NULL rồi embed lại qua outbox)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dimensions', type=int, default=None,
+                            help=f'Mặc định settings.AI_EMBEDDING_DIMENSIONS ({settings.AI_EMBEDDING_DIMENSIONS})')
+
+    def handle(self, *args, **options):
+        dimensions = options['dimensions'] or settings.AI_EMBEDDING_DIMENSIONS
+        if dimensions != settings.AI_EMBEDDING_DIMENSIONS:
+            self.stdout.write(self.style.WARNING(
+                f"--dimensions {dimensions} khác AI_EMBEDDING_DIMENSIONS ({settings.AI_EMBEDDING_DIMENSIONS}): "
+                f"nhớ đổi cả setting trước khi chạy app"
+            ))
+
+        with connection.schema_editor() as schema_editor:
+            had_compact = bool(existing_indexes(schema_editor, compact_index_names()))
+
+        needs_reembed = False
+        resized = False
+        for app_label, model_name, field_name in VECTOR_COLUMNS:
+            model = apps.get_model(app_label, model_name)
+            with connection.schema_editor() as schema_editor:
+                changed = resize_vector_column(schema_editor, model, field_name, dimensions)
+
+            label = f"{model._meta.db_table}.{field_name}"
+            if changed is None:
+                self.stdout.write(f"  {label}: giữ nguyên")
+                continue
+            old, new = changed
+            resized = True
+            if new < old:
+                self.stdout.write(self.style.SUCCESS(f"  {label}: {old} -> {new} chiều (cắt vector cũ)"))
+            else:
+                needs_reembed = True
+                self.stdout.write(self.style.WARNING(f"  {label}: {old} -> {new} chiều (đã xóa vector cũ)"))
+
+        # Index gọn đã bị xóa khi đổi kiểu cột -> build lại theo số chiều mới (CONCURRENTLY)
+        if resized and had_compact:
+            call_command('vector_compact_indexes', dimensions=dimensions, stdout=self.stdout)
+
+        # Index NumPy trong process nạp lại theo version mới
+        bump_index_version()
+        if not needs_reembed:
+            return
+
+        # Embed lại từ dữ liệu gốc còn nguyên (content_text, mô tả nghề...); bảng cache không có handler
+        for app_label, model_name, field_name in VECTOR_COLUMNS:
+            queued = enqueue_missing_embeddings(apps.get_model(app_label, model_name), field_name)
+            if queued:
+                self.stdout.write(f"  {app_label}.{model_name}: {queued} dòng chờ embed lại")
+        if settings.AI_EMBEDDING_OUTBOX:
+            self.stdout.write(self.style.WARNING("Chạy `manage.py embedding_worker` để embed lại dữ liệu."))
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.ai.models import KnowledgeBase
+from apps.ai.services.vector_resize import existing_indexes
+from apps.ai.services.vector_search import knowledge_base_compact_indexes, search_mode
+
+
+class Command(BaseCommand):
+    help = ('Tạo (hoặc --drop) index HNSW gọn halfvec / binary cho KnowledgeBase, '
+            'cần khi AI_VECTOR_SEARCH_MODE = halfvec | binary')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drop', action='store_true', help='Xóa các index gọn (quay về mode exact)')
+        parser.add_argument('--dimensions', type=int, default=None,
+                            help=f'Số chiều cột embedding (mặc định AI_EMBEDDING_DIMENSIONS = {settings.AI_EMBEDDING_DIMENSIONS})')
+
+    def handle(self, *args, **options):
+        dimensions = options['dimensions'] or settings.AI_EMBEDDING_DIMENSIONS
+        indexes = knowledge_base_compact_indexes(dimensions)
+        # CONCURRENTLY: không khóa ghi KnowledgeBase trong lúc build (không chạy trong transaction)
+        with connection.schema_editor(atomic=False) as schema_editor:
+            present = existing_indexes(schema_editor, [index.name for index in indexes])
+            for index in indexes:
+                if options['drop']:
+                    if index.name not in present:
+                        continue
+                    schema_editor.execute(index.remove_sql(KnowledgeBase, schema_editor, concurrently=True))
+                    self.stdout.write(self.style.SUCCESS(f"{index.name}: đã xóa"))
+                elif index.name in present:
+                    self.stdout.write(f"{index.name}: đã có")
+                else:
+                    schema_editor.execute(index.create_sql(KnowledgeBase, schema_editor, concurrently=True))
+                    self.stdout.write(self.style.SUCCESS(f"{index.name}: đã tạo ({dimensions} chiều)"))
+
+        mode = search_mode()
+        if options['drop'] and mode != 'exact':
+            self.stdout.write(self.style.WARNING(f"AI_VECTOR_SEARCH_MODE đang là '{mode}': đổi về 'exact'"))
+        elif not options['drop'] and mode == 'exact':
+            self.stdout.write(self.style.WARNING("AI_VECTOR_SEARCH_MODE đang là 'exact': index gọn chưa được dùng"))
@@ -0,0 +1,107 @@
+import random
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.ai.models import KnowledgeBase, EmbeddingCache, ContentType
+from apps.ai.services.vector_search import SEARCH_MODES, hnsw_search, nearest, shortlist_size
+
+# content_type -> tiền tố tên index HNSW (xem KnowledgeBase.Meta.indexes)
+INDEX_PREFIXES = {
+    ContentType.CAREER: 'kb_career',
+    ContentType.COURSE: 'kb_course',
+    ContentType.GENERAL_ADVICE: 'kb_advice',
+}
+INDEX_SUFFIXES = {'exact': 'hnsw', 'halfvec': 'half_hnsw', 'binary': 'bit_hnsw'}
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+class Command(BaseCommand):
+    help = 'So sánh recall / latency / dung lượng giữa index vector đầy đủ, halfvec và binary trên KnowledgeBase'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=50, help='Số câu query thử cho mỗi loại nội dung')
+        parser.add_argument('--top-k', type=int, default=10)
+        parser.add_argument('--content-type', action='append', default=[],
+                            help='Chỉ đo loại này (career / course / general_advice, lặp lại được)')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        top_k = max(1, options['top_k'])
+        content_types = options['content_type'] or list(INDEX_PREFIXES)
+        rng = random.Random(options['seed'])
+
+        self.stdout.write(self.style.WARNING(
+            f"=== VECTOR COMPACT REPORT (top {top_k}, rescore x{settings.AI_VECTOR_RESCORE_FACTOR}) ==="
+        ))
+        queries = self.load_queries(options['queries'], rng)
+
+        for ctype in content_types:
+            rows = list(
+                KnowledgeBase.objects.filter(content_type=ctype, embedding__isnull=False)
+                .values_list('id', 'embedding')
+            )
+            if not rows:
+                self.stdout.write(self.style.ERROR(f"{ctype}: không có dữ liệu"))
+                continue
+
+            ids = [row[0] for row in rows]
+            matrix = _normalize_rows(np.asarray([row[1] for row in rows], dtype=np.float32))
+            # Không có query thật -> dùng chính vector tài liệu làm query
+            sample = queries or [rows[i][1] for i in rng.sample(range(len(rows)), min(options['queries'], len(rows)))]
+
+            # Kết quả đúng: cosine chính xác trên toàn bộ vector (NumPy)
+            k = min(top_k, len(rows))
+            truth = []
+            for query in sample:
+                scores = matrix @ _normalize_rows(np.asarray([query], dtype=np.float32))[0]
+                truth.append({ids[pos] for pos in np.argsort(-scores)[:k]})
+
+            self.stdout.write(f"\n{ctype}: {len(rows)} đoạn, {len(sample)} query")
+            for mode in SEARCH_MODES:
+                self.report_mode(ctype, mode, sample, truth, k)
+
+    def load_queries(self, count, rng):
+        """Ưu tiên embedding của câu hỏi chat thật (cache retrieval_query)."""
+        vectors = list(
+            EmbeddingCache.objects.filter(task_type='retrieval_query')
+            .order_by('-last_used_at').values_list('embedding', flat=True)[:count * 5]
+        )
+        rng.shuffle(vectors)
+        return vectors[:count]
+
+    def report_mode(self, ctype, mode, sample, truth, k):
+        index_name = f"{INDEX_PREFIXES[ctype]}_{INDEX_SUFFIXES[mode]}"
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT to_regclass(%s)", [index_name])
+            if cursor.fetchone()[0] is None:
+                self.stdout.write(self.style.ERROR(f"  {mode:<8} {index_name}: chưa tồn tại (`manage.py vector_compact_indexes`)"))
+                return
+            cursor.execute("SELECT pg_size_pretty(pg_relation_size(%s::regclass))", [index_name])
+            index_size = cursor.fetchone()[0]
+
+        latencies, recalls = [], []
+        for query, expected in zip(sample, truth):
+            started = time.perf_counter()
+            with hnsw_search(top_k=shortlist_size(k, mode)):
+                found = set(
+                    nearest(KnowledgeBase.objects.filter(content_type=ctype), 'embedding', query, k, mode)
+                    .values_list('id', flat=True)
+                )
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(len(found & expected) / len(expected))
+
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(self.style.SUCCESS(
+            f"  {mode:<8} recall@{k} {np.mean(recalls):.3f} | "
+            f"latency avg {np.mean(latencies):.1f}ms p95 {p95:.1f}ms | index {index_name} {index_size}"
+        ))
@@ -0,0 +1,70 @@
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from pgvector.django import HnswIndex
+
+
+class Command(BaseCommand):
+    help = 'Báo cáo kích thước các index vector (HNSW) và rebuild với m / ef_construction mới'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='REINDEX các index và đo thời gian build')
+        parser.add_argument('--index', action='append', default=[], help='Chỉ xử lý index có tên này (lặp lại được)')
+        parser.add_argument('--m', type=int, default=None, help=f'Mặc định settings.AI_HNSW_M ({settings.AI_HNSW_M})')
+        parser.add_argument('--ef-construction', type=int, default=None,
+                            help=f'Mặc định settings.AI_HNSW_EF_CONSTRUCTION ({settings.AI_HNSW_EF_CONSTRUCTION})')
+
+    def handle(self, *args, **options):
+        targets = [
+            (model, index)
+            for model in apps.get_models()
+            for index in model._meta.indexes
+            if isinstance(index, HnswIndex)
+            and (not options['index'] or index.name in options['index'])
+        ]
+        if not targets:
+            self.stdout.write(self.style.WARNING("Không tìm thấy index HNSW nào."))
+            return
+
+        m = options['m'] or settings.AI_HNSW_M
+        ef_construction = options['ef_construction'] or settings.AI_HNSW_EF_CONSTRUCTION
+
+        for model, index in targets:
+            table = model._meta.db_table
+            build_time = None
+
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT to_regclass(%s)", [index.name])
+                if cursor.fetchone()[0] is None:
+                    self.stdout.write(self.style.ERROR(f"{index.name}: chưa tồn tại (chạy migrate trước)"))
+                    continue
+
+                if options['rebuild']:
+                    cursor.execute(
+                        f'ALTER INDEX "{index.name}" SET (m = {int(m)}, ef_construction = {int(ef_construction)})'
+                    )
+                    started = time.perf_counter()
+                    cursor.execute(f'REINDEX INDEX "{index.name}"')
+                    build_time = time.perf_counter() - started
+
+                cursor.execute(
+                    "SELECT pg_size_pretty(pg_relation_size(%s::regclass)), "
+                    "pg_size_pretty(pg_relation_size(%s::regclass)), "
+                    "(SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass), "
+                    "(SELECT array_to_string(reloptions, ', ') FROM pg_class WHERE oid = %s::regclass)",
+                    [index.name, table, table, index.name]
+                )
+                index_size, table_size, rows, reloptions = cursor.fetchone()
+
+            # Index gọn (halfvec / binary) là expression index, không có fields
+            target = index.fields[0] if index.fields else 'expression'
+            line = (
+                f"{index.name} ({table}.{target}): index {index_size}, bảng {table_size}, "
+                f"~{rows} dòng, [{reloptions or 'mặc định'}]"
+            )
+            if build_time is not None:
+                line += f", build {build_time:.2f}s"
+            self.stdout.write(self.style.SUCCESS(line))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-18 18:55
+
+import django.utils.timezone
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0003_merge_20260104_1226'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_name', models.CharField(max_length=100)),
+                ('task_type', models.CharField(max_length=50)),
+                ('text_hash', models.CharField(help_text='sha256 của text đã chuẩn hóa', max_length=64)),
+                ('embedding', pgvector.django.vector.VectorField(dimensions=768)),
+                ('touch_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'embedding_cache',
+                'unique_together': {('model_name', 'task_type', 'text_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-18 18:56
+
+import pgvector.django.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0004_embeddingcache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='knowledgebase',
+            index=models.Index(fields=['content_type', 'reference_id'], name='kb_type_ref_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='knowledgebase',
+            index=pgvector.django.indexes.HnswIndex(condition=models.Q(('content_type', 'career')), ef_construction=64, fields=['embedding'], m=16, name='kb_career_hnsw', opclasses=['vector_cosine_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='knowledgebase',
+            index=pgvector.django.indexes.HnswIndex(condition=models.Q(('content_type', 'course')), ef_construction=64, fields=['embedding'], m=16, name='kb_course_hnsw', opclasses=['vector_cosine_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='knowledgebase',
+            index=pgvector.django.indexes.HnswIndex(condition=models.Q(('content_type', 'general_advice')), ef_construction=64, fields=['embedding'], m=16, name='kb_advice_hnsw', opclasses=['vector_cosine_ops']),
+        ),
+    ]
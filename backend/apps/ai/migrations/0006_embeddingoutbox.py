@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-18 18:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0005_knowledgebase_scoped_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(help_text='VD: career.career, users.userprofile', max_length=100)),
+                ('object_pk', models.CharField(max_length=64)),
+                ('text_hash', models.CharField(blank=True, default='', help_text='sha256 của text cần embed', max_length=64)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Thời điểm sớm nhất được xử lý (backoff khi retry)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'embedding_outbox',
+                'indexes': [models.Index(fields=['status', 'available_at'], name='outbox_status_avail_idx')],
+                'unique_together': {('model_label', 'object_pk')},
+            },
+        ),
+    ]
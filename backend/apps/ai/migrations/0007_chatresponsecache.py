@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:06
+
+import pgvector.django.indexes
+import pgvector.django.vector
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0006_embeddingoutbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatResponseCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope_key', models.CharField(db_index=True, help_text='sha256(config đang active + nhóm hồ sơ)', max_length=64)),
+                ('prompt_text', models.TextField()),
+                ('prompt_embedding', pgvector.django.vector.VectorField(dimensions=768)),
+                ('response_text', models.TextField()),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'chat_response_cache',
+                'indexes': [pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['prompt_embedding'], m=16, name='chat_resp_cache_hnsw', opclasses=['vector_cosine_ops'])],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0007_chatresponsecache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndustrySuggestionCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mbti', models.CharField(max_length=10)),
+                ('holland', models.CharField(max_length=10)),
+                ('bio_hash', models.CharField(blank=True, default='', help_text='Rỗng khi gợi ý không phụ thuộc bio', max_length=64)),
+                ('catalog_hash', models.CharField(help_text='sha256 danh sách Industry gửi cho AI', max_length=64)),
+                ('suggestions', models.JSONField(default=list)),
+                ('hit_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'industry_suggestion_cache',
+                'unique_together': {('mbti', 'holland', 'bio_hash', 'catalog_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:13
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0009_chatsession_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='knowledgebase',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('content_text', config='simple'), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='knowledgebase',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='kb_search_vector_gin'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0010_knowledgebase_search_vector'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='knowledgebase',
+            name='kb_type_ref_idx',
+        ),
+        migrations.AddField(
+            model_name='knowledgebase',
+            name='chunk_index',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='knowledgebase',
+            index=models.Index(fields=['content_type', 'reference_id', 'chunk_index'], name='kb_type_ref_chunk_idx'),
+        ),
+    ]
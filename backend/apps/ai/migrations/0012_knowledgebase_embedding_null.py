@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:22
+
+import pgvector.django.vector
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai', '0011_knowledgebase_chunk_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='knowledgebase',
+            name='embedding',
+            field=pgvector.django.vector.VectorField(blank=True, dimensions=768, null=True),
+        ),
+    ]
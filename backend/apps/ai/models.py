@@ -1,6 +1,10 @@
 from django.db import models
-from pgvector.django import VectorField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from pgvector.django import HnswIndex
 from django.conf import settings
+from django.utils import timezone
+from utils.fields import EmbeddingField
 import uuid
 
 class ContentType(models.TextChoices):
@@ -9,6 +13,9 @@ class ContentType(models.TextChoices):
     GENERAL_ADVICE = 'general_advice', 'General Advice'
     USER_CONTEXT = 'user', 'User'
 
+# Nội dung dùng chung cho mọi user (RAG chỉ tìm trong nhóm này + hồ sơ của chính user)
+PUBLIC_CONTENT_TYPES = (ContentType.CAREER, ContentType.COURSE, ContentType.GENERAL_ADVICE)
+
 # ==========================================
 # Kiến thức dùng chung (Không có trong table trong database)
 # ==========================================
@@ -16,20 +23,159 @@ class KnowledgeBase(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     content_type = models.CharField(max_length=50, choices=ContentType.choices)
     reference_id = models.CharField(max_length=100, blank=True, null=True)
+    # Tài liệu dài được chia thành nhiều đoạn (passage) cùng reference_id, đánh số từ 0
+    chunk_index = models.PositiveSmallIntegerField(default=0)
     content_text = models.TextField()
-    embedding = VectorField(dimensions=768)
+    # NULL khi chờ embed lại (vd. sau resize_embeddings tăng số chiều)
+    embedding = EmbeddingField(null=True, blank=True)
     metadata = models.JSONField(default=dict, blank=True)
+    # tsvector do Postgres tự sinh từ content_text (config 'simple': không stemming, hợp với tiếng Việt)
+    search_vector = models.GeneratedField(
+        expression=SearchVector('content_text', config='simple'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'knowledge_base'
+        indexes = [
+            # Full-text search (nhánh lexical của hybrid retrieval)
+            GinIndex(fields=['search_vector'], name='kb_search_vector_gin'),
+            # Tra cứu theo (loại, id gốc[, đoạn]): ghi lại các đoạn + context riêng của user
+            models.Index(fields=['content_type', 'reference_id', 'chunk_index'], name='kb_type_ref_chunk_idx'),
+            # Mỗi loại nội dung public có 1 partial HNSW index riêng
+            HnswIndex(
+                name='kb_career_hnsw',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_cosine_ops'],
+                condition=models.Q(content_type=ContentType.CAREER),
+            ),
+            HnswIndex(
+                name='kb_course_hnsw',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_cosine_ops'],
+                condition=models.Q(content_type=ContentType.COURSE),
+            ),
+            HnswIndex(
+                name='kb_advice_hnsw',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_cosine_ops'],
+                condition=models.Q(content_type=ContentType.GENERAL_ADVICE),
+            ),
+            # Index gọn (halfvec / binary) cho AI_VECTOR_SEARCH_MODE không nằm ở đây:
+            # opt-in bằng `manage.py vector_compact_indexes` (xem vector_search)
+        ]
 
 
     def __str__(self):
         return f"[{self.content_type}] {self.content_text[:50]}..."
     
+# ==========================================
+# Cache embedding theo nội dung (model, task_type, sha256(text))
+# ==========================================
+class EmbeddingCache(models.Model):
+    model_name = models.CharField(max_length=100)
+    task_type = models.CharField(max_length=50)
+    text_hash = models.CharField(max_length=64, help_text="sha256 của text đã chuẩn hóa")
+    embedding = EmbeddingField()
+    # Số lần "chạm" (cập nhật last_used_at, tối đa 1 lần / AI_EMBEDDING_CACHE_TOUCH_INTERVAL),
+    # không phải số lần đọc - hit/miss thật xem get_cache_stats()
+    touch_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = 'embedding_cache'
+        unique_together = ('model_name', 'task_type', 'text_hash')
+
+    def __str__(self):
+        return f"[{self.task_type}] {self.text_hash[:12]} ({self.touch_count} touches)"
+
+# ==========================================
+# Outbox embedding: signal chỉ ghi job, worker embed theo batch
+# ==========================================
+class EmbeddingJobStatus(models.TextChoices):
+    PENDING = 'pending', 'Pending'
+    PROCESSING = 'processing', 'Processing'
+    DONE = 'done', 'Done'
+    FAILED = 'failed', 'Failed'
+
+class EmbeddingOutbox(models.Model):
+    model_label = models.CharField(max_length=100, help_text="VD: career.career, users.userprofile")
+    object_pk = models.CharField(max_length=64)
+    text_hash = models.CharField(max_length=64, blank=True, default='', help_text="sha256 của text cần embed")
+    status = models.CharField(max_length=20, choices=EmbeddingJobStatus.choices, default=EmbeddingJobStatus.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    available_at = models.DateTimeField(default=timezone.now, help_text="Thời điểm sớm nhất được xử lý (backoff khi retry)")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'embedding_outbox'
+        unique_together = ('model_label', 'object_pk')
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_status_avail_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label}#{self.object_pk} [{self.status}]"
+
+# ==========================================
+# Cache câu trả lời theo ngữ nghĩa (opt-in, AI_SEMANTIC_CACHE_ENABLED)
+# ==========================================
+class ChatResponseCache(models.Model):
+    scope_key = models.CharField(max_length=64, db_index=True, help_text="sha256(config đang active + nhóm hồ sơ)")
+    prompt_text = models.TextField()
+    prompt_embedding = EmbeddingField()
+    response_text = models.TextField()
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'chat_response_cache'
+        indexes = [
+            HnswIndex(
+                name='chat_resp_cache_hnsw',
+                fields=['prompt_embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_cosine_ops']
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.prompt_text[:50]} ({self.hit_count} hits)"
+
+# ==========================================
+# Cache gợi ý lĩnh vực (suggest_industries_via_ai)
+# ==========================================
+class IndustrySuggestionCache(models.Model):
+    mbti = models.CharField(max_length=10)
+    holland = models.CharField(max_length=10)
+    bio_hash = models.CharField(max_length=64, blank=True, default='', help_text="Rỗng khi gợi ý không phụ thuộc bio")
+    catalog_hash = models.CharField(max_length=64, help_text="sha256 danh sách Industry gửi cho AI")
+    suggestions = models.JSONField(default=list)
+    hit_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'industry_suggestion_cache'
+        unique_together = ('mbti', 'holland', 'bio_hash', 'catalog_hash')
+
+    def __str__(self):
+        return f"{self.mbti}/{self.holland} ({self.hit_count} hits)"
+
 # ==========================================
 # Quản lý prompt
 # ==========================================
@@ -55,6 +201,9 @@ class AIPromptConfig(models.Model):
         if self.is_active:
             AIPromptConfig.objects.filter(is_active=True).update(is_active=False)
         super().save(*args, **kwargs)
+        # Báo các worker nạp lại config active
+        from apps.ai.services.config_cache import invalidate_active_config
+        invalidate_active_config()
 
     def __str__(self):
         return f"{self.name} ({'Active' if self.is_active else 'Inactive'})"
@@ -71,6 +220,10 @@ class ChatSession(models.Model):
     )
     title = models.CharField(max_length=255, blank=True, default="New Chat")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Tóm tắt cuộn của phần hội thoại cũ (ngoài K tin nhắn gần nhất đưa nguyên văn vào prompt)
+    summary = models.TextField(blank=True, default='')
+    summary_message_count = models.PositiveIntegerField(default=0, help_text="Số tin nhắn đầu tiên đã được tóm tắt")
+    summary_updated_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         db_table = 'chat_sessions'
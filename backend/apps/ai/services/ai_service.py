@@ -1,76 +1,239 @@
-import os, re
+import re
 import json
-import google.generativeai as genai
 from django.conf import settings
-from django.db.models import F
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Value, Window
+from django.db.models.functions import RowNumber, Trim
+from django.utils import timezone
 from pgvector.django import CosineDistance
-from apps.ai.models import KnowledgeBase, AIPromptConfig, ChatMessage
+from apps.ai.models import KnowledgeBase, ChatMessage, ContentType, PUBLIC_CONTENT_TYPES
+from apps.ai.services.vector_search import hnsw_search, nearest, shortlist_size
+from apps.ai.services.hybrid_search import (
+    lexical_search, rrf_fuse, embed_with_timeout, parent_key, best_per_parent, PASSAGE_FANOUT
+)
+from apps.ai.services.profile_context_cache import get_profile_context
+from apps.ai.services.config_cache import active_config_cache
+from apps.ai.services.model_pool import model_pool
+from apps.ai.services.llm_provider import get_provider
+from apps.ai.services.token_budget import PromptAssembler, estimate_tokens, truncate_to_tokens
+from apps.ai.services.industry_suggestion_cache import (
+    get_industry_catalog, get_cached_suggestions, store_suggestions, use_bio
+)
+from apps.ai.services import vector_index
+from apps.ai.services.embedding_cache import (
+    normalize_text, text_hash, get_cached_embeddings, store_embeddings, query_embedding_lru
+)
 from apps.career.models import Industry, Career, CareerRecommendation
-from apps.learning_paths.models import LearningPath, LearningPathItem, PathStatus
+from apps.career.services.career_match_service import get_precomputed_careers, get_match_score
+from apps.learning_paths.models import LearningPath, LearningPathItem, LearningPathTemplate, PathStatus
+from contextlib import nullcontext
 from datetime import date
-from dotenv import load_dotenv
-
-# --- SETUP ---
-load_dotenv()
-api_key = os.getenv('GEMINI_API_KEY')
-if api_key:
-    genai.configure(api_key=api_key)
 
 # ==========================================
 # 1. CORE AI HELPERS (Embedding & Gemini)
 # ==========================================
 
-def get_embedding(text, task_type="retrieval_query"):
-    if not text: return None
-    text = text.replace("\n", " ").strip()
+# Backend (Gemini / local) theo settings.AI_PROVIDER, xem llm_provider
+EMBEDDING_MODEL = get_provider().embedding_model
+EMBEDDING_NATIVE_DIMENSIONS = 768
+EMBEDDING_DIMENSIONS = settings.AI_EMBEDDING_DIMENSIONS
+# Key của EmbeddingCache: vector cắt còn N chiều không dùng lẫn với vector đầy đủ,
+# vector của provider local không dùng lẫn với Gemini (model khác nhau)
+EMBEDDING_CACHE_KEY = (
+    EMBEDDING_MODEL if EMBEDDING_DIMENSIONS == EMBEDDING_NATIVE_DIMENSIONS
+    else f"{EMBEDDING_MODEL}@{EMBEDDING_DIMENSIONS}"
+)
+# Gemini batchEmbedContents nhận tối đa 100 text / request
+EMBEDDING_BATCH_SIZE = 100
+
+def _embed_batch(texts, task_type):
+    """
+    Gọi API cho 1 batch. Chỉ khi lỗi do nội dung 1 item (400 / InvalidArgument) mới tách đôi
+    để tìm đúng item lỗi; lỗi mạng / quota (429) / 5xx -> cả batch None ngay, không gọi lại.
+    """
+    provider = get_provider()
     try:
         # Nếu là lưu vào DB thì dùng task_type='retrieval_document'
         # Nếu là query search thì dùng task_type='retrieval_query'
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-            task_type=task_type
-        )
-        return result['embedding']
+        vectors = provider.embed(texts, task_type, EMBEDDING_DIMENSIONS)
+        if len(vectors) == len(texts):
+            return vectors
+        print(f"Error embedding: API trả về {len(vectors)} vector cho {len(texts)} text")
     except Exception as e:
-        print(f"Error embedding: {e}")
-        return None
+        print(f"Error embedding ({len(texts)} texts): {e}")
+        if not provider.is_item_error(e):
+            return [None] * len(texts)
 
-def search_vector_db(query_embedding, top_k=5):
+    if len(texts) == 1:
+        return [None]
+    mid = len(texts) // 2
+    return _embed_batch(texts[:mid], task_type) + _embed_batch(texts[mid:], task_type)
+
+def get_embeddings(texts, task_type="retrieval_document", batch_size=EMBEDDING_BATCH_SIZE):
+    """
+    Embed nhiều text với số request ít nhất (tối đa `batch_size` text / request).
+    Kết quả giữ nguyên thứ tự và độ dài của `texts`; text rỗng hoặc lỗi -> None.
+    """
+    results = [None] * len(texts)
+    pending = []
+    for idx, text in enumerate(texts):
+        clean = normalize_text(text)
+        if clean:
+            pending.append((idx, clean))
+
+    # 1. Tra cache trước, chỉ gọi API cho những text chưa có
+    cached = get_cached_embeddings(EMBEDDING_CACHE_KEY, task_type, [text for _, text in pending])
+    if cached:
+        missing = []
+        for idx, text in pending:
+            vector = cached.get(text_hash(text))
+            if vector is not None:
+                results[idx] = vector
+            else:
+                missing.append((idx, text))
+        pending = missing
+
+    # 2. Embed phần còn lại theo batch
+    batch_size = max(1, min(batch_size, EMBEDDING_BATCH_SIZE))
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        vectors = _embed_batch([text for _, text in chunk], task_type)
+        for (idx, _), vector in zip(chunk, vectors):
+            results[idx] = vector
+        store_embeddings(EMBEDDING_CACHE_KEY, task_type, [
+            (text, vector) for (_, text), vector in zip(chunk, vectors)
+        ])
+    return results
+
+def get_embedding(text, task_type="retrieval_query"):
+    if not text: return None
+    return get_embeddings([text], task_type=task_type)[0]
+
+def get_query_embedding(text):
+    """Embedding cho câu query chat, ưu tiên LRU trong process trước khi ra DB/API."""
+    clean = normalize_text(text)
+    if not clean: return None
+
+    key = ("retrieval_query", text_hash(clean))
+    vector = query_embedding_lru.get(key)
+    if vector is not None:
+        return vector
+
+    vector = get_embedding(clean, task_type="retrieval_query")
+    query_embedding_lru.set(key, vector)
+    return vector
+
+def vector_candidates(query_embedding, top_k=5, content_types=None, owner_id=None):
+    """
+    Tìm đoạn gần nhất trong KnowledgeBase, trả về list (distance, id, content_text, parent_key)
+    tăng dần theo distance, mỗi tài liệu gốc chỉ giữ đoạn gần nhất.
+    - content_types: các loại nội dung public cần tìm (mặc định: PUBLIC_CONTENT_TYPES).
+    - owner_id: nếu có, tìm thêm USER_CONTEXT của đúng user này (không bao giờ tìm hồ sơ user khác).
+    Mỗi loại được query riêng để dùng partial HNSW index của loại đó, sau đó gộp theo distance.
+    """
+    if content_types is None:
+        content_types = PUBLIC_CONTENT_TYPES
+
+    public_types = [ctype for ctype in content_types if ctype != ContentType.USER_CONTEXT]
+    fetch_k = top_k * PASSAGE_FANOUT
+    candidates = []
+
+    # 1. Nội dung public: ưu tiên index NumPy trong process nếu đã sẵn sàng
+    memory_hits = None
+    if public_types and vector_index.is_enabled():
+        memory_hits = vector_index.public_kb_index.search(query_embedding, fetch_k, public_types)
+    if memory_hits is not None:
+        candidates.extend(
+            (distance, doc_id, text, parent_key(ctype, ref)) for distance, doc_id, ctype, text, ref in memory_hits
+        )
+
+    needs_db = memory_hits is None or owner_id is not None
+    with hnsw_search(top_k=shortlist_size(fetch_k)) if needs_db else nullcontext():
+        if memory_hits is None:
+            for ctype in public_types:
+                # AI_VECTOR_SEARCH_MODE: index đầy đủ hoặc index gọn (halfvec / binary) + tính lại chính xác
+                docs = nearest(
+                    KnowledgeBase.objects.filter(content_type=ctype, embedding__isnull=False),
+                    'embedding', query_embedding, fetch_k
+                ).values_list('distance', 'id', 'content_text', 'reference_id')
+                candidates.extend((distance, doc_id, text, parent_key(ctype, ref)) for distance, doc_id, text, ref in docs)
+
+        # 2. Hồ sơ riêng của user đang chat
+        if owner_id is not None:
+            docs = KnowledgeBase.objects.filter(
+                content_type=ContentType.USER_CONTEXT,
+                reference_id=str(owner_id),
+                embedding__isnull=False
+            ).annotate(
+                distance=CosineDistance('embedding', query_embedding)
+            ).order_by('distance').values_list('distance', 'id', 'content_text', 'reference_id')[:fetch_k]
+            candidates.extend(
+                (distance, doc_id, text, parent_key(ContentType.USER_CONTEXT, ref)) for distance, doc_id, text, ref in docs
+            )
+
+    candidates.sort(key=lambda item: item[0])
+    return best_per_parent(candidates, top_k)
+
+def search_vector_db(query_embedding, top_k=5, content_types=None, owner_id=None):
+    """Chỉ tìm theo vector: list content_text có distance < AI_RAG_MAX_DISTANCE."""
     if query_embedding is None: return [] # Fix lỗi numpy ở đây nếu có
     try:
-        results = KnowledgeBase.objects.annotate(
-            distance=CosineDistance('embedding', query_embedding)
-        ).order_by('distance')[:top_k]
-        
-        return [doc.content_text for doc in results if doc.distance < 0.6]
+        candidates = vector_candidates(query_embedding, top_k, content_types, owner_id)
+        return [text for distance, _, text, _ in candidates if distance < settings.AI_RAG_MAX_DISTANCE]
     except Exception as e:
         print(f"Error search vector db: {e}")
         return []
 
+def hybrid_search(query_text, query_embedding=None, top_k=5, content_types=None, owner_id=None):
+    """
+    Full-text + vector, gộp bằng reciprocal-rank fusion. Mỗi nhánh lấy top_k * 2 tài liệu
+    (đoạn tốt nhất của mỗi tài liệu).
+    Không có query_embedding (embedding chậm / lỗi) -> chỉ dùng full-text.
+    Ngưỡng distance chỉ lọc nhánh vector; tài liệu khớp từ khóa vẫn được giữ dù vector xa.
+    """
+    pool_size = top_k * 2
+    try:
+        lexical = [
+            (doc_id, text, parent) for _, doc_id, text, parent in lexical_search(query_text, pool_size, content_types, owner_id)
+        ]
+    except Exception as e:
+        print(f"Error lexical search: {e}")
+        lexical = []
+
+    if query_embedding is None:
+        return [text for _, text, _ in lexical[:top_k]]
+
+    try:
+        vector = [
+            (doc_id, text, parent)
+            for distance, doc_id, text, parent in vector_candidates(query_embedding, pool_size, content_types, owner_id)
+            if distance < settings.AI_RAG_MAX_DISTANCE
+        ]
+    except Exception as e:
+        print(f"Error search vector db: {e}")
+        vector = []
+
+    return rrf_fuse(lexical, vector)[:top_k]
+
 def call_gemini_with_config(full_prompt, model_key="gemini-2.5-flash"):
     config = get_active_config()
     try:
-        model = genai.GenerativeModel(
-            model_name=model_key,
-            generation_config={"temperature": config.temperature}
-        )
-        response = model.generate_content(full_prompt)
+        with model_pool.track(model_key):
+            response = get_provider().generate(full_prompt, model_key, config.temperature)
         return response
     except Exception as e:
         print(f"Gemini Error: {e}")
         return None
 
+def stream_gemini_with_config(full_prompt, model_key="gemini-2.5-flash"):
+    """Giống call_gemini_with_config nhưng trả về từng đoạn text ngay khi model sinh ra."""
+    config = get_active_config()
+    with model_pool.track(model_key):
+        yield from get_provider().stream(full_prompt, model_key, config.temperature)
+
 def get_active_config():
-    config = AIPromptConfig.objects.filter(is_active=True).first()
-    if config: return config
-    
-    class DefaultConfig:
-        temperature = 0.7
-        role_description = "Bạn là AI Career Advisor."
-        missing_profile_template = "User thiếu hồ sơ: {user_profile_context}. Chat: {chat_history_text}. User: {prompt}"
-        standard_prompt_template = "Vai trò: {role_description}. Context: {rag_context}. Chat: {chat_history_text}. User: {prompt}"
-    return DefaultConfig()
+    """Config đang active, giữ trong process; tự nạp lại khi admin đổi config (xem config_cache)."""
+    return active_config_cache.get()
 
 # ==========================================
 # 2. USER PROFILE HELPERS
@@ -82,11 +245,29 @@ def calculate_age(born):
     return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
 
 def get_info_user(user):
+    """Context hồ sơ cho prompt; đọc từ cache theo version, chỉ query DB khi hồ sơ vừa đổi."""
+    return get_profile_context(user.pk, lambda: load_info_user(user))
+
+def load_info_user(user):
     try:
         profile = getattr(user, 'profile', None)
     except Exception:
         profile = None
 
+    try:
+        skills = list(user.skills.all())
+    except Exception:
+        skills = None
+
+    try:
+        interests = list(user.interests.all())
+    except Exception:
+        interests = None
+
+    return format_user_info(user, profile, skills, interests)
+
+def format_user_info(user, profile, skills, interests):
+    """Dựng context hồ sơ từ dữ liệu đã load sẵn (dùng chung cho luồng sync và async)."""
     if profile:
         current_job = profile.current_job_title
         education = profile.education_level
@@ -104,27 +285,23 @@ def get_info_user(user):
         gender = age_str = bio = mbti = holland = linkedin = "Chưa cập nhật"
 
     # Lấy Skills
-    try:
-        skills_qs = getattr(user, 'skills', None)
-        if skills_qs and skills_qs.exists():
-            user_skills = ", ".join([
-                f"{s.skill_name} (Lv.{s.proficiency_level}/5)" 
-                for s in skills_qs.all()
-            ])
-        else:
-            user_skills = "Chưa cập nhật kỹ năng"
-    except Exception:
+    if skills is None:
         user_skills = "Chưa cập nhật"
+    elif skills:
+        user_skills = ", ".join([
+            f"{s.skill_name} (Lv.{s.proficiency_level}/5)" 
+            for s in skills
+        ])
+    else:
+        user_skills = "Chưa cập nhật kỹ năng"
 
     # Lấy Interests
-    try:
-        interests_qs = getattr(user, 'interests', None)
-        if interests_qs and interests_qs.exists():
-            user_interests = ", ".join([i.keyword for i in interests_qs.all()])
-        else:
-            user_interests = "Chưa cập nhật sở thích"
-    except Exception:
+    if interests is None:
         user_interests = "Chưa cập nhật"
+    elif interests:
+        user_interests = ", ".join([i.keyword for i in interests])
+    else:
+        user_interests = "Chưa cập nhật sở thích"
 
     is_profile_missing = not (current_job and education and profile and profile.mbti_result)
 
@@ -156,36 +333,95 @@ def get_info_user(user):
 # ==========================================
 
 def get_history_message(session):
-    if not session: return ""
-    history_msgs = ChatMessage.objects.filter(session=session).order_by('-created_at')[:10]
-    msgs = reversed(history_msgs)
-    return "\n".join([f"- {'User' if m.role == 'user' else 'Advisor'}: {m.content}" for m in msgs])
-
-def create_rag_context(prompt):
-    embedding_vector = get_embedding(prompt, task_type="retrieval_query")
-    if embedding_vector is not None: # Fix check numpy
-        rag_docs = search_vector_db(embedding_vector, 5)
-        if rag_docs:
-            return "\n".join([f"- {doc}" for doc in rag_docs])
-    return ""
+    """
+    Tóm tắt phần cũ của session + MỌI tin nhắn sau phần đã tóm tắt (summary_message_count),
+    trong AI_CHAT_HISTORY_TOKEN_BUDGET. Tóm tắt chỉ chạy mỗi AI_CHAT_SUMMARY_EVERY tin nhắn
+    nên phần chưa tóm tắt có thể dài hơn K tin gần nhất; lấy đúng K tin sẽ làm rơi mất đoạn giữa.
+    """
+    if not session: return "", []
+    unsummarized = ChatMessage.objects.filter(session=session).order_by('created_at').values('id')[session.summary_message_count:]
+    # Bình thường tối đa K + EVERY - 1 tin; tóm tắt bị trễ / lỗi thì chỉ giữ phần mới nhất
+    limit = settings.AI_CHAT_RECENT_MESSAGES + max(settings.AI_CHAT_SUMMARY_EVERY, 1)
+    history_msgs = list(
+        ChatMessage.objects.filter(id__in=unsummarized).order_by('-created_at')[:limit]
+    )
+    return format_history(session.summary, history_msgs)
+
+def format_history(summary, recent_msgs, budget=None):
+    """
+    recent_msgs: mới nhất trước. Trả về (dòng tóm tắt, list tin nhắn theo thứ tự thời gian, mỗi tin 1 item).
+    Tin nhắn lấy từ mới nhất tới khi hết ngân sách; tóm tắt là phần riêng của prompt (section 'summary').
+    """
+    budget = settings.AI_CHAT_HISTORY_TOKEN_BUDGET if budget is None else budget
+    summary_text = f"- Tóm tắt trước đó: {summary}" if summary else ""
+
+    lines = []
+    for m in recent_msgs:
+        line = f"- {'User' if m.role == 'user' else 'Advisor'}: {m.content}"
+        cost = estimate_tokens(line)
+        if cost > budget:
+            # Tin nhắn dài: giữ phần đầu nếu còn đủ chỗ, sau đó dừng
+            if budget >= 50:
+                lines.append(truncate_to_tokens(line, budget))
+            break
+        lines.append(line)
+        budget -= cost
+
+    lines.reverse()
+    return summary_text, lines
+
+def get_rag_docs(prompt, user=None):
+    """Tài liệu RAG theo thứ tự liên quan giảm dần."""
+    # Chỉ tìm nội dung public + hồ sơ của chính user đang chat
+    owner_id = user.id if user is not None else None
+    if not settings.AI_RAG_HYBRID:
+        embedding_vector = get_query_embedding(prompt)
+        if embedding_vector is None: # Fix check numpy
+            return []
+        return search_vector_db(embedding_vector, 5, owner_id=owner_id)
+
+    embedding_vector = embed_with_timeout(get_query_embedding, prompt)
+    return hybrid_search(prompt, embedding_vector, 5, owner_id=owner_id)
 
 def create_full_prompt_chat(prompt, session, user):
-    user_profile_context, is_profile_missing, current_job = get_info_user(user)
-    chat_history_text = get_history_message(session)
-    rag_context = create_rag_context(prompt) if len(prompt) > 5 else ""
+    user_info = get_info_user(user)
+    chat_history = get_history_message(session)
+    rag_docs = get_rag_docs(prompt, user) if len(prompt) > 5 else []
     config = get_active_config()
-    
+    return build_chat_prompt(config, prompt, user_info, chat_history, rag_docs)
+
+def build_chat_prompt(config, prompt, user_info, chat_history, rag_docs):
+    """
+    Ghép template của config với các phần context đã chuẩn bị, trong ngân sách token
+    (AI_PROMPT_TOKEN_BUDGET / AI_PROMPT_SECTIONS, xem PromptAssembler).
+    chat_history: (dòng tóm tắt, list tin nhắn) từ get_history_message.
+    rag_docs: list tài liệu theo độ liên quan giảm dần.
+    """
+    user_profile_context, is_profile_missing, current_job = user_info
+    template = config.missing_profile_template if is_profile_missing else config.standard_prompt_template
+
+    assembler = PromptAssembler()
+    assembler.add('question', prompt, min_tokens=200)
+    assembler.add('role', config.role_description, min_tokens=50)
+    assembler.add('profile', user_profile_context, min_tokens=150)
+    summary_text, history_items = chat_history
+    # Tóm tắt là phần gọn nhất của lịch sử -> section riêng, ưu tiên cao hơn tin nhắn nguyên văn
+    assembler.add('summary', summary_text)
+    # Lịch sử: bỏ nguyên tin nhắn cũ nhất trước; RAG: bỏ tài liệu ít liên quan nhất trước
+    assembler.add('history', history_items, drop_from='start')
+    assembler.add('rag', [f"- {doc}" for doc in rag_docs])
+    parts = assembler.assemble(overhead_tokens=estimate_tokens(template))
+    assembler.log()
+
     params = {
-        "role_description": config.role_description,
-        "user_profile_context": user_profile_context,
-        "chat_history_text": chat_history_text,
-        "prompt": prompt,
-        "rag_context": rag_context if rag_context else "Không có dữ liệu chuyên môn cụ thể.",
+        "role_description": parts['role'],
+        "user_profile_context": parts['profile'],
+        "chat_history_text": "\n".join(part for part in (parts['summary'], parts['history']) if part),
+        "prompt": parts['question'],
+        "rag_context": parts['rag'] if parts['rag'] else "Không có dữ liệu chuyên môn cụ thể.",
         "current_job": current_job if current_job else "N/A"
     }
 
-    template = config.missing_profile_template if is_profile_missing else config.standard_prompt_template
-    
     try:
         return template.format(**params)
     except KeyError as e:
@@ -206,9 +442,13 @@ def suggest_industries_via_ai(user):
     except Exception:
         return {"error": "Lỗi truy xuất dữ liệu profile."}
 
-    industries = Industry.objects.all().values('id', 'name', 'description')
-    industries_list = list(industries)
-    industries_text = json.dumps(industries_list, ensure_ascii=False)
+    # Kết quả chỉ phụ thuộc MBTI, Holland, (bio) và danh sách Industry -> tra cache trước
+    industries_text, catalog_hash = get_industry_catalog()
+    bio = profile.bio if use_bio() else None
+    cached = get_cached_suggestions(mbti, holland, bio, catalog_hash)
+    if cached is not None:
+        return cached
+    bio_line = f"- Bio: {bio}" if bio else ""
 
     prompt = f"""
     Đóng vai là một Chuyên gia Tư vấn Hướng nghiệp AI.
@@ -216,7 +456,7 @@ def suggest_industries_via_ai(user):
     DỮ LIỆU USER:
     - MBTI: {mbti}
     - Holland Code (RIASEC): {holland}
-    - Bio: {profile.bio}
+    {bio_line}
 
     DANH SÁCH LĨNH VỰC (INDUSTRIES):
     {industries_text}
@@ -243,6 +483,7 @@ def suggest_industries_via_ai(user):
             clean_json = response.text.replace("```json", "").replace("```", "").strip()
             suggestions = json.loads(clean_json)
             suggestions.sort(key=lambda x: x.get('match_score', 0), reverse=True)
+            store_suggestions(mbti, holland, bio, catalog_hash, suggestions)
             return suggestions
     except Exception as e:
         print(f"Error suggesting industries: {e}")
@@ -251,9 +492,10 @@ def suggest_industries_via_ai(user):
     return []
 
 
-def recommend_careers_in_industry(user, industry_id):
+def recommend_careers_in_industry(user, industry_id, limit=10, offset=0):
     """
     Bước 2: Gợi ý Careers trong Industry bằng Vector Search.
+    Xếp hạng, bỏ trùng title và phân trang (limit/offset) đều làm trong 1 query.
     """
     try:
         industry = Industry.objects.get(id=industry_id)
@@ -268,54 +510,59 @@ def recommend_careers_in_industry(user, industry_id):
         
         if user_vector is not None:
             user.profile.profile_vector = user_vector
-            user.profile.save()
-
-    if user_vector is None:
-        careers = Career.objects.filter(industry=industry)[:10]
-        results = []
-        for c in careers:
-            results.append({
-                "id": c.id,
-                "title": c.title,
-                "level": c.level,
-                "salary_range": f"{c.salary_min or 0} - {c.salary_max or 'Thỏa thuận'}",
-                "match_score": 0,
-                "description": c.description
-            })
-        return results
-    
-    raw_careers = Career.objects.filter(
-        industry=industry
-    ).annotate(
-        distance=CosineDistance('embedding', user_vector)
-    ).order_by('distance')[:50]
+            user.profile.vector_updated_at = timezone.now()
+            user.profile.save(update_fields=['profile_vector', 'vector_updated_at'])
+
+    # Ưu tiên bảng career_matches (compute_career_matches): 1 lookup theo index
+    precomputed = get_precomputed_careers(user, industry.id, limit, offset)
+    if precomputed is not None:
+        return [{
+            "id": row['career_id'],
+            "title": row['career__title'],
+            "level": row['career__level'],
+            "salary_range": f"{row['career__salary_min'] or 0} - {row['career__salary_max'] or 'Thỏa thuận'}",
+            "match_score": row['score'],
+            "description": row['career__description']
+        } for row in precomputed]
+
+    careers = Career.objects.filter(industry=industry)
+    if user_vector is not None:
+        careers = careers.annotate(distance=CosineDistance('embedding', user_vector))
+        rank_order = [F('distance').asc(nulls_last=True), F('id').asc()]
+    else:
+        careers = careers.annotate(distance=Value(None, output_field=FloatField()))
+        rank_order = [F('id').asc()]
+
+    # Mỗi title (đã trim) chỉ giữ bản gần nhất, rồi mới cắt trang
+    rows = careers.annotate(
+        title_rank=Window(
+            expression=RowNumber(),
+            partition_by=[Trim('title')],
+            order_by=rank_order
+        )
+    ).filter(
+        title_rank=1
+    ).order_by(*rank_order).values(
+        'id', 'title', 'level', 'salary_min', 'salary_max', 'description', 'distance'
+    )[offset:offset + limit]
 
     results = []
-    seen_titles = set()
-
-    for career in raw_careers:
-        title_key = career.title.strip()
-
-        if title_key in seen_titles:
-            continue
-
-        seen_titles.add(title_key)
+    for career in rows:
+        if user_vector is None:
+            score = 0
+        else:
+            dist = career['distance'] if career['distance'] is not None else 1
+            score = round(max(0, (1 - dist) * 100), 1)
 
-        dist = career.distance if career.distance is not None else 1
-        score = max(0, (1 - dist) * 100)
-        
         results.append({
-            "id": career.id,
-            "title": career.title,
-            "level": career.level,
-            "salary_range": f"{career.salary_min or 0} - {career.salary_max or 'Thỏa thuận'}",
-            "match_score": round(score, 1),
-            "description": career.description
+            "id": career['id'],
+            "title": career['title'],
+            "level": career['level'],
+            "salary_range": f"{career['salary_min'] or 0} - {career['salary_max'] or 'Thỏa thuận'}",
+            "match_score": score,
+            "description": career['description']
         })
 
-        if len(results) >= 10:
-            break
-    
     return results
 
 def save_user_career_choice(user, career_id, reasoning="User selected"):
@@ -323,9 +570,7 @@ def save_user_career_choice(user, career_id, reasoning="User selected"):
     try:
         career = Career.objects.get(id=career_id)
         
-        match_score = 0
-        if user.profile.profile_vector is not None and career.embedding is not None:
-            match_score = 80 
+        match_score = get_match_score(user, career)
             
         rec, created = CareerRecommendation.objects.update_or_create(
             user=user,
@@ -360,10 +605,50 @@ def create_learning_path_via_ai(user, career_id):
             "message": "Lộ trình đã tồn tại"
         }
 
+    profile = getattr(user, 'profile', None)
+    education_level = (profile.education_level if profile else None) or ''
+
+    try:
+        template = get_learning_path_template(career, education_level)
+        if isinstance(template, dict):
+            return template
+
+        # Copy từ template: 1 path + bulk_create các bước, không gọi AI
+        with transaction.atomic():
+            new_path = LearningPath.objects.create(
+                user=user,
+                career=career,
+                title=f"Lộ trình: {career.title}",
+                status=PathStatus.IN_PROGRESS
+            )
+
+            items_to_create = []
+            for idx, step in enumerate(template.steps):
+                items_to_create.append(LearningPathItem(
+                    path=new_path,
+                    custom_task_name=step.get('step_name', 'Task không tên'),
+                    order_index=idx + 1,
+                    is_completed=False
+                ))
+
+            LearningPathItem.objects.bulk_create(items_to_create)
+
+        LearningPathTemplate.objects.filter(pk=template.pk).update(use_count=F('use_count') + 1)
+        return {"success": True, "path_id": new_path.id}
+
+    except Exception as e:
+        print(f"General Error creating roadmap: {e}")
+        return {"error": f"Lỗi hệ thống: {str(e)}"}
+
+# Đổi nội dung prompt sinh lộ trình -> tăng version để không dùng lại template cũ
+LEARNING_PATH_PROMPT_VERSION = "v1"
+
+def generate_learning_path_steps(career, education_level):
+    """Gọi AI sinh danh sách bước. Trả về list step hoặc dict {"error": ...}."""
     prompt = f"""
     Bạn là một Mentor IT chuyên nghiệp.
     Hãy thiết kế một lộ trình học tập chi tiết (Learning Path) cho vị trí: {career.title}.
-    Trình độ hiện tại của User: {user.profile.education_level or 'Người mới bắt đầu'}.
+    Trình độ hiện tại của User: {education_level or 'Người mới bắt đầu'}.
     
     YÊU CẦU:
     - Chia làm 10-15 bước nhỏ (Step).
@@ -393,32 +678,44 @@ def create_learning_path_via_ai(user, career_id):
             clean_json = response.text.replace("```json", "").replace("```", "").strip()
 
         steps = json.loads(clean_json)
-
-        if not steps:
-            return {"error": "AI trả về danh sách rỗng."}
-        new_path = LearningPath.objects.create(
-            user=user,
-            career=career,
-            title=f"Lộ trình: {career.title}",
-            status=PathStatus.IN_PROGRESS
-        )
-
-        items_to_create = []
-        for idx, step in enumerate(steps):
-            items_to_create.append(LearningPathItem(
-                path=new_path,
-                custom_task_name=step.get('step_name', 'Task không tên'),
-                order_index=idx + 1,
-                is_completed=False
-            ))
-        
-        LearningPathItem.objects.bulk_create(items_to_create)
-        
-        return {"success": True, "path_id": new_path.id}
-
     except json.JSONDecodeError as e:
         return {"error": "Lỗi đọc dữ liệu từ AI (Format không hợp lệ)."}
-        
-    except Exception as e:
-        print(f"General Error creating roadmap: {e}")
-        return {"error": f"Lỗi hệ thống: {str(e)}"}
\ No newline at end of file
+
+    if not isinstance(steps, list):
+        return {"error": "AI trả về danh sách rỗng."}
+    steps = [step for step in steps if isinstance(step, dict)]
+    if not steps:
+        # Không lưu template rỗng (sẽ bị copy cho mọi user đến khi hết hạn)
+        return {"error": "AI trả về danh sách rỗng."}
+    return steps
+
+def refresh_learning_path_template(career, education_level):
+    """Sinh lại và lưu template (dùng cho template hết hạn và action "regenerate" trong admin)."""
+    steps = generate_learning_path_steps(career, education_level)
+    if isinstance(steps, dict):
+        return steps
+    key = {'career': career, 'education_level': education_level, 'prompt_version': LEARNING_PATH_PROMPT_VERSION}
+    try:
+        with transaction.atomic():
+            template, _ = LearningPathTemplate.objects.update_or_create(
+                **key, defaults={'steps': steps, 'refreshed_at': timezone.now()}
+            )
+    except IntegrityError:
+        # Request khác vừa tạo cùng template (unique_together) -> dùng bản đó
+        template = LearningPathTemplate.objects.get(**key)
+    return template
+
+def get_learning_path_template(career, education_level):
+    """Template cho (career, trình độ); chưa có hoặc hết hạn thì sinh mới, AI lỗi thì dùng tạm bản cũ."""
+    template = LearningPathTemplate.objects.filter(
+        career=career,
+        education_level=education_level,
+        prompt_version=LEARNING_PATH_PROMPT_VERSION
+    ).first()
+    if template and not template.is_stale():
+        return template
+
+    refreshed = refresh_learning_path_template(career, education_level)
+    if isinstance(refreshed, dict) and template:
+        return template
+    return refreshed
@@ -0,0 +1,124 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from apps.ai.models import ChatMessage
+from apps.ai.services.ai_service import (
+    EMBEDDING_DIMENSIONS, EMBEDDING_CACHE_KEY, search_vector_db, hybrid_search, load_info_user,
+    get_history_message, build_chat_prompt
+)
+from apps.ai.services.config_cache import active_config_cache
+from apps.ai.services.hybrid_search import embedding_circuit
+from apps.ai.services.model_pool import model_pool
+from apps.ai.services.llm_provider import get_provider
+from apps.ai.services.profile_context_cache import aget_profile_context
+from apps.ai.services.embedding_cache import (
+    normalize_text, text_hash, get_cached_embeddings, store_embeddings, query_embedding_lru
+)
+
+# ==========================================
+# ASYNC CHAT PIPELINE (chạy qua ai_career/asgi.py)
+# Bản async của create_full_prompt_chat / call_gemini_with_config:
+# embedding + vector search chạy song song với các query hồ sơ / lịch sử / config.
+# Async ORM và sync_to_async mặc định đều xếp hàng trên 1 thread (thread_sensitive)
+# -> các query lấy context chạy trên pool riêng, mỗi thread 1 connection (giữ theo CONN_MAX_AGE).
+# ==========================================
+
+_context_executor = ThreadPoolExecutor(
+    max_workers=settings.AI_ASYNC_CONTEXT_WORKERS, thread_name_prefix='chat-context'
+)
+
+def _run_with_connection(func, *args):
+    # Thread ngoài request cycle: tự đóng connection hỏng / quá CONN_MAX_AGE như request_started/finished
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+async def _in_db_thread(func, *args):
+    """Chạy func(*args) (query DB đồng bộ) trên _context_executor, song song thật với các query khác."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_context_executor, _run_with_connection, func, *args)
+
+async def aget_query_embedding(text):
+    """Giống get_query_embedding: LRU -> cache DB -> provider (client async)."""
+    clean = normalize_text(text)
+    if not clean: return None
+
+    key = ("retrieval_query", text_hash(clean))
+    vector = query_embedding_lru.get(key)
+    if vector is not None:
+        return vector
+
+    cached = await _in_db_thread(get_cached_embeddings, EMBEDDING_CACHE_KEY, "retrieval_query", [clean])
+    vector = cached.get(text_hash(clean)) if cached else None
+
+    if vector is None:
+        try:
+            vector = await get_provider().aembed(clean, "retrieval_query", EMBEDDING_DIMENSIONS)
+        except Exception as e:
+            print(f"Error embedding (async): {e}")
+            return None
+        await _in_db_thread(store_embeddings, EMBEDDING_CACHE_KEY, "retrieval_query", [(clean, vector)])
+
+    query_embedding_lru.set(key, vector)
+    return vector
+
+async def aget_rag_docs(prompt, user=None):
+    owner_id = user.id if user is not None else None
+    if not settings.AI_RAG_HYBRID:
+        embedding_vector = await aget_query_embedding(prompt)
+        if embedding_vector is None: return []
+        # search_vector_db cần transaction (SET LOCAL hnsw.ef_search) -> chạy bản sync trong thread
+        return await _in_db_thread(search_vector_db, embedding_vector, 5, None, owner_id)
+
+    embedding_vector = None
+    if embedding_circuit.is_available():
+        try:
+            embedding_vector = await asyncio.wait_for(
+                aget_query_embedding(prompt), timeout=settings.AI_RAG_EMBEDDING_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            print("RAG embedding timeout (async) -> lexical only")
+        if embedding_vector is None:
+            embedding_circuit.mark_down()
+        else:
+            embedding_circuit.mark_up()
+    return await _in_db_thread(hybrid_search, prompt, embedding_vector, 5, None, owner_id)
+
+async def aget_info_user(user):
+    return await aget_profile_context(user.pk, lambda: aload_info_user(user))
+
+async def aload_info_user(user):
+    return await _in_db_thread(load_info_user, user)
+
+async def aget_history_message(session):
+    if not session: return "", []
+    return await _in_db_thread(get_history_message, session)
+
+async def aget_active_config():
+    return await active_config_cache.aget()
+
+async def _empty():
+    return []
+
+async def acreate_full_prompt_chat(prompt, session, user):
+    user_info, chat_history, rag_docs, config = await asyncio.gather(
+        aget_info_user(user),
+        aget_history_message(session),
+        aget_rag_docs(prompt, user) if len(prompt) > 5 else _empty(),
+        aget_active_config(),
+    )
+    return build_chat_prompt(config, prompt, user_info, chat_history, rag_docs)
+
+async def acall_gemini_with_config(full_prompt, model_key="gemini-2.5-flash"):
+    config = await aget_active_config()
+    try:
+        with model_pool.track(model_key):
+            return await get_provider().agenerate(full_prompt, model_key, config.temperature)
+    except Exception as e:
+        print(f"Gemini Error (async): {e}")
+        return None
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from apps.ai.models import ChatMessage, ChatSession
+from apps.ai.services.ai_service import call_gemini_with_config
+from apps.ai.services.token_budget import truncate_to_tokens
+from utils.background import run_in_background
+
+# ==========================================
+# Tóm tắt cuộn cho ChatSession: các tin nhắn rơi ra ngoài K tin gần nhất
+# được gộp dần vào session.summary (chạy nền, không chặn request chat).
+# ==========================================
+
+SUMMARY_MAX_TOKENS = 400
+
+
+def _pending_count(session, total):
+    """Số tin nhắn cũ (ngoài K tin gần nhất) chưa nằm trong tóm tắt."""
+    return max(0, total - settings.AI_CHAT_RECENT_MESSAGES - session.summary_message_count)
+
+
+def maybe_refresh_summary(session):
+    """Gọi sau khi lưu câu trả lời: đủ N tin nhắn mới rơi ra ngoài K tin gần nhất -> tóm tắt lại."""
+    every = settings.AI_CHAT_SUMMARY_EVERY
+    if every <= 0: return
+    total = ChatMessage.objects.filter(session=session).count()
+    # Khóa ngắn trong cache để không chạy 2 lượt tóm tắt song song cho cùng session
+    if _pending_count(session, total) >= every and cache.add(f'chat_summary_lock:{session.id}', 1, timeout=120):
+        run_in_background(refresh_session_summary, session.id)
+
+
+def refresh_session_summary(session_id):
+    try:
+        _refresh_session_summary(session_id)
+    finally:
+        cache.delete(f'chat_summary_lock:{session_id}')
+
+
+def _refresh_session_summary(session_id):
+    session = ChatSession.objects.filter(id=session_id).first()
+    if session is None: return
+
+    start = session.summary_message_count
+    # Chỉ đọc phần chưa tóm tắt
+    messages = list(ChatMessage.objects.filter(session=session).order_by('created_at')[start:])
+    end = start + len(messages) - settings.AI_CHAT_RECENT_MESSAGES
+    if end <= start: return
+
+    new_lines = "\n".join(
+        f"- {'User' if m.role == 'user' else 'Advisor'}: {truncate_to_tokens(m.content, 300)}"
+        for m in messages[:end - start]
+    )
+    prompt = f"""
+    Bạn đang tóm tắt một cuộc hội thoại tư vấn hướng nghiệp để dùng làm ngữ cảnh cho các lượt sau.
+
+    TÓM TẮT HIỆN CÓ:
+    {session.summary or "(chưa có)"}
+
+    CÁC TIN NHẮN MỚI CẦN GỘP VÀO:
+    {new_lines}
+
+    YÊU CẦU:
+    - Viết lại 1 bản tóm tắt duy nhất (tối đa khoảng 150 từ), tiếng Việt.
+    - Giữ: mục tiêu nghề nghiệp, thông tin user đã chia sẻ, các gợi ý/quyết định quan trọng, câu hỏi còn bỏ ngỏ.
+    - Không thêm lời dẫn, không markdown.
+    """
+
+    response = call_gemini_with_config(prompt)
+    if not response or not response.parts:
+        return
+    summary = truncate_to_tokens(response.text.strip(), SUMMARY_MAX_TOKENS)
+
+    # Chỉ ghi nếu không có lượt tóm tắt khác chạy xong trước (cùng điểm bắt đầu)
+    ChatSession.objects.filter(id=session.id, summary_message_count=start).update(
+        summary=summary,
+        summary_message_count=end,
+        summary_updated_at=timezone.now()
+    )
@@ -0,0 +1,108 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.ai.models import AIPromptConfig
+from utils.cache import is_shared_cache
+
+# ==========================================
+# Cache AIPromptConfig đang active trong từng process.
+# Mỗi lần config đổi -> bump generation trong cache dùng chung; worker thấy
+# generation khác với bản đang giữ thì nạp lại từ DB ở lần gọi kế tiếp.
+# Không có cache dùng chung (LocMem) thì generation chỉ bump được trong worker đã sửa config
+# -> worker khác giữ config tối đa AI_PROMPT_CONFIG_LOCAL_TTL giây rồi đọc lại DB.
+# ==========================================
+
+GENERATION_CACHE_KEY = 'ai_prompt_config_generation'
+
+
+class DefaultConfig:
+    temperature = 0.7
+    role_description = "Bạn là AI Career Advisor."
+    missing_profile_template = "User thiếu hồ sơ: {user_profile_context}. Chat: {chat_history_text}. User: {prompt}"
+    standard_prompt_template = "Vai trò: {role_description}. Context: {rag_context}. Chat: {chat_history_text}. User: {prompt}"
+
+
+def _new_generation():
+    return str(time.time_ns())
+
+
+def get_generation():
+    generation = cache.get(GENERATION_CACHE_KEY)
+    if generation is None:
+        cache.add(GENERATION_CACHE_KEY, _new_generation(), timeout=None)
+        generation = cache.get(GENERATION_CACHE_KEY)
+    return generation
+
+
+def bump_generation():
+    cache.set(GENERATION_CACHE_KEY, _new_generation(), timeout=None)
+
+
+def invalidate_active_config():
+    """Gọi khi config được tạo / sửa / xóa / kích hoạt. Bump sau commit."""
+    transaction.on_commit(bump_generation)
+
+
+class ActiveConfigCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._config = None
+        self._loaded_at = 0.0
+
+    @staticmethod
+    def _max_age():
+        return None if is_shared_cache() else settings.AI_PROMPT_CONFIG_LOCAL_TTL
+
+    def _cached(self, generation):
+        max_age = self._max_age()
+        with self._lock:
+            if self._generation is None or self._generation != generation:
+                return None
+            if max_age is not None and time.monotonic() - self._loaded_at >= max_age:
+                return None
+            return self._config
+
+    def _store(self, generation, config):
+        with self._lock:
+            self._generation = generation
+            self._config = config
+            self._loaded_at = time.monotonic()
+
+    @staticmethod
+    def _load():
+        return AIPromptConfig.objects.filter(is_active=True).first() or DefaultConfig()
+
+    @staticmethod
+    async def _aload():
+        return await AIPromptConfig.objects.filter(is_active=True).afirst() or DefaultConfig()
+
+    def get(self):
+        # Đọc generation TRƯỚC khi query để không giữ bản cũ dưới generation mới
+        generation = get_generation()
+        config = self._cached(generation)
+        if config is None:
+            config = self._load()
+            self._store(generation, config)
+        return config
+
+    async def aget(self):
+        generation = await cache.aget(GENERATION_CACHE_KEY)
+        if generation is None:
+            await cache.aadd(GENERATION_CACHE_KEY, _new_generation(), timeout=None)
+            generation = await cache.aget(GENERATION_CACHE_KEY)
+        config = self._cached(generation)
+        if config is None:
+            config = await self._aload()
+            self._store(generation, config)
+        return config
+
+    def clear(self):
+        self._store(None, None)
+
+
+active_config_cache = ActiveConfigCache()
@@ -0,0 +1,173 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from apps.ai.models import EmbeddingCache
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def normalize_text(text):
+    """Chuẩn hóa text trước khi hash/embed: gộp khoảng trắng, bỏ xuống dòng."""
+    if not text: return ""
+    return " ".join(str(text).split())
+
+
+def text_hash(text):
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def is_enabled():
+    return getattr(settings, 'AI_EMBEDDING_CACHE_ENABLED', True)
+
+
+def _record(hits, misses):
+    with _stats_lock:
+        _stats["hits"] += hits
+        _stats["misses"] += misses
+
+
+def get_cached_embeddings(model_name, task_type, texts):
+    """
+    Tra cache cho danh sách text (đã chuẩn hóa).
+    Trả về dict {text_hash: vector} của những text đã có trong cache.
+    """
+    if not texts or not is_enabled(): return {}
+
+    hashes = {text_hash(text) for text in texts}
+    try:
+        rows = list(
+            EmbeddingCache.objects.filter(
+                model_name=model_name,
+                task_type=task_type,
+                text_hash__in=hashes
+            ).values_list('id', 'text_hash', 'embedding', 'last_used_at')
+        )
+        # Chỉ ghi lại last_used_at / touch_count cho entry lâu chưa "chạm" (đủ cho prune theo ngày),
+        # tránh mỗi lần đọc cache đều UPDATE cùng các dòng nóng
+        now = timezone.now()
+        touch_before = now - timedelta(seconds=getattr(settings, 'AI_EMBEDDING_CACHE_TOUCH_INTERVAL', 86400))
+        stale_ids = [row[0] for row in rows if row[3] < touch_before]
+        if stale_ids:
+            EmbeddingCache.objects.filter(id__in=stale_ids).update(
+                touch_count=F('touch_count') + 1,
+                last_used_at=now
+            )
+    except Exception as e:
+        print(f"Error read embedding cache: {e}")
+        return {}
+
+    found = {row[1]: row[2].tolist() for row in rows}
+    hits = sum(1 for text in texts if text_hash(text) in found)
+    _record(hits, len(texts) - hits)
+    return found
+
+
+def store_embeddings(model_name, task_type, pairs):
+    """Lưu các cặp (text, vector) mới embed vào cache, bỏ qua bản ghi đã tồn tại."""
+    if not is_enabled(): return
+    entries = [
+        EmbeddingCache(
+            model_name=model_name,
+            task_type=task_type,
+            text_hash=text_hash(text),
+            embedding=vector
+        )
+        for text, vector in pairs if vector
+    ]
+    if not entries: return
+    try:
+        EmbeddingCache.objects.bulk_create(entries, ignore_conflicts=True)
+    except Exception as e:
+        print(f"Error write embedding cache: {e}")
+
+
+def prune_embedding_cache(days):
+    """Xóa các entry không được đọc trong `days` ngày gần nhất. Trả về số dòng đã xóa."""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = EmbeddingCache.objects.filter(last_used_at__lt=cutoff).delete()
+    return deleted
+
+
+def get_cache_stats():
+    """Hit / miss thật của process hiện tại (từ lúc khởi động) + số entry trong DB."""
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else 0.0,
+        "entries": EmbeddingCache.objects.count(),
+    }
+
+
+# ==========================================
+# LRU trong process cho vector của câu query chat
+# ==========================================
+class QueryEmbeddingLRU:
+    """
+    Cache LRU có giới hạn kích thước + TTL, thread-safe, nằm trong từng worker.
+    Đứng trước cache Postgres: query lặp lại không tốn cả round-trip DB lẫn API.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, vector)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._misses += 1
+                return None
+            expires_at, vector = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return vector
+
+    def set(self, key, vector):
+        if self.maxsize <= 0 or vector is None: return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, vector)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._hits = self._misses = 0
+
+    def stats(self):
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / total, 4) if total else 0.0,
+            }
+
+
+query_embedding_lru = QueryEmbeddingLRU(
+    maxsize=getattr(settings, 'AI_QUERY_EMBEDDING_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'AI_QUERY_EMBEDDING_CACHE_TTL', 3600),
+)
@@ -0,0 +1,251 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.ai.models import EmbeddingOutbox, EmbeddingJobStatus
+from apps.ai.services.ai_service import get_embeddings
+from apps.ai.services.embedding_cache import text_hash
+
+# model_label -> handler. Đăng ký trong apps/ai/signals.py
+_handlers = {}
+
+
+class EmbeddingHandler:
+    """
+    build_text(instance) -> text cần embed (rỗng = bỏ qua)
+    apply(instance, text, vector) -> ghi vector vào DB (KnowledgeBase, cột embedding...)
+    """
+
+    def __init__(self, model, build_text, apply, task_type="retrieval_document"):
+        self.model = model
+        self.build_text = build_text
+        self.apply = apply
+        self.task_type = task_type
+
+
+def register_embedding_handler(model, build_text, apply, task_type="retrieval_document"):
+    _handlers[model._meta.label_lower] = EmbeddingHandler(model, build_text, apply, task_type)
+
+
+def _outbox_enabled():
+    return getattr(settings, 'AI_EMBEDDING_OUTBOX', False)
+
+
+# ==========================================
+# 1. ENQUEUE (gọi từ signal, chỉ ghi DB)
+# ==========================================
+
+def enqueue_embedding(instance):
+    """
+    Ghi 1 job embedding cho instance. Mỗi (model, pk) chỉ có 1 dòng outbox:
+    job đang chờ được gộp lại, nội dung không đổi so với lần embed trước thì bỏ qua.
+    """
+    label = instance._meta.label_lower
+    handler = _handlers.get(label)
+    if handler is None or instance.pk is None:
+        return
+
+    text = handler.build_text(instance)
+    digest = text_hash(text) if text else ''
+    object_pk = str(instance.pk)
+
+    if not _outbox_enabled():
+        # Không có worker: embed ngay sau commit để không giữ transaction trong lúc gọi API
+        transaction.on_commit(lambda: process_objects(label, [object_pk]))
+        return
+
+    job, created = EmbeddingOutbox.objects.get_or_create(
+        model_label=label,
+        object_pk=object_pk,
+        defaults={'text_hash': digest}
+    )
+    if created:
+        return
+    if job.text_hash == digest and job.status != EmbeddingJobStatus.FAILED:
+        return
+
+    EmbeddingOutbox.objects.filter(id=job.id).update(
+        text_hash=digest,
+        status=EmbeddingJobStatus.PENDING,
+        attempts=0,
+        last_error='',
+        available_at=timezone.now(),
+        updated_at=timezone.now()
+    )
+
+
+def enqueue_embeddings(instances):
+    for instance in instances:
+        enqueue_embedding(instance)
+
+
+def enqueue_missing_embeddings(model, field_name, batch_size=500):
+    """
+    Ghi job cho mọi dòng có cột vector đang NULL (vd. sau `resize_embeddings` tăng số chiều).
+    Không cần so text_hash: vector đã mất nên job cũ (kể cả DONE) đều chạy lại.
+    Trả về số dòng đã đưa vào hàng đợi (0 nếu model không có handler).
+    """
+    label = model._meta.label_lower
+    if label not in _handlers:
+        return 0
+    object_pks = [
+        str(pk) for pk in model.objects.filter(**{f"{field_name}__isnull": True}).values_list('pk', flat=True)
+    ]
+
+    for start in range(0, len(object_pks), batch_size):
+        chunk = object_pks[start:start + batch_size]
+        if not _outbox_enabled():
+            process_objects(label, chunk)
+            continue
+        EmbeddingOutbox.objects.bulk_create(
+            [EmbeddingOutbox(model_label=label, object_pk=pk) for pk in chunk],
+            ignore_conflicts=True
+        )
+        EmbeddingOutbox.objects.filter(model_label=label, object_pk__in=chunk).update(
+            text_hash='',
+            status=EmbeddingJobStatus.PENDING,
+            attempts=0,
+            last_error='',
+            available_at=timezone.now(),
+            updated_at=timezone.now()
+        )
+    return len(object_pks)
+
+
+# ==========================================
+# 2. XỬ LÝ (worker)
+# ==========================================
+
+def _embed_objects(label, objects):
+    """Embed 1 nhóm instance cùng model. Trả về {pk: (text, error)} cho từng pk."""
+    handler = _handlers[label]
+    results = {}
+
+    entries = []
+    for obj in objects:
+        text = handler.build_text(obj)
+        if text:
+            entries.append((obj, text))
+        else:
+            results[str(obj.pk)] = ('', None)
+
+    vectors = get_embeddings([text for _, text in entries], task_type=handler.task_type)
+    for (obj, text), vector in zip(entries, vectors):
+        if not vector:
+            results[str(obj.pk)] = (text, "Không tạo được vector")
+            continue
+        try:
+            handler.apply(obj, text, vector)
+            results[str(obj.pk)] = (text, None)
+        except Exception as e:
+            results[str(obj.pk)] = (text, str(e))
+    return results
+
+
+def process_objects(label, object_pks):
+    """Embed trực tiếp (không qua outbox) - dùng khi AI_EMBEDDING_OUTBOX=False."""
+    handler = _handlers.get(label)
+    if handler is None: return
+    try:
+        objects = list(handler.model.objects.filter(pk__in=object_pks))
+        for pk, (_, error) in _embed_objects(label, objects).items():
+            if error:
+                print(f"Lỗi embedding {label}#{pk}: {error}")
+    except Exception as e:
+        print(f"Lỗi embedding {label}: {e}")
+
+
+def requeue_stuck_jobs(timeout_minutes=10):
+    """Job kẹt ở PROCESSING (worker chết giữa chừng) -> trả về PENDING."""
+    cutoff = timezone.now() - timedelta(minutes=timeout_minutes)
+    return EmbeddingOutbox.objects.filter(
+        status=EmbeddingJobStatus.PROCESSING,
+        updated_at__lt=cutoff
+    ).update(status=EmbeddingJobStatus.PENDING, updated_at=timezone.now())
+
+
+def claim_jobs(batch_size=100):
+    """Lấy tối đa batch_size job PENDING (SKIP LOCKED để chạy được nhiều worker)."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            EmbeddingOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=EmbeddingJobStatus.PENDING, available_at__lte=now)
+            .order_by('available_at')[:batch_size]
+        )
+        if jobs:
+            EmbeddingOutbox.objects.filter(id__in=[job.id for job in jobs]).update(
+                status=EmbeddingJobStatus.PROCESSING,
+                attempts=F('attempts') + 1,
+                updated_at=now
+            )
+    for job in jobs:
+        job.attempts += 1
+    return jobs
+
+
+def process_jobs(jobs, max_attempts=None):
+    """Embed các job đã claim theo từng model, ghi kết quả + retry với backoff."""
+    max_attempts = max_attempts or getattr(settings, 'AI_EMBEDDING_OUTBOX_MAX_ATTEMPTS', 5)
+    stats = {"done": 0, "retry": 0, "failed": 0}
+
+    by_label = {}
+    for job in jobs:
+        by_label.setdefault(job.model_label, []).append(job)
+
+    for label, label_jobs in by_label.items():
+        handler = _handlers.get(label)
+        if handler is None:
+            results = {}
+            objects = {}
+        else:
+            objects = handler.model.objects.in_bulk([job.object_pk for job in label_jobs])
+            objects = {str(pk): obj for pk, obj in objects.items()}
+            try:
+                results = _embed_objects(label, list(objects.values()))
+            except Exception as e:
+                results = {pk: ('', str(e)) for pk in objects}
+
+        for job in label_jobs:
+            # Chỉ chốt trạng thái nếu không có ai enqueue lại trong lúc đang xử lý
+            # (enqueue lại sẽ đổi text_hash và đưa dòng về PENDING -> để nguyên cho lượt sau)
+            current = EmbeddingOutbox.objects.filter(id=job.id, text_hash=job.text_hash)
+
+            if handler is None or job.object_pk not in objects:
+                # Model không còn handler hoặc object đã bị xóa -> không còn gì để embed
+                current.update(status=EmbeddingJobStatus.DONE, updated_at=timezone.now())
+                stats["done"] += 1
+                continue
+
+            text, error = results.get(job.object_pk, ('', "Không có kết quả"))
+            if error is None:
+                current.update(
+                    status=EmbeddingJobStatus.DONE,
+                    text_hash=text_hash(text) if text else '',
+                    last_error='',
+                    updated_at=timezone.now()
+                )
+                stats["done"] += 1
+            elif job.attempts >= max_attempts:
+                current.update(status=EmbeddingJobStatus.FAILED, last_error=error[:2000], updated_at=timezone.now())
+                stats["failed"] += 1
+            else:
+                current.update(
+                    status=EmbeddingJobStatus.PENDING,
+                    last_error=error[:2000],
+                    available_at=timezone.now() + timedelta(seconds=2 ** job.attempts),
+                    updated_at=timezone.now()
+                )
+                stats["retry"] += 1
+    return stats
+
+
+def drain_outbox(batch_size=100, max_attempts=None):
+    """Xử lý 1 batch. Trả về số job đã claim + thống kê."""
+    jobs = claim_jobs(batch_size)
+    if not jobs:
+        return 0, {"done": 0, "retry": 0, "failed": 0}
+    return len(jobs), process_jobs(jobs, max_attempts)
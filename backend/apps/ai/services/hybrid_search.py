@@ -0,0 +1,167 @@
+import re
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F, Q, Value
+
+from apps.ai.models import KnowledgeBase, ContentType, PUBLIC_CONTENT_TYPES
+
+# ==========================================
+# Hybrid retrieval cho RAG: full-text (tsvector 'simple' + GIN) + vector,
+# gộp bằng reciprocal-rank fusion. Khi embedding chậm / lỗi -> chỉ dùng nhánh full-text.
+# ==========================================
+
+RRF_K = 60
+MAX_QUERY_TERMS = 16
+# Mỗi tài liệu có thể có nhiều đoạn -> lấy dư ứng viên rồi giữ đoạn tốt nhất của mỗi tài liệu
+PASSAGE_FANOUT = 3
+
+# Hư từ rất phổ biến trong câu hỏi, khớp gần như mọi tài liệu -> bỏ khỏi query full-text
+STOPWORDS = {
+    'là', 'của', 'và', 'có', 'cho', 'tôi', 'em', 'mình', 'bạn', 'các', 'những', 'được',
+    'không', 'thì', 'này', 'đó', 'với', 'một', 'nào', 'gì', 'sao', 'như', 'thế', 'ạ',
+    'nên', 'muốn', 'về', 'trong', 'khi', 'để', 'hay', 'hoặc', 'cũng', 'rất', 'lại',
+}
+
+
+def query_terms(text):
+    """Từ khóa của câu query (chữ thường, NFC, bỏ hư từ, giữ thứ tự, không trùng)."""
+    text = unicodedata.normalize('NFC', text or '').lower()
+    terms = []
+    for word in re.findall(r'\w+', text):
+        if len(word) < 2 or word in STOPWORDS or word in terms: continue
+        terms.append(word)
+        if len(terms) >= MAX_QUERY_TERMS: break
+    return terms
+
+
+def lexical_query(text):
+    """
+    tsquery dạng OR các từ khóa. Dữ liệu có chỗ lưu NFC, có chỗ NFD
+    -> với từ có dấu thêm cả bản NFD.
+    """
+    lexemes = []
+    for term in query_terms(text):
+        lexemes.append(term)
+        decomposed = unicodedata.normalize('NFD', term)
+        if decomposed != term:
+            lexemes.append(decomposed)
+    if not lexemes:
+        return None
+    return SearchQuery(" | ".join(f"'{lexeme}'" for lexeme in lexemes), config='simple', search_type='raw')
+
+
+def parent_key(content_type, reference_id):
+    """Các đoạn của cùng 1 tài liệu gốc có chung key này."""
+    return f"{content_type}:{reference_id}"
+
+
+def best_per_parent(candidates, top_k):
+    """candidates đã sắp xếp (tốt nhất trước), phần tử cuối là parent key -> mỗi tài liệu 1 đoạn."""
+    picked, seen = [], set()
+    for candidate in candidates:
+        if candidate[-1] in seen: continue
+        seen.add(candidate[-1])
+        picked.append(candidate)
+        if len(picked) >= top_k: break
+    return picked
+
+
+def lexical_search(query_text, top_k=5, content_types=None, owner_id=None):
+    """
+    Full-text trên KnowledgeBase.search_vector, xếp hạng bằng ts_rank_cd (cover density,
+    chuẩn hóa theo độ dài tài liệu - gần với BM25).
+    Trả về list (rank, id, content_text, parent_key), mỗi tài liệu gốc 1 đoạn.
+    """
+    query = lexical_query(query_text)
+    if query is None: return []
+    if content_types is None:
+        content_types = PUBLIC_CONTENT_TYPES
+
+    public_types = [ctype for ctype in content_types if ctype != ContentType.USER_CONTEXT]
+    scope = Q(content_type__in=public_types)
+    if owner_id is not None:
+        scope |= Q(content_type=ContentType.USER_CONTEXT, reference_id=str(owner_id))
+
+    rows = KnowledgeBase.objects.filter(scope, search_vector=query).annotate(
+        # normalization 1: chia cho 1 + log(số từ của tài liệu)
+        rank=SearchRank(F('search_vector'), query, cover_density=True, normalization=Value(1))
+    ).order_by('-rank').values_list(
+        'rank', 'id', 'content_text', 'content_type', 'reference_id'
+    )[:top_k * PASSAGE_FANOUT]
+    return best_per_parent(
+        [(rank, doc_id, text, parent_key(ctype, ref)) for rank, doc_id, text, ctype, ref in rows], top_k
+    )
+
+
+def rrf_fuse(*ranked_lists, k=RRF_K):
+    """
+    Reciprocal-rank fusion: score(doc) = sum 1 / (k + rank) trên các danh sách.
+    Mỗi danh sách là list (id, text, parent_key) theo thứ tự liên quan giảm dần.
+    Trả về list text, mỗi tài liệu gốc chỉ giữ đoạn có điểm cao nhất.
+    """
+    scores, entries = {}, {}
+    for ranked in ranked_lists:
+        for rank, (doc_id, text, parent) in enumerate(ranked, start=1):
+            doc_id = str(doc_id)  # index NumPy giữ id dạng str, DB trả UUID
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+            entries[doc_id] = (text, parent)
+    ordered = sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
+    picked = best_per_parent([entries[doc_id] for doc_id in ordered], len(ordered))
+    return [text for text, _ in picked]
+
+
+# ==========================================
+# Embedding có timeout: quá AI_RAG_EMBEDDING_TIMEOUT hoặc lỗi -> bỏ qua nhánh vector
+# và không thử lại trong AI_RAG_EMBEDDING_COOLDOWN giây (tránh mỗi request đều phải chờ).
+# ==========================================
+
+class EmbeddingCircuit:
+    def __init__(self):
+        self._down_until = 0.0
+
+    def is_available(self):
+        return time.monotonic() >= self._down_until
+
+    def mark_down(self):
+        self._down_until = time.monotonic() + settings.AI_RAG_EMBEDDING_COOLDOWN
+
+    def mark_up(self):
+        self._down_until = 0.0
+
+
+embedding_circuit = EmbeddingCircuit()
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='rag-embed')
+
+
+def _run_and_close(func, *args):
+    try:
+        return func(*args)
+    finally:
+        connections.close_all()
+
+
+def embed_with_timeout(func, text):
+    """Gọi func(text) (get_query_embedding) trong thread riêng, chờ tối đa AI_RAG_EMBEDDING_TIMEOUT."""
+    if not embedding_circuit.is_available():
+        return None
+    future = _executor.submit(_run_and_close, func, text)
+    try:
+        vector = future.result(timeout=settings.AI_RAG_EMBEDDING_TIMEOUT)
+    except FutureTimeoutError:
+        # Thread vẫn chạy tiếp và ghi vào cache -> lần sau có thể lấy ngay
+        print("RAG embedding timeout -> lexical only")
+        vector = None
+    except Exception as e:
+        print(f"RAG embedding error: {e}")
+        vector = None
+
+    if vector is None:
+        embedding_circuit.mark_down()
+    else:
+        embedding_circuit.mark_up()
+    return vector
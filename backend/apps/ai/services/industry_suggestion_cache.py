@@ -0,0 +1,75 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from apps.ai.models import IndustrySuggestionCache
+from apps.career.models import Industry
+from utils.cache import is_shared_cache
+
+# ==========================================
+# Gợi ý lĩnh vực chỉ phụ thuộc (MBTI, Holland, [bio], danh sách Industry)
+# -> lưu kết quả của AI theo key đó. Danh sách Industry (text gửi cho AI + hash)
+# được giữ trong cache, signal của Industry xóa đi khi có thay đổi.
+# Cache chỉ trong process (LocMem) thì lệnh xóa không tới worker khác -> chỉ giữ
+# AI_INDUSTRY_CATALOG_LOCAL_TTL giây.
+# ==========================================
+
+CATALOG_CACHE_KEY = 'industry_catalog'
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def use_bio():
+    return getattr(settings, 'AI_INDUSTRY_SUGGESTION_USE_BIO', False)
+
+
+def get_industry_catalog():
+    """Trả về (industries_text, catalog_hash)."""
+    catalog = cache.get(CATALOG_CACHE_KEY)
+    if catalog is None:
+        industries_list = list(Industry.objects.order_by('id').values('id', 'name', 'description'))
+        text = json.dumps(industries_list, ensure_ascii=False)
+        catalog = (text, _sha256(text))
+        timeout = None if is_shared_cache() else settings.AI_INDUSTRY_CATALOG_LOCAL_TTL
+        cache.set(CATALOG_CACHE_KEY, catalog, timeout=timeout)
+    return catalog
+
+
+def invalidate_industry_catalog():
+    transaction.on_commit(lambda: cache.delete(CATALOG_CACHE_KEY))
+
+
+def _key(mbti, holland, bio, catalog_hash):
+    return {
+        "mbti": mbti.strip().upper(),
+        "holland": holland.strip().upper(),
+        "bio_hash": _sha256((bio or '').strip()) if use_bio() else '',
+        "catalog_hash": catalog_hash,
+    }
+
+
+def get_cached_suggestions(mbti, holland, bio, catalog_hash):
+    key = _key(mbti, holland, bio, catalog_hash)
+    entry = IndustrySuggestionCache.objects.filter(**key).only('id', 'suggestions').first()
+    if entry is None:
+        return None
+    IndustrySuggestionCache.objects.filter(id=entry.id).update(hit_count=F('hit_count') + 1)
+    return entry.suggestions
+
+
+def store_suggestions(mbti, holland, bio, catalog_hash, suggestions):
+    if not suggestions: return
+    try:
+        IndustrySuggestionCache.objects.update_or_create(
+            **_key(mbti, holland, bio, catalog_hash),
+            defaults={'suggestions': suggestions}
+        )
+    except IntegrityError:
+        # Request khác vừa ghi cùng key
+        pass
@@ -0,0 +1,154 @@
+import re
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.ai.models import KnowledgeBase
+from apps.ai.services.ai_service import get_embeddings
+from apps.ai.services.embedding_cache import normalize_text
+from apps.ai.services.token_budget import CHARS_PER_TOKEN, estimate_tokens
+
+# ==========================================
+# Chia tài liệu dài (career, course...) thành các đoạn chồng lấn nhau trước khi embed.
+# Mỗi đoạn là 1 dòng KnowledgeBase (cùng content_type + reference_id, khác chunk_index)
+# và đều mở đầu bằng phần header (tiêu đề...) để tự đứng được khi đưa vào prompt.
+# ==========================================
+
+_SENTENCE_END = re.compile(r'(?<=[.!?;])\s+')
+
+
+def _units(text, max_chars):
+    """Tách theo câu; câu dài hơn max_chars thì tách tiếp theo từ."""
+    units = []
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence: continue
+        if len(sentence) <= max_chars:
+            units.append(sentence)
+            continue
+        piece = []
+        for word in sentence.split():
+            if piece and len(" ".join(piece + [word])) > max_chars:
+                units.append(" ".join(piece))
+                piece = []
+            piece.append(word)
+        if piece:
+            units.append(" ".join(piece))
+    return units
+
+
+def split_passages(text, max_tokens=None, overlap_tokens=None):
+    """Chia text thành các đoạn <= max_tokens (ước lượng); đoạn sau lặp lại ~overlap_tokens cuối đoạn trước."""
+    max_tokens = max_tokens or settings.AI_KB_CHUNK_TOKENS
+    overlap_tokens = settings.AI_KB_CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    overlap_chars = min(overlap_tokens * CHARS_PER_TOKEN, max_chars // 2)
+
+    text = normalize_text(text)
+    if len(text) <= max_chars:
+        return [text] if text else []
+
+    passages, current = [], []
+    for unit in _units(text, max_chars):
+        if current and len(" ".join(current + [unit])) > max_chars:
+            passages.append(" ".join(current))
+            # Giữ lại các câu cuối (tổng <= overlap_chars) làm phần chồng lấn
+            tail = []
+            for prev in reversed(current):
+                if len(" ".join([prev] + tail)) > overlap_chars: break
+                tail.insert(0, prev)
+            current = tail if len(" ".join(tail + [unit])) <= max_chars else []
+        current.append(unit)
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+def build_passages(header, body):
+    """Header + body vừa 1 đoạn -> 1 đoạn; ngược lại mỗi đoạn của body đều được gắn header."""
+    header = normalize_text(header)
+    body = normalize_text(body)
+    full = f"{header} {body}".strip()
+    max_tokens = settings.AI_KB_CHUNK_TOKENS
+    if estimate_tokens(full) <= max_tokens:
+        return [full] if full else []
+
+    body_tokens = max(max_tokens - estimate_tokens(header), max_tokens // 2)
+    return [f"{header} {chunk}".strip() for chunk in split_passages(body, body_tokens)]
+
+
+class KBDocument:
+    """
+    1 tài liệu gốc cần ghi vào KnowledgeBase.
+    full_text / full_vector: text + vector của cả tài liệu nếu đã embed sẵn
+    (vd. Career.embedding) -> tài liệu chỉ có 1 đoạn trùng text thì không embed lại.
+    """
+
+    def __init__(self, content_type, reference_id, header, body, metadata, full_text=None, full_vector=None):
+        self.content_type = content_type
+        self.reference_id = str(reference_id)
+        self.metadata = metadata or {}
+        self.passages = build_passages(header, body)
+        self.full_text = normalize_text(full_text) if full_text else None
+        self.full_vector = full_vector
+
+
+def save_passages(content_type, reference_id, passages, vectors, metadata):
+    """Ghi các đoạn của 1 tài liệu (thay thế toàn bộ đoạn cũ)."""
+    reference_id = str(reference_id)
+    with transaction.atomic():
+        for index, (text, vector) in enumerate(zip(passages, vectors)):
+            KnowledgeBase.objects.update_or_create(
+                content_type=content_type,
+                reference_id=reference_id,
+                chunk_index=index,
+                defaults={
+                    'content_text': text,
+                    'embedding': vector,
+                    'metadata': {**metadata, 'chunk': index, 'chunks': len(passages)}
+                }
+            )
+        # Tài liệu ngắn lại -> xóa các đoạn thừa (delete() từng dòng để signal cập nhật index)
+        for stale in KnowledgeBase.objects.filter(
+            content_type=content_type, reference_id=reference_id, chunk_index__gte=len(passages)
+        ):
+            stale.delete()
+
+
+def sync_documents(documents):
+    """
+    Embed các đoạn của nhiều tài liệu trong cùng các batch rồi ghi vào KnowledgeBase.
+    Trả về list lỗi (None = thành công) theo đúng thứ tự documents.
+    """
+    vectors = {}
+    pending = []
+    for doc_idx, doc in enumerate(documents):
+        for index, text in enumerate(doc.passages):
+            if doc.full_vector is not None and len(doc.passages) == 1 and text == doc.full_text:
+                vectors[(doc_idx, index)] = doc.full_vector
+            else:
+                pending.append(((doc_idx, index), text))
+
+    if pending:
+        embedded = get_embeddings([text for _, text in pending], task_type="retrieval_document")
+        for (key, _), vector in zip(pending, embedded):
+            vectors[key] = vector
+
+    errors = []
+    for doc_idx, doc in enumerate(documents):
+        doc_vectors = [vectors.get((doc_idx, index)) for index in range(len(doc.passages))]
+        if not doc.passages:
+            errors.append("Tài liệu rỗng")
+        elif any(vector is None for vector in doc_vectors):
+            errors.append("Không tạo được vector cho một số đoạn")
+        else:
+            save_passages(doc.content_type, doc.reference_id, doc.passages, doc_vectors, doc.metadata)
+            errors.append(None)
+    return errors
+
+
+def sync_document(document):
+    """1 tài liệu; lỗi -> raise để outbox retry."""
+    error = sync_documents([document])[0]
+    if error:
+        raise ValueError(error)
@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+
+import numpy as np
+from django.conf import settings
+
+from apps.ai.services.model_pool import model_pool
+
+# ==========================================
+# Backend sinh embedding / câu trả lời, chọn bằng settings.AI_PROVIDER:
+# - 'gemini': Google Gemini (cần GEMINI_API_KEY + mạng).
+# - 'local': chạy offline, kết quả cố định theo input -> load test / dev không cần API.
+#   Embedding: feature hashing các từ + cặp từ; câu trả lời: template, độ trễ giả lập
+#   bằng AI_LOCAL_LATENCY_MS / AI_LOCAL_EMBEDDING_LATENCY_MS.
+# ==========================================
+
+
+class GeminiProvider:
+    name = 'gemini'
+    embedding_model = "models/text-embedding-004"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._configured = False
+
+    def _genai(self):
+        """Import + configure SDK ở lần gọi đầu tiên (không làm khi import module)."""
+        import google.generativeai as genai
+        if not self._configured:
+            with self._lock:
+                if not self._configured:
+                    if settings.GEMINI_API_KEY:
+                        genai.configure(api_key=settings.GEMINI_API_KEY)
+                    self._configured = True
+        return genai
+
+    @staticmethod
+    def is_item_error(error):
+        """400 (InvalidArgument...): do nội dung request -> tách batch nhỏ hơn có thể thành công."""
+        from google.api_core import exceptions
+        return isinstance(error, exceptions.BadRequest)
+
+    def embed(self, texts, task_type, dimensions):
+        result = self._genai().embed_content(
+            model=self.embedding_model,
+            content=texts,
+            task_type=task_type,
+            output_dimensionality=dimensions
+        )
+        return result['embedding']
+
+    async def aembed(self, text, task_type, dimensions):
+        result = await self._genai().embed_content_async(
+            model=self.embedding_model,
+            content=text,
+            task_type=task_type,
+            output_dimensionality=dimensions
+        )
+        return result['embedding']
+
+    def _model(self, model_name, temperature):
+        self._genai()
+        return model_pool.get(model_name, temperature=temperature)
+
+    def generate(self, prompt, model_name, temperature):
+        return self._model(model_name, temperature).generate_content(prompt)
+
+    async def agenerate(self, prompt, model_name, temperature):
+        return await self._model(model_name, temperature).generate_content_async(prompt)
+
+    def stream(self, prompt, model_name, temperature):
+        response = self._model(model_name, temperature).generate_content(prompt, stream=True)
+        for chunk in response:
+            # Chunk bị chặn (safety) không có parts -> .text sẽ raise
+            if chunk.parts:
+                yield chunk.text
+
+
+# ==========================================
+# LOCAL PROVIDER
+# ==========================================
+
+class LocalResponse:
+    """Giống response của Gemini ở những chỗ code đang dùng (.text, .parts)."""
+
+    def __init__(self, text):
+        self.text = text
+        self.parts = [text] if text else []
+
+
+def _digest(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def hash_embedding(text, dimensions):
+    """
+    Vector cố định theo text (không phụ thuộc process / PYTHONHASHSEED): mỗi từ và cặp từ liền nhau
+    cộng +-1 vào 1 chiều theo hash, rồi chuẩn hóa. Text chung nhiều từ -> cosine gần nhau.
+    """
+    words = re.findall(r'\w+', unicodedata.normalize('NFC', text or '').lower())
+    features = [(word, 1.0) for word in words]
+    features += [(f"{a} {b}", 0.5) for a, b in zip(words, words[1:])]
+
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for feature, weight in features:
+        h = _digest(feature)
+        vector[h % dimensions] += weight if (h >> 63) & 1 else -weight
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        # Text không có từ nào -> vẫn trả vector hợp lệ (cosine với vector 0 là NaN)
+        vector[_digest(text or '') % dimensions] = 1.0
+        norm = 1.0
+    return (vector / norm).tolist()
+
+
+_INDUSTRY_CATALOG = re.compile(r'^\s*(\[\{"id".*\])\s*$', re.MULTILINE)
+_CAREER_TITLE = re.compile(r'vị trí: (.+?)\.\s*$', re.MULTILINE)
+_LAST_LINE = re.compile(r'[^\n]*\S[^\n]*$')
+
+
+def _industry_template(prompt):
+    """Prompt của suggest_industries_via_ai: chọn 3 lĩnh vực (cố định theo prompt) trong danh sách."""
+    match = _INDUSTRY_CATALOG.search(prompt)
+    industries = json.loads(match.group(1)) if match else []
+    picked = sorted(industries, key=lambda item: _digest(f"{prompt}:{item['id']}"))[:3]
+    return json.dumps([
+        {
+            "industry_id": item['id'],
+            "industry_name": item['name'],
+            "match_score": 90 - 10 * rank,
+            "reasoning": f"[local] Gợi ý mẫu cho lĩnh vực {item['name']}."
+        }
+        for rank, item in enumerate(picked)
+    ], ensure_ascii=False)
+
+
+def _learning_path_template(prompt):
+    """Prompt của generate_learning_path_steps: 10 bước mẫu theo tên nghề."""
+    match = _CAREER_TITLE.search(prompt)
+    title = match.group(1).strip() if match else "nghề này"
+    return json.dumps([
+        {"step_name": f"Bước {i}: {title}", "description": f"[local] Nội dung mẫu cho bước {i} của lộ trình {title}."}
+        for i in range(1, 11)
+    ], ensure_ascii=False)
+
+
+def _text_template(prompt):
+    """Chat / tóm tắt: câu trả lời mẫu nhắc lại dòng cuối của prompt (thường là câu hỏi)."""
+    match = _LAST_LINE.search(prompt.strip())
+    tail = match.group(0).strip()[:200] if match else ""
+    return (
+        f"[local] Đây là câu trả lời mẫu (AI_PROVIDER=local) cho: \"{tail}\". "
+        f"Prompt dài {len(prompt)} ký tự."
+    )
+
+
+# (dấu hiệu trong prompt, template) - kiểm tra theo thứ tự, không khớp -> _text_template
+COMPLETION_TEMPLATES = [
+    ('"industry_id"', _industry_template),
+    ('"step_name"', _learning_path_template),
+]
+
+
+def render_completion(prompt):
+    for marker, template in COMPLETION_TEMPLATES:
+        if marker in prompt:
+            return template(prompt)
+    return _text_template(prompt)
+
+
+class LocalProvider:
+    name = 'local'
+    embedding_model = "local/hash-embedding-v1"
+
+    @staticmethod
+    def _latency(setting):
+        return max(0, getattr(settings, setting)) / 1000
+
+    @staticmethod
+    def is_item_error(error):
+        return False
+
+    def embed(self, texts, task_type, dimensions):
+        time.sleep(self._latency('AI_LOCAL_EMBEDDING_LATENCY_MS'))
+        return [hash_embedding(text, dimensions) for text in texts]
+
+    async def aembed(self, text, task_type, dimensions):
+        await asyncio.sleep(self._latency('AI_LOCAL_EMBEDDING_LATENCY_MS'))
+        return hash_embedding(text, dimensions)
+
+    def generate(self, prompt, model_name, temperature):
+        time.sleep(self._latency('AI_LOCAL_LATENCY_MS'))
+        return LocalResponse(render_completion(prompt))
+
+    async def agenerate(self, prompt, model_name, temperature):
+        await asyncio.sleep(self._latency('AI_LOCAL_LATENCY_MS'))
+        return LocalResponse(render_completion(prompt))
+
+    def stream(self, prompt, model_name, temperature):
+        """Chia độ trễ đều cho các đoạn (mỗi đoạn ~8 từ), giống nhịp stream của Gemini."""
+        words = render_completion(prompt).split(" ")
+        chunks = [" ".join(words[i:i + 8]) for i in range(0, len(words), 8)]
+        delay = self._latency('AI_LOCAL_LATENCY_MS') / max(1, len(chunks))
+        for i, chunk in enumerate(chunks):
+            time.sleep(delay)
+            yield chunk if i == 0 else f" {chunk}"
+
+
+PROVIDERS = {
+    GeminiProvider.name: GeminiProvider,
+    LocalProvider.name: LocalProvider,
+}
+_instances = {}
+
+
+def get_provider(name=None):
+    """Provider theo settings.AI_PROVIDER (mỗi loại 1 instance trong process)."""
+    name = name or settings.AI_PROVIDER
+    provider = _instances.get(name)
+    if provider is None:
+        if name not in PROVIDERS:
+            raise ValueError(f"AI_PROVIDER không hợp lệ: {name!r} (chọn: {', '.join(PROVIDERS)})")
+        provider = _instances.setdefault(name, PROVIDERS[name]())
+    return provider
@@ -0,0 +1,86 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# ==========================================
+# Pool GenerativeModel dùng lại trong cả worker.
+# Mỗi (model, temperature, generation_config, safety_settings) chỉ tạo 1 lần
+# -> không dựng lại object GenerativeModel cho từng request. Kết nối tới API thì
+# không nằm ở đây: SDK (google-generativeai 0.8) dùng 1 client mặc định chung cả process.
+# Kèm thống kê số lần gọi / lỗi / latency theo từng model (mọi provider, xem llm_provider).
+# SDK Gemini chỉ được import khi thật sự tạo model (AI_PROVIDER=local không cần).
+# ==========================================
+
+def _freeze(value):
+    if value is None: return None
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class GenerativeModelPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._stats = {}
+
+    def get(self, model_name, temperature=0.7, generation_config=None, safety_settings=None):
+        config = dict(generation_config or {})
+        config["temperature"] = float(temperature)
+        key = (model_name, _freeze(config), _freeze(safety_settings))
+
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                import google.generativeai as genai
+                model = genai.GenerativeModel(
+                    model_name=model_name,
+                    generation_config=config,
+                    safety_settings=safety_settings
+                )
+                self._models[key] = model
+        return model
+
+    def record(self, model_name, elapsed_ms, error=False):
+        with self._lock:
+            stats = self._stats.setdefault(model_name, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+    @contextmanager
+    def track(self, model_name):
+        """with model_pool.track(name): ... -> ghi latency + lỗi của 1 lần gọi."""
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.record(model_name, (time.perf_counter() - start) * 1000, error)
+
+    def stats(self):
+        with self._lock:
+            models = {
+                name: {
+                    "calls": s["calls"],
+                    "errors": s["errors"],
+                    "avg_ms": round(s["total_ms"] / s["calls"], 1) if s["calls"] else 0,
+                    "max_ms": round(s["max_ms"], 1),
+                }
+                for name, s in self._stats.items()
+            }
+            return {"clients": len(self._models), "models": models}
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+
+
+model_pool = GenerativeModelPool()
@@ -0,0 +1,88 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from utils.cache import is_shared_cache
+
+# ==========================================
+# Cache context hồ sơ (kết quả get_info_user) theo từng user.
+# Key gắn version: ghi profile / skill / interest -> bump version sau commit,
+# entry cũ tự hết hạn. Reader đọc version TRƯỚC khi build nên không thể ghi
+# dữ liệu cũ vào version mới.
+# Cache chỉ trong process (LocMem): bump version chỉ tới worker đã xử lý thay đổi
+# -> entry giữ tối đa AI_PROFILE_CONTEXT_LOCAL_TTL giây để worker khác không dùng context cũ lâu.
+# ==========================================
+
+def _version_key(user_id):
+    return f'profile_ctx_version:{user_id}'
+
+
+def _context_key(user_id, version):
+    return f'profile_ctx:{user_id}:{version}'
+
+
+def _new_version():
+    return str(time.time_ns())
+
+
+def _ttl():
+    # Context có tuổi (tính theo ngày) nên không cache vô hạn
+    ttl = getattr(settings, 'AI_PROFILE_CONTEXT_CACHE_TTL', 86400)
+    if not is_shared_cache():
+        ttl = min(ttl, getattr(settings, 'AI_PROFILE_CONTEXT_LOCAL_TTL', 30))
+    return ttl
+
+
+def is_enabled():
+    return _ttl() > 0
+
+
+def get_profile_version(user_id):
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        cache.add(_version_key(user_id), _new_version(), timeout=None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def bump_profile_version(user_id):
+    cache.set(_version_key(user_id), _new_version(), timeout=None)
+
+
+def invalidate_profile_context(user_id):
+    """Gọi khi dữ liệu hồ sơ đổi; bump sau commit để reader không cache bản chưa commit."""
+    if user_id is None: return
+    transaction.on_commit(lambda: bump_profile_version(user_id))
+
+
+def get_profile_context(user_id, build):
+    """Trả về (user_profile_context, is_profile_missing, current_job); build() chỉ chạy khi miss."""
+    if not is_enabled():
+        return build()
+
+    key = _context_key(user_id, get_profile_version(user_id))
+    info = cache.get(key)
+    if info is None:
+        info = build()
+        cache.set(key, info, timeout=_ttl())
+    return tuple(info)
+
+
+async def aget_profile_context(user_id, abuild):
+    """Bản async của get_profile_context (abuild là coroutine function)."""
+    if not is_enabled():
+        return await abuild()
+
+    version = await cache.aget(_version_key(user_id))
+    if version is None:
+        await cache.aadd(_version_key(user_id), _new_version(), timeout=None)
+        version = await cache.aget(_version_key(user_id))
+
+    key = _context_key(user_id, version)
+    info = await cache.aget(key)
+    if info is None:
+        info = await abuild()
+        await cache.aset(key, info, timeout=_ttl())
+    return tuple(info)
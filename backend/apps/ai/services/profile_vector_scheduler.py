@@ -0,0 +1,59 @@
+import threading
+
+from django.db import transaction
+
+_local = threading.local()
+
+
+def _flush(pending):
+    """Mỗi user bẩn chỉ được đưa vào outbox đúng 1 lần."""
+    from apps.users.models import UserProfile
+    from apps.ai.services.embedding_outbox import enqueue_embedding
+
+    for profile in UserProfile.objects.filter(user_id__in=pending).select_related('user'):
+        try:
+            enqueue_embedding(profile)
+        except Exception as e:
+            print(f"Lỗi update profile vector (user {profile.user_id}): {e}")
+
+
+def _flush_pending():
+    """
+    Callback on_commit: lấy toàn bộ tập đang chờ rồi xóa. Mỗi lần đánh dấu đăng ký 1 callback
+    -> callback đầu tiên sau commit xử lý hết, các callback sau thấy tập rỗng và bỏ qua.
+    """
+    pending = getattr(_local, 'pending', None)
+    _local.pending = None
+    if pending:
+        _flush(pending)
+
+
+def reset_pending():
+    """
+    Bỏ tập đang chờ còn sót từ transaction đã rollback (gọi ở đầu mỗi request, signal request_started).
+    Không bắt buộc: phần sót chỉ làm lần commit sau tính lại thừa vài profile.
+    """
+    _local.pending = None
+
+
+def mark_profile_dirty(user_id):
+    """
+    Đánh dấu "profile_vector của user cần tính lại".
+    Trong 1 transaction, mọi lần đánh dấu (serializer, view, signal của profile /
+    skill / interest ở cả 2 module signals) được gộp lại và chỉ tính 1 lần sau commit.
+    Transaction rollback -> không tính.
+    """
+    if user_id is None: return
+
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        # Autocommit: không có gì để gộp, xử lý luôn
+        _flush({user_id})
+        return
+
+    if getattr(_local, 'pending', None) is None:
+        _local.pending = set()
+    _local.pending.add(user_id)
+    # Luôn đăng ký (không nhớ "đã đăng ký"): savepoint rollback hủy callback của nó
+    # mà không báo lại, các lần đánh dấu sau vẫn phải có callback riêng
+    transaction.on_commit(_flush_pending)
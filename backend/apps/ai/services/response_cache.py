@@ -0,0 +1,133 @@
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from pgvector.django import CosineDistance
+
+from apps.ai.models import ChatResponseCache
+from apps.ai.services.ai_service import get_active_config, get_query_embedding
+from apps.ai.services.embedding_cache import normalize_text
+from apps.ai.services.vector_search import hnsw_search
+from apps.users.models import UserProfile, UserSkill
+
+# ==========================================
+# Cache câu trả lời theo ngữ nghĩa (opt-in).
+# Chỉ dùng cho lượt đầu của session (chưa có lịch sử chat), và chỉ trả lại câu trả lời
+# đã sinh cho cùng config prompt + cùng nhóm hồ sơ (xem profile_bucket).
+# ==========================================
+
+def is_enabled():
+    return getattr(settings, 'AI_SEMANTIC_CACHE_ENABLED', False)
+
+
+def _config_fingerprint(config):
+    """Đổi nội dung config (template, temperature...) -> fingerprint mới -> cache cũ không còn khớp."""
+    parts = [
+        str(getattr(config, 'pk', 'default')),
+        str(config.temperature),
+        config.role_description,
+        config.missing_profile_template,
+        config.standard_prompt_template,
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+
+def profile_bucket(user):
+    """
+    Nhóm hồ sơ thô: hồ sơ thiếu hay đủ, MBTI, Holland, trình độ, công việc hiện tại và hash tập kỹ năng.
+    Các user cùng nhóm dùng chung câu trả lời; bio / tuổi / tên... không tính vào
+    (câu trả lời nhắc tên thì đã không được lưu).
+    """
+    profile = UserProfile.objects.filter(user_id=user.pk).values(
+        'mbti_result', 'holland_result', 'education_level', 'current_job_title'
+    ).first() or {}
+    skills = sorted({
+        normalize_text(name).lower()
+        for name in UserSkill.objects.filter(user_id=user.pk).values_list('skill_name', flat=True)
+    })
+
+    mbti = (profile.get('mbti_result') or '').upper()
+    education = profile.get('education_level') or ''
+    job = normalize_text(profile.get('current_job_title') or '').lower()
+    # Cùng điều kiện với is_profile_missing trong format_user_info (chọn template prompt)
+    missing = not (job and education and mbti)
+    skills_hash = hashlib.sha256("\x1f".join(skills).encode('utf-8')).hexdigest()[:16]
+    return "|".join([
+        str(int(missing)), mbti, (profile.get('holland_result') or '').upper(), education, job, skills_hash
+    ])
+
+
+def response_scope(user):
+    """Scope = config đang active + nhóm hồ sơ. Tính 1 lần / request (nhớ trên object user của request)."""
+    scope = getattr(user, '_response_scope', None)
+    if scope is None:
+        raw = f"{_config_fingerprint(get_active_config())}|{profile_bucket(user)}"
+        scope = hashlib.sha256(raw.encode('utf-8')).hexdigest()
+        user._response_scope = scope
+    return scope
+
+
+def find_cached_response(prompt, user):
+    """
+    Trả về (response_text, context_used) nếu có câu hỏi đủ giống trong cùng scope, ngược lại None.
+    Embedding của prompt lấy qua get_query_embedding nên dùng chung với get_rag_docs.
+    """
+    if not is_enabled(): return None
+    try:
+        vector = get_query_embedding(prompt)
+        if vector is None: return None
+
+        cutoff = timezone.now() - timedelta(seconds=settings.AI_SEMANTIC_CACHE_TTL)
+        with hnsw_search(top_k=1):
+            entry = ChatResponseCache.objects.filter(
+                scope_key=response_scope(user),
+                created_at__gte=cutoff
+            ).annotate(
+                distance=CosineDistance('prompt_embedding', vector)
+            ).order_by('distance').first()
+
+        if entry is None: return None
+        similarity = 1 - entry.distance
+        if similarity < settings.AI_SEMANTIC_CACHE_THRESHOLD:
+            return None
+
+        ChatResponseCache.objects.filter(pk=entry.pk).update(
+            hit_count=F('hit_count') + 1,
+            last_hit_at=timezone.now()
+        )
+        return entry.response_text, [{
+            "source": "semantic_cache",
+            "id": entry.pk,
+            "similarity": round(float(similarity), 4),
+            "cached_prompt": entry.prompt_text,
+        }]
+    except Exception as e:
+        print(f"Semantic cache lookup error: {e}")
+        return None
+
+
+def store_cached_response(prompt, user, response_text):
+    if not is_enabled() or not response_text: return
+    # Câu trả lời nhắc tên riêng của user thì không dùng lại cho người khác
+    full_name = (getattr(user, 'full_name', '') or '').strip()
+    if full_name and full_name.lower() in response_text.lower():
+        return
+    try:
+        vector = get_query_embedding(prompt)
+        if vector is None: return
+        ChatResponseCache.objects.create(
+            scope_key=response_scope(user),
+            prompt_text=prompt,
+            prompt_embedding=vector,
+            response_text=response_text
+        )
+    except Exception as e:
+        print(f"Semantic cache store error: {e}")
+
+
+def prune_response_cache():
+    cutoff = timezone.now() - timedelta(seconds=settings.AI_SEMANTIC_CACHE_TTL)
+    deleted, _ = ChatResponseCache.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,133 @@
+import logging
+import math
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# ==========================================
+# Ước lượng token (không gọi API): ~4 ký tự / token.
+# Đủ để chia ngân sách cho các phần của prompt, không cần chính xác tuyệt đối.
+# ==========================================
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    if not text: return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text, max_tokens, marker=" ..."):
+    """Cắt text về tối đa max_tokens (ước lượng), ưu tiên cắt ở khoảng trắng."""
+    if not text or max_tokens <= 0: return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    limit = max(0, max_tokens * CHARS_PER_TOKEN - len(marker))
+    cut = text[:limit]
+    space = cut.rfind(" ")
+    if space > limit * 0.8:
+        cut = cut[:space]
+    return cut.rstrip() + marker
+
+
+# ==========================================
+# Ghép prompt theo ngân sách token
+# Mỗi phần (role, profile, rag, history, question) có budget riêng + độ ưu tiên
+# (AI_PROMPT_SECTIONS). Vượt tổng AI_PROMPT_TOKEN_BUDGET -> cắt / bỏ bớt từ phần
+# có độ ưu tiên thấp nhất trước.
+# ==========================================
+
+class PromptSection:
+    """
+    content là str (cắt theo token) hoặc list[str] (bỏ từng item; drop_from='end' bỏ item cuối,
+    'start' bỏ item đầu - dùng cho lịch sử chat để giữ tin nhắn mới nhất).
+    """
+
+    def __init__(self, name, content, budget, priority, min_tokens=0, drop_from='end'):
+        self.name = name
+        self.budget = budget
+        self.priority = priority
+        self.min_tokens = min_tokens
+        self.drop_from = drop_from
+        if isinstance(content, (list, tuple)):
+            self.items = [item for item in content if item]
+            self.text = None
+        else:
+            self.items = None
+            self.text = content or ""
+        self.original_tokens = self.tokens()
+
+    def render(self):
+        return "\n".join(self.items) if self.items is not None else self.text
+
+    def tokens(self):
+        return estimate_tokens(self.render())
+
+    def fit(self, max_tokens):
+        if self.items is None:
+            self.text = truncate_to_tokens(self.text, max(max_tokens, self.min_tokens))
+            return
+
+        items = self.items if self.drop_from == 'end' else list(reversed(self.items))
+        kept, used = [], 0
+        for item in items:
+            cost = estimate_tokens(item)
+            if used + cost > max_tokens:
+                # Item đầu tiên không vừa: giữ phần đầu nếu còn đủ chỗ
+                if max_tokens - used >= 50:
+                    kept.append(truncate_to_tokens(item, max_tokens - used))
+                break
+            kept.append(item)
+            used += cost
+        self.items = kept if self.drop_from == 'end' else list(reversed(kept))
+
+    def shrink(self, tokens):
+        """Giảm ít nhất `tokens` nếu được (không xuống dưới min_tokens). Trả về số token đã giảm."""
+        before = self.tokens()
+        if self.items is None:
+            self.fit(max(self.min_tokens, before - tokens))
+        else:
+            while self.items and before - self.tokens() < tokens:
+                self.items.pop() if self.drop_from == 'end' else self.items.pop(0)
+        return before - self.tokens()
+
+
+class PromptAssembler:
+    def __init__(self, total_budget=None, sections=None):
+        self.total_budget = total_budget or settings.AI_PROMPT_TOKEN_BUDGET
+        self.section_config = sections or settings.AI_PROMPT_SECTIONS
+        self.sections = {}
+        self.breakdown = {}
+
+    def add(self, name, content, min_tokens=0, drop_from='end'):
+        budget, priority = self.section_config[name]
+        self.sections[name] = PromptSection(name, content, budget, priority, min_tokens, drop_from)
+
+    def assemble(self, overhead_tokens=0):
+        """Trả về {name: text đã cắt}; self.breakdown ghi số token từng phần để log."""
+        for section in self.sections.values():
+            section.fit(section.budget)
+
+        over = overhead_tokens + sum(s.tokens() for s in self.sections.values()) - self.total_budget
+        for section in sorted(self.sections.values(), key=lambda s: s.priority):
+            if over <= 0: break
+            over -= section.shrink(over)
+
+        self.breakdown = {
+            name: {"tokens": s.tokens(), "original": s.original_tokens}
+            for name, s in self.sections.items()
+        }
+        self.breakdown["overhead"] = {"tokens": overhead_tokens, "original": overhead_tokens}
+        return {name: s.render() for name, s in self.sections.items()}
+
+    def total_tokens(self):
+        return sum(item["tokens"] for item in self.breakdown.values())
+
+    def log(self, label="chat"):
+        parts = ", ".join(
+            f"{name}={item['tokens']}" + (f"/{item['original']}" if item['tokens'] != item['original'] else "")
+            for name, item in self.breakdown.items()
+        )
+        logger.info("prompt[%s] tokens=%d (budget %d): %s", label, self.total_tokens(), self.total_budget, parts)
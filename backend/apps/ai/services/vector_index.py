@@ -0,0 +1,228 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.ai.models import KnowledgeBase, PUBLIC_CONTENT_TYPES
+from utils.background import run_in_background
+from utils.cache import is_shared_cache
+
+VERSION_CACHE_KEY = 'kb_vector_index_version'
+CHANGE_CACHE_KEY = 'kb_vector_index_change:{}'
+# Worker chậm hơn khoảng này không còn đủ danh sách thay đổi -> nạp lại toàn bộ
+CHANGE_TTL = 3600
+
+_local = threading.local()
+
+
+# ==========================================
+# Version dùng chung: bộ đếm tăng dần trong cache (incr là atomic trên Redis).
+# Mỗi lần tăng do commit KnowledgeBase ghi kèm danh sách id đã đổi (CHANGE_CACHE_KEY.format(version))
+# -> worker chỉ lệch ít thay đổi thì sửa ma trận tại chỗ, lệch nhiều / thiếu danh sách thì nạp lại.
+# ==========================================
+
+def get_index_version():
+    """Version dùng chung (qua cache) của KnowledgeBase public."""
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        # Bắt đầu từ thời điểm hiện tại: cache bị xóa thì không quay lại version cũ của worker nào
+        cache.add(VERSION_CACHE_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def bump_index_version(changed_ids=None):
+    """
+    Tăng version. changed_ids: id KnowledgeBase đã đổi (worker có thể cập nhật tăng dần);
+    None = thay đổi hàng loạt (resize...) -> mọi worker nạp lại toàn bộ.
+    """
+    try:
+        version = cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        get_index_version()
+        version = cache.incr(VERSION_CACHE_KEY)
+    if changed_ids:
+        cache.set(CHANGE_CACHE_KEY.format(version), sorted(changed_ids), timeout=CHANGE_TTL)
+    return version
+
+
+def _incremental_limit():
+    return getattr(settings, 'AI_INMEMORY_VECTOR_INDEX_INCREMENTAL_MAX', 500)
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class InMemoryVectorIndex:
+    """
+    Ma trận float32 (đã chuẩn hóa) của các vector trong KnowledgeBase public + mảng id.
+    top-k = 1 phép nhân ma trận - vector. Nạp lười (lazy) trong background;
+    khi chưa nạp xong hoặc version lệch với cache dùng chung -> search() trả None
+    để caller quay về pgvector. Lệch ít dòng (<= AI_INMEMORY_VECTOR_INDEX_INCREMENTAL_MAX)
+    -> chỉ đọc lại các dòng đó, ngược lại nạp lại toàn bộ.
+    """
+
+    def __init__(self, content_types=PUBLIC_CONTENT_TYPES):
+        self.content_types = tuple(str(ctype) for ctype in content_types)
+        self._lock = threading.RLock()
+        self._matrix = None
+        self._ids = []
+        self._types = np.array([], dtype=object)
+        self._texts = []
+        self._refs = []
+        self._version = None
+        self._loading = False
+
+    # ---------- trạng thái ----------
+    def is_ready(self):
+        with self._lock:
+            return self._matrix is not None and self._version == get_index_version()
+
+    def ensure_loaded(self):
+        """Nếu index nguội / cũ thì nạp lại trong background (không chặn request)."""
+        with self._lock:
+            if self._loading or (self._matrix is not None and self._version == get_index_version()):
+                return
+            self._loading = True
+        run_in_background(self.refresh)
+
+    def _rows(self, ids=None):
+        queryset = KnowledgeBase.objects.filter(content_type__in=self.content_types, embedding__isnull=False)
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+        return list(queryset.values_list('id', 'content_type', 'content_text', 'embedding', 'reference_id'))
+
+    def _changed_ids(self, version):
+        """Id đã đổi từ version đang có tới `version`; None nếu phải nạp lại toàn bộ."""
+        limit = _incremental_limit()
+        with self._lock:
+            current = self._version if self._matrix is not None else None
+        if current is None or not isinstance(version, int) or not 0 < version - current <= limit:
+            return None
+
+        keys = [CHANGE_CACHE_KEY.format(v) for v in range(current + 1, version + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            # Version tăng do thay đổi hàng loạt, hoặc danh sách đã hết hạn
+            return None
+        ids = set()
+        for changed in changes.values():
+            ids.update(changed)
+        return ids if len(ids) <= limit else None
+
+    def refresh(self):
+        try:
+            # Lấy version TRƯỚC khi đọc dữ liệu: thay đổi xảy ra trong lúc nạp sẽ làm version lệch
+            # -> index bị coi là cũ và được cập nhật lại lần sau.
+            version = get_index_version()
+            changed = self._changed_ids(version)
+            if changed is None or not self.apply_changes(changed, version):
+                self.load(version)
+        finally:
+            with self._lock:
+                self._loading = False
+
+    def load(self, version):
+        rows = self._rows()
+        matrix = np.vstack([_normalize(row[3]) for row in rows]) if rows else None
+        with self._lock:
+            self._matrix = matrix
+            self._ids = [str(row[0]) for row in rows]
+            self._types = np.array([row[1] for row in rows], dtype=object)
+            self._texts = [row[2] for row in rows]
+            self._refs = [row[4] for row in rows]
+            self._version = version
+        print(f"In-memory vector index: đã nạp {len(rows)} tài liệu")
+
+    def apply_changes(self, changed_ids, version):
+        """
+        Bỏ các dòng cũ của changed_ids rồi thêm lại những dòng còn tồn tại (1 lần copy ma trận
+        cho cả nhóm thay đổi, không phải mỗi dòng). False nếu index đã bị thay trong lúc đọc DB.
+        """
+        with self._lock:
+            base_version = self._version
+        rows = self._rows(changed_ids)
+
+        with self._lock:
+            if self._matrix is None or self._version != base_version:
+                return False
+            changed = {str(doc_id) for doc_id in changed_ids}
+            keep = [pos for pos, doc_id in enumerate(self._ids) if doc_id not in changed]
+            parts = [self._matrix[keep]] + [_normalize(row[3])[np.newaxis, :] for row in rows]
+            matrix = np.vstack(parts)
+            self._matrix = matrix if matrix.shape[0] else None
+            self._ids = [self._ids[pos] for pos in keep] + [str(row[0]) for row in rows]
+            self._types = np.concatenate([self._types[keep], np.array([row[1] for row in rows], dtype=object)])
+            self._texts = [self._texts[pos] for pos in keep] + [row[2] for row in rows]
+            self._refs = [self._refs[pos] for pos in keep] + [row[4] for row in rows]
+            self._version = version
+        print(f"In-memory vector index: cập nhật {len(changed)} tài liệu")
+        return True
+
+    # ---------- tìm kiếm ----------
+    def search(self, query_embedding, top_k=5, content_types=None):
+        """Trả về list (distance, id, content_type, content_text, reference_id) hoặc None nếu index chưa sẵn sàng."""
+        if not self.is_ready():
+            self.ensure_loaded()
+            return None
+
+        query = _normalize(query_embedding)
+        with self._lock:
+            matrix, types, ids, texts, refs = self._matrix, self._types, self._ids, self._texts, self._refs
+            if matrix is None or matrix.shape[1] != query.shape[0]:
+                return None
+
+            scores = matrix @ query
+            if content_types is not None:
+                allowed = [str(ctype) for ctype in content_types]
+                scores = np.where(np.isin(types, allowed), scores, -np.inf)
+
+            k = min(top_k, scores.shape[0])
+            if k <= 0: return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            return [
+                (float(1 - scores[pos]), ids[pos], types[pos], texts[pos], refs[pos])
+                for pos in top if np.isfinite(scores[pos])
+            ]
+
+
+public_kb_index = InMemoryVectorIndex()
+
+
+def is_enabled():
+    # Version nằm trong cache: LocMem thì worker khác không thấy bump -> index cũ mãi
+    return getattr(settings, 'AI_INMEMORY_VECTOR_INDEX', False) and is_shared_cache()
+
+
+def _publish_pending():
+    """
+    Callback on_commit: 1 lần tăng version cho mọi dòng đổi trong transaction. Mỗi lần đánh dấu
+    đăng ký 1 callback -> callback đầu tiên sau commit xử lý hết, các callback sau thấy tập rỗng.
+    """
+    pending = getattr(_local, 'pending', None)
+    _local.pending = None
+    if pending:
+        bump_index_version(pending)
+
+
+def on_knowledge_base_change(instance, deleted=False):
+    """
+    Gọi từ post_save / post_delete của KnowledgeBase. Chỉ đổi version sau khi transaction commit
+    (rollback -> không có gì thay đổi); index trong mọi worker thấy version lệch ở lần search kế tiếp
+    và cập nhật 1 lần cho cả nhóm thay đổi (ít dòng: sửa tại chỗ, nhiều dòng: nạp lại toàn bộ).
+    """
+    if str(instance.content_type) not in public_kb_index.content_types:
+        return
+    if getattr(_local, 'pending', None) is None:
+        _local.pending = set()
+    _local.pending.add(str(instance.pk))
+    # Luôn đăng ký: savepoint rollback hủy callback của nó mà không báo lại
+    transaction.on_commit(_publish_pending)
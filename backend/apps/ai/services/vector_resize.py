@@ -0,0 +1,102 @@
+from apps.ai.services.vector_search import knowledge_base_compact_indexes
+
+# ==========================================
+# Đổi số chiều các cột vector theo AI_EMBEDDING_DIMENSIONS (`manage.py resize_embeddings`;
+# migration luôn giữ schema 768 chiều, xem utils.fields.EmbeddingField).
+# Giảm chiều: cắt vector cũ tại chỗ (subvector, pgvector >= 0.7) - text-embedding-004 là
+# embedding kiểu Matryoshka nên kết quả giống API trả về với output_dimensionality nhỏ hơn.
+# Tăng chiều: không suy ra được -> cột về NULL rồi embed lại qua outbox; dữ liệu gốc
+# (content_text...) không bị xóa. Riêng 2 bảng cache được xóa sạch.
+# ==========================================
+
+# (app_label, model, field)
+VECTOR_COLUMNS = [
+    ('ai', 'KnowledgeBase', 'embedding'),
+    ('ai', 'EmbeddingCache', 'embedding'),
+    ('ai', 'ChatResponseCache', 'prompt_embedding'),
+    ('career', 'Career', 'embedding'),
+    ('career', 'Course', 'embedding'),
+    ('users', 'UserProfile', 'profile_vector'),
+    ('users', 'UserSkill', 'embedding'),
+]
+
+# Bảng chỉ là cache (tự điền lại khi dùng) -> được xóa dòng khi tăng chiều
+CACHE_MODELS = ('ai.embeddingcache', 'ai.chatresponsecache')
+
+# Index gọn (opt-in, `manage.py vector_compact_indexes`) có số chiều trong biểu thức:
+# xóa trước khi đổi kiểu cột, resize_embeddings build lại bằng chính lệnh đó
+COMPACT_INDEXES = {
+    'ai.knowledgebase': knowledge_base_compact_indexes,
+}
+
+
+def compact_index_names():
+    return [index.name for build in COMPACT_INDEXES.values() for index in build()]
+
+
+def existing_indexes(schema_editor, names):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT relname FROM pg_class WHERE relkind = 'i' AND relname = ANY(%s)", [list(names)])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def current_dimensions(connection, table, column):
+    """Số chiều đang khai báo trong DB (typmod của vector(n)); None nếu chưa có cột."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT atttypmod FROM pg_attribute WHERE attrelid = to_regclass(%s) AND attname = %s",
+            [table, column]
+        )
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def mismatched_columns(connection, dimensions):
+    """Các cột vector trong DB có số chiều khác dimensions: list (db_table.column, số chiều trong DB)."""
+    from django.apps import apps
+
+    mismatched = []
+    for app_label, model_name, field_name in VECTOR_COLUMNS:
+        model = apps.get_model(app_label, model_name)
+        column = model._meta.get_field(field_name).column
+        current = current_dimensions(connection, model._meta.db_table, column)
+        if current is not None and current != dimensions:
+            mismatched.append((f"{model._meta.db_table}.{column}", current))
+    return mismatched
+
+
+def resize_vector_column(schema_editor, model, field_name, dimensions):
+    """
+    Đổi cột về vector(dimensions). Index HNSW thường được Postgres tự build lại;
+    index gọn (halfvec / binary, có số chiều trong biểu thức) bị xóa - tạo lại bằng vector_compact_indexes.
+    Trả về (số chiều cũ, số chiều mới) hoặc None nếu không cần đổi.
+    """
+    field = model._meta.get_field(field_name)
+    table = schema_editor.quote_name(model._meta.db_table)
+    column = schema_editor.quote_name(field.column)
+    dimensions = int(dimensions)
+
+    current = current_dimensions(schema_editor.connection, model._meta.db_table, field.column)
+    if current is None or current == dimensions:
+        return None
+
+    compact_for = COMPACT_INDEXES.get(model._meta.label_lower)
+    if compact_for and field_name == 'embedding':
+        for index in compact_for():
+            schema_editor.execute(f"DROP INDEX IF EXISTS {schema_editor.quote_name(index.name)}")
+
+    if 0 < dimensions < current:
+        schema_editor.execute(
+            f"ALTER TABLE {table} ALTER COLUMN {column} TYPE vector({dimensions}) "
+            f"USING subvector({column}, 1, {dimensions})::vector({dimensions})"
+        )
+    else:
+        if model._meta.label_lower in CACHE_MODELS:
+            schema_editor.execute(f"DELETE FROM {table}")
+        elif field.null:
+            schema_editor.execute(f"UPDATE {table} SET {column} = NULL")
+        else:
+            raise ValueError(f"{model._meta.label}.{field_name} không cho NULL: không tăng chiều được mà không mất dữ liệu")
+        schema_editor.execute(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE vector({dimensions})")
+    return current, dimensions
+
@@ -0,0 +1,152 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Func, Value
+from django.db.models.functions import Cast
+from pgvector import HalfVector, Vector
+from pgvector.django import BitField, CosineDistance, HalfVectorField, HammingDistance, VectorField
+
+SEARCH_MODES = ('exact', 'halfvec', 'binary')
+# Tham số build HNSW ghi trong model / migration (cố định để mọi môi trường có cùng schema).
+# Tune trên từng DB bằng `manage.py vector_indexes --rebuild --m .. --ef-construction ..`
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 64
+
+_iterative_scan_supported = None
+
+
+def _supports_iterative_scan(cursor):
+    """hnsw.iterative_scan có từ pgvector 0.8; kiểm tra 1 lần / process."""
+    global _iterative_scan_supported
+    if _iterative_scan_supported is None:
+        cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cursor.fetchone()
+        version = tuple(int(part) for part in row[0].split('.')[:2]) if row else (0, 0)
+        _iterative_scan_supported = version >= (0, 8)
+        if not _iterative_scan_supported:
+            print(f"pgvector {row[0] if row else '?'} chưa hỗ trợ hnsw.iterative_scan -> query có filter có thể thiếu kết quả")
+    return _iterative_scan_supported
+
+
+@contextmanager
+def hnsw_search(ef_search=None, top_k=None):
+    """
+    Bọc các query vector trong 1 transaction với `SET LOCAL hnsw.ef_search`.
+    ef_search càng lớn thì recall càng cao nhưng chậm hơn; luôn >= top_k.
+    Queryset phải được evaluate BÊN TRONG block này thì tham số mới có tác dụng.
+    """
+    ef = int(ef_search or settings.AI_HNSW_EF_SEARCH)
+    if top_k:
+        ef = max(ef, int(top_k))
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL hnsw.ef_search = {ef}")
+            iterative_scan = settings.AI_HNSW_ITERATIVE_SCAN
+            if iterative_scan in ('relaxed_order', 'strict_order') and _supports_iterative_scan(cursor):
+                # Query có filter (industry, content_type...) tiếp tục quét index
+                # khi kết quả sau filter chưa đủ top_k
+                cursor.execute(f"SET LOCAL hnsw.iterative_scan = {iterative_scan}")
+        yield
+
+
+# ==========================================
+# Biểu diễn gọn của vector (halfvec 2 byte/chiều, bit 1 bit/chiều) dưới dạng
+# expression index - không thêm cột, chỉ thêm index HNSW riêng.
+# Tìm thô trên index gọn lấy top_k * AI_VECTOR_RESCORE_FACTOR ứng viên,
+# sau đó xếp hạng lại chính xác bằng cosine trên vector đầy đủ.
+# Index gọn là opt-in (`manage.py vector_compact_indexes`), không nằm trong model/migration:
+# mode 'exact' (mặc định) không phải trả chi phí ghi cho 6 index HNSW thừa.
+# Chỉ làm cho KnowledgeBase - nơi duy nhất có tìm kiếm ANN theo AI_VECTOR_SEARCH_MODE (RAG);
+# các cột vector khác chỉ tra 1 dòng / bảng nhỏ nên index đầy đủ là đủ.
+# ==========================================
+
+class BinaryQuantize(Func):
+    function = 'binary_quantize'
+    output_field = BitField()
+
+
+def halfvec_expr(field, dimensions):
+    return Cast(field, HalfVectorField(dimensions=dimensions))
+
+
+def bit_expr(field, dimensions):
+    return Cast(BinaryQuantize(field), BitField(length=dimensions))
+
+
+def compact_hnsw_indexes(prefix, field, dimensions, condition=None):
+    """2 index HNSW gọn cho 1 cột vector: <prefix>_half_hnsw (halfvec) và <prefix>_bit_hnsw (binary)."""
+    from django.contrib.postgres.indexes import OpClass
+    from pgvector.django import HnswIndex
+
+    return [
+        HnswIndex(
+            OpClass(halfvec_expr(field, dimensions), name='halfvec_cosine_ops'),
+            name=f'{prefix}_half_hnsw',
+            m=HNSW_M,
+            ef_construction=HNSW_EF_CONSTRUCTION,
+            condition=condition,
+        ),
+        HnswIndex(
+            OpClass(bit_expr(field, dimensions), name='bit_hamming_ops'),
+            name=f'{prefix}_bit_hnsw',
+            m=HNSW_M,
+            ef_construction=HNSW_EF_CONSTRUCTION,
+            condition=condition,
+        ),
+    ]
+
+
+def knowledge_base_compact_indexes(dimensions=None):
+    """Các index gọn của KnowledgeBase: mỗi loại nội dung public 1 cặp halfvec + bit (partial)."""
+    from django.db.models import Q
+    from apps.ai.models import ContentType
+
+    dimensions = dimensions or settings.AI_EMBEDDING_DIMENSIONS
+    prefixes = [
+        ('kb_career', ContentType.CAREER),
+        ('kb_course', ContentType.COURSE),
+        ('kb_advice', ContentType.GENERAL_ADVICE),
+    ]
+    return [
+        index
+        for prefix, ctype in prefixes
+        for index in compact_hnsw_indexes(prefix, 'embedding', dimensions, Q(content_type=ctype))
+    ]
+
+
+def search_mode():
+    mode = getattr(settings, 'AI_VECTOR_SEARCH_MODE', 'exact')
+    return mode if mode in SEARCH_MODES else 'exact'
+
+
+def shortlist_size(top_k, mode=None):
+    """Số ứng viên cần lấy từ index (dùng cho ef_search)."""
+    if (mode or search_mode()) == 'exact':
+        return top_k
+    return top_k * settings.AI_VECTOR_RESCORE_FACTOR
+
+
+def _coarse_distance(field, query_embedding, dimensions, mode):
+    if mode == 'halfvec':
+        return CosineDistance(halfvec_expr(field, dimensions), HalfVector(query_embedding))
+    query = Cast(Value(Vector._to_db(query_embedding)), VectorField(dimensions=dimensions))
+    return HammingDistance(bit_expr(field, dimensions), BinaryQuantize(query))
+
+
+def nearest(queryset, field, query_embedding, top_k, mode=None):
+    """
+    queryset đã annotate `distance` (cosine trên vector đầy đủ), sắp tăng dần, tối đa top_k dòng.
+    mode: 'exact' (index vector đầy đủ) | 'halfvec' | 'binary' (tìm thô trên index gọn rồi tính lại).
+    Phải evaluate bên trong hnsw_search(top_k=shortlist_size(top_k)).
+    """
+    mode = mode or search_mode()
+    exact = CosineDistance(field, query_embedding)
+    if mode == 'exact':
+        return queryset.annotate(distance=exact).order_by('distance')[:top_k]
+
+    dimensions = queryset.model._meta.get_field(field).dimensions
+    coarse = _coarse_distance(field, query_embedding, dimensions, mode)
+    shortlist = queryset.order_by(coarse).values('pk')[:shortlist_size(top_k, mode)]
+    return queryset.filter(pk__in=shortlist).annotate(distance=exact).order_by('distance')[:top_k]
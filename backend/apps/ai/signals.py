@@ -1,40 +1,75 @@
-from django.db.models.signals import post_save, post_delete
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.models.signals import post_save, post_delete, post_migrate
 from django.dispatch import receiver
-from apps.career.models import Career, Course # Import đúng model của bạn
-from apps.ai.models import KnowledgeBase, ContentType
-from apps.ai.services.ai_service import get_embedding 
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-from django.db import transaction
-from apps.users.models import UserProfile, UserSkill, UserInterest
-from apps.ai.services.ai_service import get_embedding
-
-def sync_to_kb(instance, content_type, text_content, metadata):
-    vector = get_embedding(text_content, task_type="retrieval_document")
-    
-    KnowledgeBase.objects.update_or_create(
-        content_type=content_type,
-        reference_id=str(instance.id),
-        defaults={
-            'content_text': text_content,
-            'embedding': vector,
-            'metadata': metadata
-        }
-    )
-    
+from django.utils import timezone
+from apps.career.models import Career, Course, Industry # Import đúng model của bạn
+from apps.ai.models import KnowledgeBase, ContentType, AIPromptConfig
+from apps.ai.services.vector_index import on_knowledge_base_change
+from apps.ai.services.embedding_outbox import enqueue_embedding, register_embedding_handler
+from apps.ai.services.kb_passages import KBDocument, sync_document
+from apps.ai.services.profile_vector_scheduler import mark_profile_dirty, reset_pending
+from apps.ai.services.profile_context_cache import invalidate_profile_context
+from apps.ai.services.config_cache import invalidate_active_config
+from apps.ai.services.industry_suggestion_cache import invalidate_industry_catalog
+from apps.ai.services.vector_resize import mismatched_columns
+from apps.users.models import User, UserProfile, UserSkill, UserInterest
+
+# ==========================================
+# Signal không gọi Gemini trong request: mặc định embed ngay sau commit,
+# AI_EMBEDDING_OUTBOX=True thì chỉ ghi job vào EmbeddingOutbox cho `manage.py embedding_worker`.
+# Cả 2 cách đều ghi vector qua các handler bên dưới.
+# ==========================================
+
+def sync_to_kb(instance, content_type, header, body, metadata, text, vector):
+    """Vector của cả tài liệu -> cột embedding của model; các đoạn (passage) -> KnowledgeBase."""
+    sync_document(KBDocument(
+        content_type, instance.id, header, body, metadata, full_text=text, full_vector=vector
+    ))
+
     instance.__class__.objects.filter(id=instance.id).update(embedding=vector)
 
+def career_document_parts(instance):
+    header = f"Career: {instance.title}. Level: {instance.level}. Salary: {instance.salary_min}-{instance.salary_max}."
+    body = f"Desc: {instance.description}"
+    if instance.future_outlook:
+        body += f" Outlook: {instance.future_outlook}"
+    meta = {"title": instance.title, "type": "career"}
+    return header, body, meta
+
+def course_document_parts(instance):
+    header = f"Course: {instance.title}. Provider: {instance.provider}. Level: {instance.level}."
+    body = f"Desc: {instance.description}"
+    meta = {"title": instance.title, "type": "course", "url": instance.url}
+    return header, body, meta
+
+def build_career_document(instance):
+    header, body, meta = career_document_parts(instance)
+    return f"{header} {body}", meta
+
+def build_course_document(instance):
+    header, body, meta = course_document_parts(instance)
+    return f"{header} {body}", meta
+
+def apply_career_embedding(instance, text, vector):
+    header, body, meta = career_document_parts(instance)
+    sync_to_kb(instance, ContentType.CAREER, header, body, meta, text, vector)
+
+def apply_course_embedding(instance, text, vector):
+    header, body, meta = course_document_parts(instance)
+    sync_to_kb(instance, ContentType.COURSE, header, body, meta, text, vector)
+
+register_embedding_handler(Career, lambda c: build_career_document(c)[0], apply_career_embedding)
+register_embedding_handler(Course, lambda c: build_course_document(c)[0], apply_course_embedding)
+
 @receiver(post_save, sender=Career)
 def sync_career(sender, instance, created, **kwargs):
-    text = f"Career: {instance.title}. Level: {instance.level}. Salary: {instance.salary_min}-{instance.salary_max}. Desc: {instance.description}"
-    meta = {"title": instance.title, "type": "career"}
-    sync_to_kb(instance, ContentType.CAREER, text, meta)
+    enqueue_embedding(instance)
 
 @receiver(post_save, sender=Course)
 def sync_course(sender, instance, created, **kwargs):
-    text = f"Course: {instance.title}. Provider: {instance.provider}. Level: {instance.level}. Desc: {instance.description}"
-    meta = {"title": instance.title, "type": "course", "url": instance.url}
-    sync_to_kb(instance, ContentType.COURSE, text, meta)
+    enqueue_embedding(instance)
 
 @receiver(post_delete, sender=Career)
 @receiver(post_delete, sender=Course)
@@ -42,58 +77,100 @@ def delete_kb(sender, instance, **kwargs):
     ctype = ContentType.CAREER if sender == Career else ContentType.COURSE
     KnowledgeBase.objects.filter(content_type=ctype, reference_id=str(instance.id)).delete()
 
-def update_user_vector(user):
-    try:
-        profile = getattr(user, 'profile', None)
-        if not profile: return
-
-        job = profile.current_job_title or "Chưa có việc làm"
-        edu = profile.education_level or "Chưa cập nhật"
-        bio = profile.bio or ""
-        mbti = profile.mbti_result or ""
-        
-        skills = user.skills.all()
-        skill_text = ", ".join([f"{s.skill_name} (Level {s.proficiency_level})" for s in skills])
-        
-        interests = user.interests.all()
-        interest_text = ", ".join([i.keyword for i in interests])
-
-        full_text_representation = (
-            f"User Profile Summary:\n"
-            f"- Current Job: {job}\n"
-            f"- Education: {edu}\n"
-            f"- MBTI: {mbti}\n"
-            f"- Bio: {bio}\n"
-            f"- Skills: {skill_text}\n"
-            f"- Interests: {interest_text}"
-        )
-
-        vector = get_embedding(full_text_representation, task_type="retrieval_document")
-
-        if vector:
-            UserProfile.objects.filter(id=profile.id).update(profile_vector=vector)
-            print(f"Đã cập nhật vector cho user: {user.email}")
-            
-    except Exception as e:
-        print(f"Lỗi update user vector: {e}")
+@receiver(post_save, sender=Industry)
+@receiver(post_delete, sender=Industry)
+def on_industry_change(sender, instance, **kwargs):
+    # Danh sách Industry đổi -> hash mới -> gợi ý cũ không còn khớp
+    invalidate_industry_catalog()
+
+@receiver(post_delete, sender=AIPromptConfig)
+def on_prompt_config_deleted(sender, instance, **kwargs):
+    invalidate_active_config()
+
+@receiver(post_migrate)
+def check_embedding_dimensions(sender, using='default', **kwargs):
+    # Migration tạo cột 768 chiều; AI_EMBEDDING_DIMENSIONS khác thì đổi bằng lệnh riêng
+    if sender.name != 'apps.ai': return
+    for column, dimensions in mismatched_columns(connections[using], settings.AI_EMBEDDING_DIMENSIONS):
+        print(f"{column}: {dimensions} chiều, AI_EMBEDDING_DIMENSIONS = {settings.AI_EMBEDDING_DIMENSIONS}"
+              f" -> chạy `manage.py resize_embeddings`")
+
+@receiver(request_started)
+def on_request_started(sender, **kwargs):
+    # Tập profile chờ tính lại còn sót từ transaction đã rollback ở request trước
+    reset_pending()
+
+def apply_kb_embedding(instance, text, vector):
+    # save() (không dùng update) để signal bên dưới cập nhật index NumPy
+    instance.embedding = vector
+    instance.save(update_fields=['embedding', 'updated_at'])
+
+# Chỉ dùng để embed lại các đoạn đã có (embedding NULL sau resize_embeddings), không gắn với post_save
+register_embedding_handler(KnowledgeBase, lambda kb: kb.content_text, apply_kb_embedding)
+
+@receiver(post_save, sender=KnowledgeBase)
+def on_knowledge_base_saved(sender, instance, **kwargs):
+    on_knowledge_base_change(instance)
+
+@receiver(post_delete, sender=KnowledgeBase)
+def on_knowledge_base_deleted(sender, instance, **kwargs):
+    on_knowledge_base_change(instance, deleted=True)
+
+def build_profile_text(profile):
+    """Text đại diện cho hồ sơ user, dùng để tính profile_vector."""
+    user = profile.user
+    skills_str = ", ".join([f"{s.skill_name} (Lv {s.proficiency_level})" for s in user.skills.all()])
+    interests_str = ", ".join([i.keyword for i in user.interests.all()])
+
+    return f"""
+    Job: {profile.current_job_title or 'Unknown'}
+    Edu: {profile.get_education_level_display() or 'Unknown'}
+    Bio: {profile.bio or ''}
+    Skills: {skills_str}
+    Interests: {interests_str}
+    MBTI: {profile.mbti_result or ''}
+    Holland: {profile.holland_result or ''}
+    """.strip()
+
+def apply_profile_embedding(instance, text, vector):
+    UserProfile.objects.filter(pk=instance.pk).update(profile_vector=vector, vector_updated_at=timezone.now())
+
+def apply_skill_embedding(instance, text, vector):
+    UserSkill.objects.filter(pk=instance.pk).update(embedding=vector)
+
+register_embedding_handler(UserProfile, build_profile_text, apply_profile_embedding)
+register_embedding_handler(UserSkill, lambda s: s.skill_name, apply_skill_embedding)
+
+def update_user_vector(user_id):
+    """Đánh dấu hồ sơ cần tính lại profile_vector (gộp lại, chạy 1 lần sau commit)."""
+    mark_profile_dirty(user_id)
 
 
 @receiver(post_save, sender=UserProfile)
 def on_profile_change(sender, instance, created, **kwargs):
-    update_user_vector(instance.user)
+    # Lưu riêng profile_vector (update_fields) không làm đổi nội dung hồ sơ
+    if kwargs.get('update_fields') and set(kwargs['update_fields']) <= {'profile_vector', 'vector_updated_at'}:
+        return
+    invalidate_profile_context(instance.user_id)
+    update_user_vector(instance.user_id)
 
 @receiver(post_save, sender=UserSkill)
 @receiver(post_delete, sender=UserSkill)
 def on_skill_change(sender, instance, **kwargs):
-    if kwargs.get('created') or (not kwargs.get('created') and kwargs.get('update_fields') is None): 
-         skill_text = f"{instance.skill_name} level {instance.proficiency_level}"
-         vec = get_embedding(skill_text)
-         if vec:
-             UserSkill.objects.filter(id=instance.id).update(embedding=vec)
+    if kwargs.get('signal') is post_save:
+        enqueue_embedding(instance)
 
-    update_user_vector(instance.user)
+    invalidate_profile_context(instance.user_id)
+    update_user_vector(instance.user_id)
 
 @receiver(post_save, sender=UserInterest)
 @receiver(post_delete, sender=UserInterest)
 def on_interest_change(sender, instance, **kwargs):
-    update_user_vector(instance.user)
\ No newline at end of file
+    invalidate_profile_context(instance.user_id)
+    update_user_vector(instance.user_id)
+
+@receiver(post_save, sender=User)
+def on_user_change(sender, instance, created, **kwargs):
+    # Họ tên nằm trong context hồ sơ của prompt
+    if not created:
+        invalidate_profile_context(instance.pk)
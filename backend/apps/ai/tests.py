@@ -1,3 +1,307 @@
-from django.test import TestCase
+import io
+from contextlib import redirect_stdout
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from apps.ai.services.ai_service import _embed_batch
+from apps.ai.services.embedding_cache import QueryEmbeddingLRU
+from apps.ai.services.hybrid_search import best_per_parent, rrf_fuse
+from apps.ai.services.kb_passages import split_passages
+from apps.ai.services.token_budget import PromptAssembler, estimate_tokens
+from apps.ai.services.vector_index import InMemoryVectorIndex, bump_index_version, get_index_version
+
+# Các test dưới đây chỉ kiểm tra hàm thuần (không DB, không gọi API) -> SimpleTestCase
+
+
+# ==========================================
+# token_budget: thứ tự cắt khi vượt tổng ngân sách
+# ==========================================
+class PromptAssemblerTests(SimpleTestCase):
+    SECTIONS = {
+        'question': (100, 100),
+        'summary': (100, 60),
+        'history': (100, 50),
+        'rag': (100, 40),
+    }
+
+    def _assembler(self, total_budget):
+        return PromptAssembler(total_budget=total_budget, sections=self.SECTIONS)
+
+    def test_within_budget_keeps_everything(self):
+        assembler = self._assembler(1000)
+        assembler.add('question', "q" * 40)
+        assembler.add('rag', ["a" * 40, "b" * 40])
+        parts = assembler.assemble()
+        self.assertEqual(parts['question'], "q" * 40)
+        self.assertEqual(parts['rag'], "a" * 40 + "\n" + "b" * 40)
+
+    def test_section_budget_applies_before_total(self):
+        assembler = self._assembler(1000)
+        assembler.add('rag', ["a" * 200, "b" * 200, "c" * 200])  # 50 token / item, budget 100
+        parts = assembler.assemble()
+        self.assertEqual(parts['rag'].split("\n"), ["a" * 200, "b" * 200])
+
+    def test_lowest_priority_shrinks_first(self):
+        # question 10 + summary 10 + history 31 + rag 31 = 82 token, tổng chỉ 62
+        assembler = self._assembler(62)
+        assembler.add('question', "q" * 40)
+        assembler.add('summary', "s" * 40)
+        assembler.add('history', ["h" * 40, "i" * 40, "j" * 40])
+        assembler.add('rag', ["a" * 40, "b" * 40, "c" * 40])
+        parts = assembler.assemble()
+
+        # rag (ưu tiên thấp nhất) bị bỏ item cuối trước, history chưa bị đụng tới
+        self.assertEqual(parts['rag'].split("\n"), ["a" * 40])
+        self.assertEqual(parts['history'].split("\n"), ["h" * 40, "i" * 40, "j" * 40])
+        self.assertEqual(parts['summary'], "s" * 40)
+        self.assertLessEqual(assembler.total_tokens(), 62)
+
+    def test_history_drops_oldest_whole_messages(self):
+        assembler = self._assembler(35)
+        assembler.add('question', "q" * 40)
+        assembler.add('summary', "s" * 40)
+        # Tin nhắn nhiều dòng vẫn là 1 item
+        old, middle, new = "- User: a\n" + "x" * 30, "- Advisor: " + "y" * 29, "- User: " + "z" * 32
+        assembler.add('history', [old, middle, new], drop_from='start')
+        assembler.add('rag', ["a" * 40])
+        parts = assembler.assemble()
+
+        self.assertEqual(parts['rag'], "")
+        self.assertEqual(parts['history'], new)
+        self.assertEqual(parts['summary'], "s" * 40)
+        self.assertEqual(parts['question'], "q" * 40)
+
+    def test_min_tokens_is_kept(self):
+        assembler = self._assembler(10)
+        assembler.add('question', "q" * 400, min_tokens=20)
+        parts = assembler.assemble()
+        self.assertEqual(estimate_tokens(parts['question']), 20)
+
+
+# ==========================================
+# kb_passages: ranh giới đoạn + phần chồng lấn
+# ==========================================
+class SplitPassagesTests(SimpleTestCase):
+    def test_short_text_is_one_passage(self):
+        self.assertEqual(split_passages("  Một câu ngắn.  ", max_tokens=50, overlap_tokens=10), ["Một câu ngắn."])
+        self.assertEqual(split_passages("", max_tokens=50, overlap_tokens=10), [])
+
+    def test_splits_on_sentences_with_overlap(self):
+        # Mỗi câu 39 ký tự; đoạn tối đa 100 ký tự -> 2 câu / đoạn, lặp lại 1 câu cuối (overlap 40 ký tự)
+        sentences = [f"Câu số {i} " + "x" * 29 + "." for i in range(5)]
+        passages = split_passages(" ".join(sentences), max_tokens=25, overlap_tokens=10)
+
+        self.assertEqual(passages, [
+            " ".join(sentences[0:2]),
+            " ".join(sentences[1:3]),
+            " ".join(sentences[2:4]),
+            " ".join(sentences[3:5]),
+        ])
+        for passage in passages:
+            self.assertLessEqual(len(passage), 100)
+
+    def test_no_overlap(self):
+        sentences = [f"Câu số {i} " + "x" * 29 + "." for i in range(4)]
+        passages = split_passages(" ".join(sentences), max_tokens=25, overlap_tokens=0)
+        self.assertEqual(passages, [" ".join(sentences[0:2]), " ".join(sentences[2:4])])
+
+    def test_long_sentence_is_split_on_words(self):
+        words = [f"tu{i:02d}" for i in range(60)]  # 1 câu 299 ký tự, không có dấu câu
+        passages = split_passages(" ".join(words), max_tokens=25, overlap_tokens=0)
+
+        self.assertGreater(len(passages), 1)
+        for passage in passages:
+            self.assertLessEqual(len(passage), 100)
+        # Không mất / lặp từ nào, không cắt giữa từ
+        self.assertEqual(" ".join(passages).split(), words)
+
+
+# ==========================================
+# hybrid_search: reciprocal-rank fusion + mỗi tài liệu gốc 1 đoạn
+# ==========================================
+class RRFFuseTests(SimpleTestCase):
+    def test_best_per_parent_keeps_first_passage_of_each_parent(self):
+        candidates = [(0.9, 1, "a0", "career:1"), (0.8, 2, "a1", "career:1"), (0.7, 3, "b0", "career:2"),
+                      (0.6, 4, "c0", "course:1")]
+        self.assertEqual(best_per_parent(candidates, 5), [candidates[0], candidates[2], candidates[3]])
+        self.assertEqual(best_per_parent(candidates, 2), [candidates[0], candidates[2]])
+
+    def test_docs_in_both_lists_rank_first(self):
+        vector = [(1, "A", "p:1"), (2, "B", "p:2"), (3, "C", "p:3")]
+        lexical = [(3, "C", "p:3"), (4, "D", "p:4"), (2, "B", "p:2")]
+        # B: 1/62 + 1/63, C: 1/63 + 1/61 -> C > B > A (1/61) > D (1/62)
+        self.assertEqual(rrf_fuse(vector, lexical), ["C", "B", "A", "D"])
+
+    def test_ids_match_across_types(self):
+        # Index NumPy trả id dạng str, DB trả UUID / int -> vẫn cộng điểm cho cùng 1 đoạn
+        vector = [("7", "X", "p:1"), ("8", "Y", "p:2")]
+        lexical = [(8, "Y", "p:2")]
+        self.assertEqual(rrf_fuse(vector, lexical), ["Y", "X"])
+
+    def test_one_passage_per_parent(self):
+        vector = [(1, "A#0", "p:1"), (2, "A#1", "p:1"), (3, "B#0", "p:2")]
+        lexical = [(2, "A#1", "p:1")]
+        # A#1 có điểm cao nhất -> đại diện cho p:1, A#0 bị bỏ
+        self.assertEqual(rrf_fuse(vector, lexical), ["A#1", "B#0"])
+
+
+# ==========================================
+# embedding_cache: LRU trong process cho vector câu query
+# ==========================================
+class QueryEmbeddingLRUTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        lru = QueryEmbeddingLRU(maxsize=2, ttl=60)
+        lru.set("a", [1.0])
+        lru.set("b", [2.0])
+        self.assertEqual(lru.get("a"), [1.0])  # a mới được dùng -> b là cũ nhất
+        lru.set("c", [3.0])
+
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("a"), [1.0])
+        self.assertEqual(lru.get("c"), [3.0])
+        self.assertEqual(lru.stats()["size"], 2)
+
+    def test_set_existing_key_refreshes_order(self):
+        lru = QueryEmbeddingLRU(maxsize=2, ttl=60)
+        lru.set("a", [1.0])
+        lru.set("b", [2.0])
+        lru.set("a", [1.5])
+        lru.set("c", [3.0])
+
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("a"), [1.5])
+
+    def test_expired_entry_is_a_miss(self):
+        lru = QueryEmbeddingLRU(maxsize=2, ttl=10)
+        with mock.patch("apps.ai.services.embedding_cache.time.monotonic", return_value=100.0):
+            lru.set("a", [1.0])
+        with mock.patch("apps.ai.services.embedding_cache.time.monotonic", return_value=111.0):
+            self.assertIsNone(lru.get("a"))
+        self.assertEqual(lru.stats()["size"], 0)
+        self.assertEqual(lru.stats()["misses"], 1)
+
+    def test_disabled_and_none_values_are_not_stored(self):
+        lru = QueryEmbeddingLRU(maxsize=0, ttl=60)
+        lru.set("a", [1.0])
+        self.assertIsNone(lru.get("a"))
+
+        lru = QueryEmbeddingLRU(maxsize=2, ttl=60)
+        lru.set("a", None)
+        self.assertEqual(lru.stats()["size"], 0)
+
+
+# ==========================================
+# ai_service._embed_batch: chỉ tách đôi batch khi lỗi do nội dung item
+# ==========================================
+class ItemError(Exception):
+    pass
+
+
+class FakeEmbeddingProvider:
+    """Text chứa 'bad' -> ItemError (kiểu 400); fail_with: lỗi của mọi request (kiểu 429 / mạng)."""
+
+    def __init__(self, fail_with=None):
+        self.fail_with = fail_with
+        self.calls = []
+
+    @staticmethod
+    def is_item_error(error):
+        return isinstance(error, ItemError)
+
+    def embed(self, texts, task_type, dimensions):
+        self.calls.append(list(texts))
+        if self.fail_with is not None:
+            raise self.fail_with
+        if any("bad" in text for text in texts):
+            raise ItemError("invalid content")
+        return [[float(len(text))] for text in texts]
+
+
+class EmbedBatchTests(SimpleTestCase):
+    def _run(self, provider, texts):
+        with mock.patch("apps.ai.services.ai_service.get_provider", return_value=provider), \
+                redirect_stdout(io.StringIO()):
+            return _embed_batch(texts, "retrieval_document")
+
+    def test_success_is_one_request(self):
+        provider = FakeEmbeddingProvider()
+        self.assertEqual(self._run(provider, ["a", "bb"]), [[1.0], [2.0]])
+        self.assertEqual(len(provider.calls), 1)
+
+    def test_item_error_bisects_to_the_bad_item(self):
+        provider = FakeEmbeddingProvider()
+        texts = ["a", "bb", "bad", "dddd"]
+        self.assertEqual(self._run(provider, texts), [[1.0], [2.0], None, [4.0]])
+        self.assertEqual(provider.calls, [texts, ["a", "bb"], ["bad", "dddd"], ["bad"], ["dddd"]])
+
+    def test_transient_error_does_not_retry(self):
+        provider = FakeEmbeddingProvider(fail_with=TimeoutError("quota"))
+        self.assertEqual(self._run(provider, ["a", "bb", "ccc"]), [None, None, None])
+        self.assertEqual(len(provider.calls), 1)
+
+
+# ==========================================
+# vector_index: ít thay đổi -> cập nhật tại chỗ, nhiều / không rõ -> nạp lại toàn bộ
+# ==========================================
+class FakeKnowledgeBase:
+    """Thay cho bảng KnowledgeBase: id -> (content_type, content_text, embedding, reference_id)."""
+
+    def __init__(self, docs):
+        self.docs = dict(docs)
+        self.queries = []
+
+    def rows(self, ids=None):
+        self.queries.append(None if ids is None else set(ids))
+        return [(doc_id, *doc) for doc_id, doc in self.docs.items() if ids is None or doc_id in ids]
+
+
+class InMemoryVectorIndexTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        silence = mock.patch("apps.ai.services.vector_index.print", create=True)
+        silence.start()
+        self.addCleanup(silence.stop)
+        self.db = FakeKnowledgeBase({
+            "1": ("career", "A", [1.0, 0.0], "c1"),
+            "2": ("course", "B", [0.0, 1.0], "k1"),
+        })
+        self.index = InMemoryVectorIndex()
+        self.index._rows = self.db.rows
+        self.index.refresh()
+
+    def _search(self, vector):
+        return [hit[1] for hit in self.index.search(vector, top_k=5)]
+
+    def test_small_change_set_is_applied_in_place(self):
+        self.db.docs["3"] = ("career", "C", [0.6, 0.8], "c2")
+        del self.db.docs["2"]
+        bump_index_version({"2", "3"})
+        with self.settings(AI_INMEMORY_VECTOR_INDEX_INCREMENTAL_MAX=10):
+            self.index.refresh()
+
+        self.assertEqual(self.db.queries[-1], {"2", "3"})
+        self.assertTrue(self.index.is_ready())
+        self.assertEqual(self._search([1.0, 0.0]), ["1", "3"])
+
+    def test_large_change_set_reloads_everything(self):
+        self.db.docs["1"] = ("career", "A2", [0.0, 1.0], "c1")
+        bump_index_version({"1", "2"})
+        with self.settings(AI_INMEMORY_VECTOR_INDEX_INCREMENTAL_MAX=1):
+            self.index.refresh()
+
+        self.assertIsNone(self.db.queries[-1])
+        self.assertEqual(self.index.search([0.0, 1.0], top_k=1)[0][3], "A2")
+
+    def test_bulk_bump_without_ids_reloads_everything(self):
+        bump_index_version()
+        self.index.refresh()
+        self.assertIsNone(self.db.queries[-1])
+        self.assertEqual(self.index._version, get_index_version())
+
+    def test_missing_change_list_reloads_everything(self):
+        version = bump_index_version({"1"})
+        cache.delete(f"kb_vector_index_change:{version}")
+        self.index.refresh()
+        self.assertIsNone(self.db.queries[-1])
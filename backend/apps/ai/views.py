@@ -1,11 +1,24 @@
 import json
 
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework import status
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
 from utils.permissions import IsAdminOrUser, IsAdminUser
-from apps.ai.services.ai_service import create_full_prompt_chat, call_gemini_with_config
+from apps.ai.services.ai_service import create_full_prompt_chat, call_gemini_with_config, stream_gemini_with_config
+from apps.ai.services.async_chat import acreate_full_prompt_chat, acall_gemini_with_config
+from apps.ai.services.model_pool import model_pool
+from apps.ai.services.response_cache import find_cached_response, store_cached_response
+from apps.ai.services.chat_summary import maybe_refresh_summary
+from apps.ai.services.embedding_cache import get_cache_stats, query_embedding_lru
 from apps.ai.models import ChatSession, ChatMessage, AIPromptConfig
 from apps.ai.serializers import ChatMessageSerializer, ChatSessionSerializer, AIPromptConfigSerializer
 
@@ -19,6 +32,13 @@ def _to_bool(value):
     return s in {"1", "true", "yes", "y", "on"}
 
 
+def _get_or_create_session(user, session_id, prompt):
+    if session_id:
+        return get_object_or_404(ChatSession, id=session_id, user=user), False
+    title = prompt[:50] + "..."
+    return ChatSession.objects.create(user=user, title=title), True
+
+
 @api_view(['POST'])
 @permission_classes([IsAdminOrUser])
 def chat_message(request):
@@ -30,31 +50,34 @@ def chat_message(request):
     if not prompt:
         return Response({"message": "Vui lòng nhập nội dung"}, status=400)
 
-    new_session = False
-    if session_id:
-        session = get_object_or_404(ChatSession, id=session_id, user=user)
-    else:
-        title = prompt[:50] + "..."
-        session = ChatSession.objects.create(user=user, title=title)
-        new_session = True
+    session, new_session = _get_or_create_session(user, session_id, prompt)
 
     ChatMessage.objects.create(session=session, role='user', content=prompt)
 
     ai_response_text = ""
+    context_used = []
     try:
-        full_prompt = create_full_prompt_chat(prompt, session, user)
-        response = call_gemini_with_config(full_prompt, model_key)
-
-        if response and response.parts:
-            ai_response_text = response.text
+        # Lượt đầu của session: thử cache câu trả lời theo ngữ nghĩa trước
+        cached = find_cached_response(prompt, user) if new_session else None
+        if cached:
+            ai_response_text, context_used = cached
         else:
-            ai_response_text = "Xin lỗi, hệ thống AI đang bận."
+            full_prompt = create_full_prompt_chat(prompt, session, user)
+            response = call_gemini_with_config(full_prompt, model_key)
+
+            if response and response.parts:
+                ai_response_text = response.text
+                if new_session:
+                    store_cached_response(prompt, user, ai_response_text)
+            else:
+                ai_response_text = "Xin lỗi, hệ thống AI đang bận."
 
     except Exception as e:
             print(f"View Error: {e}")
             ai_response_text = "Đã xảy ra lỗi hệ thống."
 
-    ChatMessage.objects.create(session=session, role='assistant', content=ai_response_text)
+    ChatMessage.objects.create(session=session, role='assistant', content=ai_response_text, context_used=context_used)
+    maybe_refresh_summary(session)
 
     return Response({
         "response": ai_response_text,
@@ -63,6 +86,178 @@ def chat_message(request):
         "new_session": new_session,
     })
 
+# ==========================================
+# CHAT STREAMING (Server-Sent Events)
+# ==========================================
+
+class EventStreamRenderer(BaseRenderer):
+    """Chỉ để DRF chấp nhận header Accept: text/event-stream (response là StreamingHttpResponse)."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _stream_chat(session, new_session, prompt, model_key, user):
+    """
+    Thứ tự event: meta (gửi ngay) -> delta (từng đoạn text) -> done (id tin nhắn đã lưu).
+    Câu trả lời luôn được lưu: khi stream xong, lỗi, hoặc client ngắt kết nối giữa chừng.
+    """
+    chunks = []
+    saved = None
+    context_used = []
+    try:
+        yield _sse("meta", {
+            "session_id": str(session.id),
+            "session_title": session.title,
+            "new_session": new_session,
+        })
+
+        completed = False
+        try:
+            cached = find_cached_response(prompt, user) if new_session else None
+            if cached:
+                text, context_used = cached
+                chunks.append(text)
+                yield _sse("delta", {"text": text})
+            else:
+                full_prompt = create_full_prompt_chat(prompt, session, user)
+                for text in stream_gemini_with_config(full_prompt, model_key):
+                    chunks.append(text)
+                    yield _sse("delta", {"text": text})
+                completed = bool(chunks)
+        except Exception as e:
+            print(f"Stream Error: {e}")
+            if not chunks:
+                chunks.append("Đã xảy ra lỗi hệ thống.")
+                yield _sse("delta", {"text": chunks[0]})
+
+        if not chunks:
+            chunks.append("Xin lỗi, hệ thống AI đang bận.")
+            yield _sse("delta", {"text": chunks[0]})
+
+        saved = ChatMessage.objects.create(
+            session=session, role='assistant', content="".join(chunks), context_used=context_used
+        )
+        # Chỉ cache câu trả lời đã stream trọn vẹn
+        if completed and new_session:
+            store_cached_response(prompt, user, saved.content)
+        maybe_refresh_summary(session)
+        yield _sse("done", {"message_id": str(saved.id), "session_id": str(session.id)})
+    finally:
+        # Client đóng kết nối (GeneratorExit) -> vẫn lưu phần đã nhận được
+        if saved is None and chunks:
+            ChatMessage.objects.create(session=session, role='assistant', content="".join(chunks))
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminOrUser])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def chat_message_stream(request):
+    user = request.user
+    session_id = request.data.get('session_id')
+    prompt = request.data.get('prompt')
+    model_key = request.data.get('model', 'gemini-2.5-flash')
+
+    if not prompt:
+        return Response({"message": "Vui lòng nhập nội dung"}, status=400)
+
+    session, new_session = _get_or_create_session(user, session_id, prompt)
+    ChatMessage.objects.create(session=session, role='user', content=prompt)
+
+    response = StreamingHttpResponse(
+        _stream_chat(session, new_session, prompt, model_key, user),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Tắt buffer của nginx để token tới client ngay
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# ==========================================
+# CHAT ASYNC (chạy qua ASGI - DRF chưa hỗ trợ async view)
+# ==========================================
+
+async def _aauthenticate(request):
+    """Xác thực JWT giống DEFAULT_AUTHENTICATION_CLASSES, trả về user hoặc None."""
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return result[0] if result else None
+
+
+@csrf_exempt
+@require_POST
+async def chat_message_async(request):
+    user = await _aauthenticate(request)
+    if user is None or not user.is_authenticated:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    try:
+        data = json.loads(request.body or b"{}")
+    except json.JSONDecodeError:
+        return JsonResponse({"message": "JSON không hợp lệ"}, status=400)
+
+    session_id = data.get('session_id')
+    prompt = data.get('prompt')
+    model_key = data.get('model', 'gemini-2.5-flash')
+
+    if not prompt:
+        return JsonResponse({"message": "Vui lòng nhập nội dung"}, status=400)
+
+    new_session = False
+    if session_id:
+        try:
+            session = await ChatSession.objects.filter(id=session_id, user=user).afirst()
+        except ValidationError:
+            session = None
+        if session is None:
+            return JsonResponse({"detail": "Not found."}, status=404)
+    else:
+        session = await ChatSession.objects.acreate(user=user, title=prompt[:50] + "...")
+        new_session = True
+
+    await ChatMessage.objects.acreate(session=session, role='user', content=prompt)
+
+    ai_response_text = ""
+    context_used = []
+    try:
+        cached = await sync_to_async(find_cached_response)(prompt, user) if new_session else None
+        if cached:
+            ai_response_text, context_used = cached
+        else:
+            full_prompt = await acreate_full_prompt_chat(prompt, session, user)
+            response = await acall_gemini_with_config(full_prompt, model_key)
+
+            if response and response.parts:
+                ai_response_text = response.text
+                if new_session:
+                    await sync_to_async(store_cached_response)(prompt, user, ai_response_text)
+            else:
+                ai_response_text = "Xin lỗi, hệ thống AI đang bận."
+
+    except Exception as e:
+        print(f"View Error: {e}")
+        ai_response_text = "Đã xảy ra lỗi hệ thống."
+
+    await ChatMessage.objects.acreate(
+        session=session, role='assistant', content=ai_response_text, context_used=context_used
+    )
+    await sync_to_async(maybe_refresh_summary)(session)
+
+    return JsonResponse({
+        "response": ai_response_text,
+        "session_id": str(session.id),
+        "session_title": session.title,
+        "new_session": new_session,
+    })
+
 @api_view(['GET'])
 @permission_classes([IsAdminOrUser])
 def get_chat_sessions(request):
@@ -103,6 +298,7 @@ def ai_config(request):
             # Tự động tắt config cũ
             if request.data.get('is_active'):
                  AIPromptConfig.objects.filter(is_active=True).update(is_active=False)
+            # AIPromptConfig.save() tự báo các worker nạp lại config
             serializer.save()
             return Response({"message": "Thành công", "data": serializer.data}, status=201)
         return Response(serializer.errors, status=400)
@@ -115,3 +311,13 @@ def activate_ai_config(request, pk):
     config.is_active = True
     config.save()
     return Response({"message": f"Đã kích hoạt: {config.name}"}, status=200)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def ai_runtime_stats(request):
+    """Thống kê cache embedding + client Gemini của worker hiện tại"""
+    return Response({
+        "query_embedding_lru": query_embedding_lru.stats(),
+        "embedding_cache": get_cache_stats(),
+        "gemini_models": model_pool.stats(),
+    }, status=200)
@@ -0,0 +1,40 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.career.services.career_match_service import refresh_career_matches
+
+
+class Command(BaseCommand):
+    help = 'Tính sẵn top-N career phù hợp cho mỗi (user, industry) bằng nhân ma trận NumPy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Tính lại cho mọi user (mặc định chỉ user mới / đổi vector / catalog đổi)')
+        parser.add_argument('--top-n', type=int, default=settings.AI_CAREER_MATCH_TOP_N,
+                            help='Số career lưu cho mỗi (user, industry), nên giữ bằng AI_CAREER_MATCH_TOP_N')
+        parser.add_argument('--block-size', type=int, default=512, help='Số user mỗi lần nhân ma trận')
+
+    def handle(self, *args, **options):
+        top_n = max(1, options['top_n'])
+        block_size = max(1, options['block_size'])
+        mode = "FULL" if options['full'] else "INCREMENTAL"
+        self.stdout.write(self.style.WARNING(f"=== COMPUTE CAREER MATCHES ({mode}, top {top_n}) ==="))
+
+        start = time.perf_counter()
+        stats = refresh_career_matches(
+            full=options['full'],
+            top_n=top_n,
+            block_size=block_size,
+            stdout=self.stdout
+        )
+        elapsed = time.perf_counter() - start
+
+        if not stats['careers']:
+            self.stdout.write(self.style.ERROR("Không có career nào có embedding. Chạy embed_data trước."))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Xong: {stats['users']} user x {stats['careers']} career -> {stats['matches']} dòng ({elapsed:.1f}s)"
+        ))
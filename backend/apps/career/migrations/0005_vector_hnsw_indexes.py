@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-18 18:56
+
+import pgvector.django.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('career', '0004_alter_industry_options_remove_industry_holland_codes_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='career',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='career_embedding_hnsw', opclasses=['vector_cosine_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='course_embedding_hnsw', opclasses=['vector_cosine_ops']),
+        ),
+    ]
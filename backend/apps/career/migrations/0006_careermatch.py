@@ -0,0 +1,35 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('career', '0005_vector_hnsw_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CareerMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rank', models.PositiveSmallIntegerField(help_text='Thứ hạng trong (user, industry), bắt đầu từ 1')),
+                ('catalog_hash', models.CharField(help_text='Hash danh sách career lúc tính', max_length=16)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('career', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='matches', to='career.career')),
+                ('industry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='career.industry')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='career_matches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'career_matches',
+                'indexes': [models.Index(fields=['user', 'industry', 'rank'], name='career_match_rank_idx')],
+                'unique_together': {('user', 'career')},
+            },
+        ),
+    ]
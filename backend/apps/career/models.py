@@ -1,7 +1,9 @@
 from django.db import models
 import uuid
 from django.conf import settings
-from pgvector.django import VectorField
+from django.utils import timezone
+from pgvector.django import HnswIndex
+from utils.fields import EmbeddingField
 
 # ENUM cho độ khó khóa học
 class CourseLevel(models.TextChoices):
@@ -54,7 +56,7 @@ class Career(models.Model):
     salary_max = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
     # Xu hướng tương lai (Data để AI "chém gió")
     future_outlook = models.TextField(blank=True, null=True)
-    embedding = VectorField(dimensions=768, null=True, blank=True)
+    embedding = EmbeddingField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -65,6 +67,15 @@ class Career(models.Model):
         db_table = 'careers'
         # Đảm bảo không nhập trùng nghề trong cùng 1 ngành
         unique_together = ('industry', 'title', 'level')
+        indexes = [
+            HnswIndex(
+                name='career_embedding_hnsw',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_cosine_ops'],
+            ),
+        ]
 
     # ==========================================
 
@@ -90,6 +101,30 @@ class CareerRecommendation(models.Model):
         db_table = 'career_recommendations'
 
 
+class CareerMatch(models.Model):
+    """
+    Top-N career hợp nhất của mỗi user trong từng industry, tính sẵn bởi
+    `manage.py compute_career_matches` (đã bỏ trùng title, score = cosine similarity * 100).
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='career_matches')
+    career = models.ForeignKey(Career, on_delete=models.CASCADE, related_name='matches')
+    industry = models.ForeignKey(Industry, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField(help_text="Thứ hạng trong (user, industry), bắt đầu từ 1")
+    catalog_hash = models.CharField(max_length=16, help_text="Hash danh sách career lúc tính")
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'career_matches'
+        unique_together = ('user', 'career')
+        indexes = [
+            models.Index(fields=['user', 'industry', 'rank'], name='career_match_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} -> {self.career_id} ({self.score})"
+
+
 class Course(models.Model):
     # Dùng AutoField hoặc Serial như SQL
     id = models.AutoField(primary_key=True)
@@ -98,7 +133,7 @@ class Course(models.Model):
     provider = models.CharField(max_length=100, blank=True, null=True)  # VD: Udemy, Coursera
     description = models.TextField(blank=True, null=True)
     url = models.URLField(max_length=500, blank=True, null=True) 
-    embedding = VectorField(dimensions=768, null=True, blank=True)
+    embedding = EmbeddingField(null=True, blank=True)
 
     # Các thông số hỗ trợ tính toán lộ trình
     price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
@@ -109,6 +144,15 @@ class Course(models.Model):
 
     class Meta:
         db_table = "courses"
+        indexes = [
+            HnswIndex(
+                name='course_embedding_hnsw',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_cosine_ops'],
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.provider})"
\ No newline at end of file
@@ -10,12 +10,13 @@ class IndustrySerializer(serializers.ModelSerializer):
 class CareerSerializer(serializers.ModelSerializer):
     class Meta:
         model= Career
-        fields='__all__'
+        # embedding (768 float) chỉ dùng nội bộ, không gửi qua API
+        exclude=['embedding']
 
 class CourseSerializer(serializers.ModelSerializer):
     class Meta:
         model= Course
-        fields= '__all__'
+        exclude= ['embedding']
     
     def validate_price(self, value):
         """Kiểm tra giá tiền không được âm"""
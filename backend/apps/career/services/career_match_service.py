@@ -0,0 +1,218 @@
+import hashlib
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from apps.career.models import Career, CareerMatch
+from apps.users.models import UserProfile
+
+# ==========================================
+# Ma trận user x career: nạp toàn bộ profile_vector + Career.embedding vào NumPy,
+# nhân ma trận theo block user, giữ top-N mỗi (user, industry) vào bảng career_matches.
+# ==========================================
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def to_score(similarity):
+    """Cùng công thức với recommend_careers_in_industry: (1 - cosine distance) * 100."""
+    return round(max(0.0, float(similarity) * 100), 1)
+
+
+class CareerCatalog:
+    """Career có embedding, đã chuẩn hóa, nhóm cột theo industry."""
+
+    def __init__(self):
+        rows = list(
+            Career.objects.filter(embedding__isnull=False)
+            .order_by('id')
+            .values_list('id', 'industry_id', 'title', 'embedding')
+        )
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.industry_ids = [row[1] for row in rows]
+        self.titles = [row[2].strip() for row in rows]
+        if rows:
+            self.matrix = _normalize_rows(np.asarray([row[3] for row in rows], dtype=np.float32))
+        else:
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+
+        self.columns_by_industry = {}
+        for col, industry_id in enumerate(self.industry_ids):
+            self.columns_by_industry.setdefault(industry_id, []).append(col)
+        self.columns_by_industry = {
+            industry_id: np.array(cols, dtype=np.int64) for industry_id, cols in self.columns_by_industry.items()
+        }
+        # Industry có title trùng mới cần bỏ trùng từng dòng
+        self.has_duplicate_titles = {
+            industry_id: len({self.titles[c] for c in cols}) < len(cols)
+            for industry_id, cols in self.columns_by_industry.items()
+        }
+
+        digest = hashlib.sha256()
+        for career_id, industry_id, title in zip(self.ids.tolist(), self.industry_ids, self.titles):
+            digest.update(f"{career_id}|{industry_id}|{title}\n".encode('utf-8'))
+        digest.update(self.matrix.tobytes())
+        self.hash = digest.hexdigest()[:16]
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _top_columns(row, cols, top_n, titles, dedupe):
+    """Cột tốt nhất (đã bỏ trùng title nếu cần) của 1 user trong 1 industry, giảm dần theo score."""
+    scores = row[cols]
+    # Bỏ trùng thì không biết trước cần bao nhiêu cột -> duyệt toàn bộ đã sắp xếp đến khi đủ top_n title
+    take = len(cols) if dedupe else min(len(cols), top_n)
+    if take < len(cols):
+        idx = np.argpartition(-scores, take - 1)[:take]
+    else:
+        idx = np.arange(len(cols))
+    idx = idx[np.argsort(-scores[idx], kind='stable')]
+
+    if not dedupe:
+        return [(cols[i], scores[i]) for i in idx[:top_n]]
+
+    picked, seen = [], set()
+    for i in idx:
+        title = titles[cols[i]]
+        if title in seen: continue
+        seen.add(title)
+        picked.append((cols[i], scores[i]))
+        if len(picked) >= top_n: break
+    return picked
+
+
+def compute_matches_for_block(user_ids, vectors, catalog, top_n, computed_at):
+    """1 block user: (b x d) @ (d x m) rồi lấy top-N theo industry. Trả về list CareerMatch."""
+    similarities = _normalize_rows(np.asarray(vectors, dtype=np.float32)) @ catalog.matrix.T
+
+    matches = []
+    for row_idx, user_id in enumerate(user_ids):
+        row = similarities[row_idx]
+        for industry_id, cols in catalog.columns_by_industry.items():
+            picked = _top_columns(row, cols, top_n, catalog.titles, catalog.has_duplicate_titles[industry_id])
+            for rank, (col, similarity) in enumerate(picked, start=1):
+                matches.append(CareerMatch(
+                    user_id=user_id,
+                    career_id=int(catalog.ids[col]),
+                    industry_id=industry_id,
+                    score=to_score(similarity),
+                    rank=rank,
+                    catalog_hash=catalog.hash,
+                    computed_at=computed_at
+                ))
+    return matches
+
+
+def users_needing_refresh(catalog_hash):
+    """User có vector mà chưa có match, match tính theo catalog cũ, hoặc vector mới hơn lần tính."""
+    last = CareerMatch.objects.values('user_id').annotate(
+        computed_at=Max('computed_at')
+    )
+    last = {row['user_id']: row['computed_at'] for row in last}
+    stale_catalog = set(
+        CareerMatch.objects.exclude(catalog_hash=catalog_hash).values_list('user_id', flat=True).distinct()
+    )
+
+    user_ids = []
+    profiles = UserProfile.objects.filter(profile_vector__isnull=False).values_list('user_id', 'vector_updated_at')
+    for user_id, vector_updated_at in profiles.iterator():
+        computed_at = last.get(user_id)
+        if (computed_at is None or user_id in stale_catalog
+                or (vector_updated_at is not None and vector_updated_at > computed_at)):
+            user_ids.append(user_id)
+    return user_ids
+
+
+def refresh_career_matches(user_ids=None, full=False, top_n=None, block_size=512, stdout=None):
+    """
+    Tính lại career_matches. Mặc định chỉ các user cần tính lại (xem users_needing_refresh);
+    full=True -> mọi user có profile_vector. Trả về dict thống kê.
+    """
+    top_n = top_n or settings.AI_CAREER_MATCH_TOP_N
+    catalog = CareerCatalog()
+    if not len(catalog):
+        return {"users": 0, "matches": 0, "careers": 0}
+
+    if user_ids is None:
+        if full:
+            user_ids = list(UserProfile.objects.filter(profile_vector__isnull=False).values_list('user_id', flat=True))
+        else:
+            user_ids = users_needing_refresh(catalog.hash)
+
+    total_matches = 0
+    for start in range(0, len(user_ids), block_size):
+        block_ids = user_ids[start:start + block_size]
+        rows = list(
+            UserProfile.objects.filter(user_id__in=block_ids, profile_vector__isnull=False)
+            .values_list('user_id', 'profile_vector')
+        )
+        computed_at = timezone.now()
+        matches = compute_matches_for_block(
+            [row[0] for row in rows], [row[1] for row in rows], catalog, top_n, computed_at
+        ) if rows else []
+
+        with transaction.atomic():
+            CareerMatch.objects.filter(user_id__in=block_ids).delete()
+            CareerMatch.objects.bulk_create(matches, batch_size=2000)
+        total_matches += len(matches)
+
+        if stdout:
+            stdout.write(f"  {min(start + block_size, len(user_ids))}/{len(user_ids)} users, {len(matches)} matches")
+
+    return {"users": len(user_ids), "matches": total_matches, "careers": len(catalog)}
+
+
+# ==========================================
+# Đọc điểm đã tính sẵn
+# ==========================================
+
+def _fresh_matches(user):
+    """Match của user còn hợp lệ (tính sau lần cuối profile_vector đổi)."""
+    profile = getattr(user, 'profile', None)
+    qs = CareerMatch.objects.filter(user=user)
+    if profile is not None and profile.vector_updated_at is not None:
+        qs = qs.filter(computed_at__gte=profile.vector_updated_at)
+    return qs
+
+
+def get_precomputed_careers(user, industry_id, limit, offset):
+    """Trang career của (user, industry) từ career_matches; None nếu chưa tính / không đủ để phục vụ."""
+    top_n = settings.AI_CAREER_MATCH_TOP_N
+    if offset + limit > top_n:
+        return None
+
+    matches = _fresh_matches(user).filter(industry_id=industry_id)
+    rows = list(
+        matches.order_by('rank').values(
+            'score', 'career_id', 'career__title', 'career__level',
+            'career__salary_min', 'career__salary_max', 'career__description'
+        )[offset:offset + limit]
+    )
+    if rows:
+        return rows
+    # Trang rỗng: hết danh sách ([]) hoặc user chưa được tính (None)
+    return [] if matches.exists() else None
+
+
+def get_match_score(user, career):
+    """Điểm phù hợp thật của user với 1 career: đọc career_matches, không có thì tính trực tiếp."""
+    match = _fresh_matches(user).filter(career=career).values_list('score', flat=True).first()
+    if match is not None:
+        return match
+
+    profile = getattr(user, 'profile', None)
+    vector = profile.profile_vector if profile is not None else None
+    if vector is None or career.embedding is None:
+        return 0
+
+    u = np.asarray(vector, dtype=np.float32)
+    c = np.asarray(career.embedding, dtype=np.float32)
+    denom = np.linalg.norm(u) * np.linalg.norm(c)
+    return to_score(np.dot(u, c) / denom) if denom else 0
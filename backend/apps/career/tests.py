@@ -1,3 +1,36 @@
-from django.test import TestCase
+import numpy as np
+from django.test import SimpleTestCase
 
-# Create your tests here.
+from apps.career.services.career_match_service import _top_columns
+
+
+# ==========================================
+# career_match_service._top_columns: top-N trong 1 industry, bỏ trùng title
+# ==========================================
+class TopColumnsTests(SimpleTestCase):
+    def setUp(self):
+        # Cột 0..5: 4 cột tốt nhất đều là "Dev" -> bỏ trùng phải duyệt quá top_n * 2 cột
+        self.row = np.array([0.9, 0.8, 0.7, 0.6, 0.5, 0.4], dtype=np.float32)
+        self.cols = np.array([0, 1, 2, 3, 4, 5])
+        self.titles = ["Dev", "Dev", "Dev", "Dev", "QA", "PM"]
+
+    def _picked(self, top_n, dedupe, cols=None):
+        cols = self.cols if cols is None else cols
+        return [int(col) for col, _ in _top_columns(self.row, cols, top_n, self.titles, dedupe)]
+
+    def test_without_dedupe_returns_best_columns(self):
+        self.assertEqual(self._picked(3, dedupe=False), [0, 1, 2])
+
+    def test_dedupe_walks_past_duplicate_titles(self):
+        self.assertEqual(self._picked(2, dedupe=True), [0, 4])
+        self.assertEqual(self._picked(3, dedupe=True), [0, 4, 5])
+
+    def test_dedupe_returns_fewer_when_titles_run_out(self):
+        self.assertEqual(self._picked(5, dedupe=True), [0, 4, 5])
+
+    def test_only_columns_of_the_industry(self):
+        self.assertEqual(self._picked(2, dedupe=True, cols=np.array([1, 3, 5])), [1, 5])
+
+    def test_scores_are_descending(self):
+        scores = [score for _, score in _top_columns(self.row, self.cols, 6, self.titles, False)]
+        self.assertEqual(scores, sorted(scores, reverse=True))
@@ -10,6 +10,19 @@ from apps.ai.services.ai_service import (
 )
 from apps.career.models import CareerRecommendation
 
+def _int_param(request, name, default, min_value, max_value):
+    raw = request.query_params.get(name)
+    if raw in (None, ''):
+        return default
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        raise ValidationError({name: "Phải là số nguyên."})
+    if value < min_value or (max_value is not None and value > max_value):
+        raise ValidationError({name: f"Phải nằm trong khoảng {min_value} - {max_value or '...'}."})
+    return value
+
+
 class IndustrySuggestionAPI(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -54,11 +67,16 @@ class CareerRecommendationAPI(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        careers = recommend_careers_in_industry(request.user, industry_id)
+        limit = _int_param(request, 'limit', 10, 1, 50)
+        offset = _int_param(request, 'offset', 0, 0, None)
+
+        careers = recommend_careers_in_industry(request.user, industry_id, limit=limit, offset=offset)
 
         return Response({
             "success": True,
             "industry_id": industry_id,
+            "limit": limit,
+            "offset": offset,
             "data": careers
         }, status=status.HTTP_200_OK)
 
@@ -1,3 +1,24 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
-# Register your models here.
+from apps.learning_paths.models import LearningPathTemplate
+
+
+@admin.register(LearningPathTemplate)
+class LearningPathTemplateAdmin(admin.ModelAdmin):
+	list_display = ("career", "education_level", "prompt_version", "use_count", "refreshed_at")
+	search_fields = ("career__title",)
+	list_filter = ("prompt_version", "education_level")
+	actions = ("regenerate",)
+
+	@admin.action(description="Sinh lại lộ trình bằng AI")
+	def regenerate(self, request, queryset):
+		from apps.ai.services.ai_service import refresh_learning_path_template
+
+		done = 0
+		for template in queryset.select_related("career"):
+			result = refresh_learning_path_template(template.career, template.education_level)
+			if isinstance(result, dict):
+				self.message_user(request, f"{template}: {result.get('error')}", messages.ERROR)
+			else:
+				done += 1
+		self.message_user(request, f"Đã sinh lại {done} template.", messages.SUCCESS)
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('career', '0005_vector_hnsw_indexes'),
+        ('learning_paths', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LearningPathTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('education_level', models.CharField(blank=True, default='', max_length=20)),
+                ('prompt_version', models.CharField(max_length=20)),
+                ('steps', models.JSONField(default=list)),
+                ('use_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('career', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='learning_path_templates', to='career.career')),
+            ],
+            options={
+                'db_table': 'learning_path_templates',
+                'unique_together': {('career', 'education_level', 'prompt_version')},
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 import uuid
+from datetime import timedelta
 from django.conf import settings
 from django.utils import timezone
 from apps.career.models import Career, Course
@@ -11,6 +12,29 @@ class PathStatus(models.TextChoices):
     ARCHIVED = 'archived', 'Archived'
 
 
+class LearningPathTemplate(models.Model):
+    """Danh sách bước do AI sinh cho 1 (career, trình độ, phiên bản prompt), dùng lại cho mọi user."""
+    career = models.ForeignKey(Career, on_delete=models.CASCADE, related_name='learning_path_templates')
+    education_level = models.CharField(max_length=20, blank=True, default='')
+    prompt_version = models.CharField(max_length=20)
+    # [{"step_name": "...", "description": "..."}]
+    steps = models.JSONField(default=list)
+    use_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    refreshed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'learning_path_templates'
+        unique_together = ('career', 'education_level', 'prompt_version')
+
+    def __str__(self):
+        return f"{self.career} [{self.education_level or 'N/A'}] {self.prompt_version}"
+
+    def is_stale(self):
+        ttl_days = getattr(settings, 'AI_LEARNING_PATH_TEMPLATE_TTL_DAYS', 30)
+        return ttl_days > 0 and self.refreshed_at < timezone.now() - timedelta(days=ttl_days)
+
+
 class LearningPath(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.CASCADE,related_name='learning_paths')
@@ -2,6 +2,7 @@
 import json
 import re
 from apps.ai.services.ai_service import get_embedding
+from apps.ai.services.vector_search import hnsw_search
 from apps.career.models import Course
 from pgvector.django import CosineDistance
 
@@ -16,9 +17,10 @@ def _find_matching_course(step_description):
         step_vector = get_embedding(step_description, task_type="retrieval_query")
         if not step_vector: return None
 
-        match = Course.objects.annotate(
-            distance=CosineDistance('embedding', step_vector)
-        ).order_by('distance').first()
+        with hnsw_search(top_k=1):
+            match = Course.objects.annotate(
+                distance=CosineDistance('embedding', step_vector)
+            ).order_by('distance').first()
 
         if match and match.distance < 0.45: 
             return match
@@ -1,25 +1,17 @@
-import time
-import os
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.utils import timezone
 from apps.users.models import UserProfile, UserSkill 
-import google.generativeai as genai
-from dotenv import load_dotenv
-
-load_dotenv()
-
-api_key = os.environ.get("GEMINI_API_KEY")
+from apps.ai.services.ai_service import get_embeddings
 
 class Command(BaseCommand):
     help = 'Tạo embedding cho cả UserProfile và từng UserSkill'
 
     def handle(self, *args, **kwargs):
-        if not api_key:
+        if settings.AI_PROVIDER == 'gemini' and not settings.GEMINI_API_KEY:
             self.stdout.write(self.style.ERROR("Chưa cấu hình GEMINI_API_KEY!"))
             return
 
-        genai.configure(api_key=api_key)
-
         # ====================================================
         # PHẦN 1: EMBEDDING CHO TỪNG SKILL RIÊNG LẺ (Cái bạn đang cần)
         # ====================================================
@@ -29,25 +21,22 @@ class Command(BaseCommand):
         if total_skills > 0:
             self.stdout.write(self.style.WARNING(f"--- Bắt đầu tạo vector cho {total_skills} UserSkill ---"))
             
-            for i, skill in enumerate(skills):
-                try:
-                    # Tạo vector cho tên kỹ năng (VD: "Python Programming")
-                    # Task type là 'retrieval_document' vì lưu vào DB
-                    result = genai.embed_content(
-                        model="models/text-embedding-004",
-                        content=skill.skill_name,
-                        task_type="retrieval_document",
-                        title=f"Skill: {skill.skill_name}"
-                    )
-                    
-                    skill.embedding = result['embedding']
-                    skill.save()
-                    
+            skills = list(skills)
+            # Tạo vector cho tên kỹ năng (VD: "Python Programming")
+            # Task type là 'retrieval_document' vì lưu vào DB
+            vectors = get_embeddings([skill.skill_name for skill in skills], task_type="retrieval_document")
+
+            updated = []
+            for i, (skill, vector) in enumerate(zip(skills, vectors)):
+                if vector:
+                    skill.embedding = vector
+                    updated.append(skill)
                     self.stdout.write(f"Skill [{i+1}/{total_skills}]: {skill.skill_name} -> OK")
-                    time.sleep(0.3) # Sleep nhẹ
+                else:
+                    self.stdout.write(self.style.ERROR(f"Lỗi Skill ID {skill.id}: không tạo được vector"))
 
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"Lỗi Skill ID {skill.id}: {e}"))
+            # bulk_update không bắn post_save -> signal không embed lại từng skill
+            UserSkill.objects.bulk_update(updated, ['embedding'], batch_size=500)
         else:
             self.stdout.write("Toàn bộ UserSkill đã có vector, bỏ qua phần này.")
 
@@ -65,41 +54,40 @@ class Command(BaseCommand):
         if total_profiles > 0:
             self.stdout.write(self.style.WARNING(f"--- Bắt đầu tạo vector tổng hợp cho {total_profiles} UserProfile ---"))
 
-            for i, profile in enumerate(profiles):
-                try:
-                    # Lấy text skills
-                    skills_qs = profile.user.skills.all()
-                    skills_str = ", ".join([f"{s.skill_name} (Lv {s.proficiency_level})" for s in skills_qs])
-                    
-                    # Lấy text interests
-                    interests_qs = profile.user.interests.all()
-                    interests_str = ", ".join([i.keyword for i in interests_qs])
-
-                    text_content = f"""
-                    Job: {profile.current_job_title}
-                    Edu: {profile.get_education_level_display()}
-                    Bio: {profile.bio}
-                    Skills: {skills_str}
-                    Interests: {interests_str}
-                    """.strip()
-
-                    if len(text_content) < 10: continue
-
-                    result = genai.embed_content(
-                        model="models/text-embedding-004",
-                        content=text_content,
-                        task_type="retrieval_document",
-                        title=f"Profile: {profile.user.email}"
-                    )
-
-                    profile.profile_vector = result['embedding']
-                    profile.save()
-
+            entries = []
+            for profile in profiles:
+                # Lấy text skills
+                skills_qs = profile.user.skills.all()
+                skills_str = ", ".join([f"{s.skill_name} (Lv {s.proficiency_level})" for s in skills_qs])
+                
+                # Lấy text interests
+                interests_qs = profile.user.interests.all()
+                interests_str = ", ".join([i.keyword for i in interests_qs])
+
+                text_content = f"""
+                Job: {profile.current_job_title}
+                Edu: {profile.get_education_level_display()}
+                Bio: {profile.bio}
+                Skills: {skills_str}
+                Interests: {interests_str}
+                """.strip()
+
+                if len(text_content) < 10: continue
+                entries.append((profile, text_content))
+
+            vectors = get_embeddings([text for _, text in entries], task_type="retrieval_document")
+
+            updated = []
+            for i, ((profile, _), vector) in enumerate(zip(entries, vectors)):
+                if vector:
+                    profile.profile_vector = vector
+                    profile.vector_updated_at = timezone.now()
+                    updated.append(profile)
                     self.stdout.write(self.style.SUCCESS(f"Profile [{i+1}/{total_profiles}]: {profile.user.email} -> OK"))
-                    time.sleep(0.5)
+                else:
+                    self.stdout.write(self.style.ERROR(f"Lỗi Profile {profile.id}: không tạo được vector"))
 
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"Lỗi Profile {profile.id}: {e}"))
+            UserProfile.objects.bulk_update(updated, ['profile_vector', 'vector_updated_at'], batch_size=500)
         else:
              self.stdout.write("Toàn bộ UserProfile đã có vector.")
 
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-18 18:56
+
+import pgvector.django.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_userskill_embedding'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['profile_vector'], m=16, name='profile_vector_hnsw', opclasses=['vector_cosine_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='userskill',
+            index=pgvector.django.indexes.HnswIndex(ef_construction=64, fields=['embedding'], m=16, name='userskill_embedding_hnsw', opclasses=['vector_cosine_ops']),
+        ),
+    ]
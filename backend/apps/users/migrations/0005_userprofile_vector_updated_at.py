@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 19:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_vector_hnsw_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='vector_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -3,7 +3,9 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
-from pgvector.django import VectorField
+from django.conf import settings
+from pgvector.django import HnswIndex
+from utils.fields import EmbeddingField
 
 # ==========================================
 # 1. ENUMS (Lựa chọn)
@@ -118,7 +120,21 @@ class UserProfile(models.Model):
     linkedin_url = models.URLField(blank=True, null=True)
     mbti_result = models.CharField(max_length=10, blank=True, null=True)
     holland_result = models.CharField(max_length=10, blank=True, null=True)
-    profile_vector = VectorField(dimensions=768, null=True)
+    profile_vector = EmbeddingField(null=True)
+    # Lần cuối profile_vector được ghi (compute_career_matches dùng để tính lại phần thay đổi)
+    vector_updated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            HnswIndex(
+                name='profile_vector_hnsw',
+                fields=['profile_vector'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_cosine_ops'],
+            ),
+        ]
+
     def __str__(self):
         return self.user.email
 
@@ -143,11 +159,20 @@ class UserSkill(models.Model):
         validators=[MinValueValidator(1), MaxValueValidator(5)],
         help_text="1: Cơ bản, 2: Sơ cấp, 3: Trung cấp, 4: Cao cấp, 5: Chuyên gia"
     )
-    embedding=VectorField(dimensions=768,null=True)
+    embedding=EmbeddingField(null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     class Meta:
         db_table = 'user_skills'
         unique_together = ('user', 'skill_name')
+        indexes = [
+            HnswIndex(
+                name='userskill_embedding_hnsw',
+                fields=['embedding'],
+                m=16,
+                ef_construction=64,
+                opclasses=['vector_cosine_ops'],
+            ),
+        ]
 
     def __str__(self):
         return f"{self.skill_name} ({self.proficiency_level})"
\ No newline at end of file
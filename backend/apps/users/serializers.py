@@ -1,7 +1,9 @@
 from rest_framework import serializers
 from django.db import transaction
 from apps.users.models import User, UserInterest, UserProfile, UserSkill
-from apps.ai.services.ai_service import get_embedding
+from apps.ai.services.embedding_outbox import enqueue_embeddings
+from apps.ai.services.profile_vector_scheduler import mark_profile_dirty
+from apps.ai.services.profile_context_cache import invalidate_profile_context
 class UserSkillSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserSkill
@@ -85,54 +87,25 @@ class UserProfileSerializer(serializers.ModelSerializer):
         # =========================================================
         if skills_data is not None:
             UserSkill.objects.filter(user=instance.user).delete()
-            new_skills = []
-            
-            for item in skills_data:
-                skill = UserSkill(
+            new_skills = [
+                UserSkill(
                     user=instance.user,
                     skill_name=item['skill_name'],
                     proficiency_level=item['proficiency_level']
                 )
-                
-                try:
-                    vector = get_embedding(skill.skill_name, task_type="retrieval_document")
-                    if vector:
-                        skill.embedding = vector
-                except Exception as e:
-                    print(f"Không thể tạo vector cho skill {skill.skill_name}: {e}")
-                
-                new_skills.append(skill)
-            
+                for item in skills_data
+            ]
+
             UserSkill.objects.bulk_create(new_skills)
+            # bulk_create không bắn signal -> tự đưa skill mới vào outbox để embed sau
+            enqueue_embeddings(new_skills)
 
         # =========================================================
-        # 6. TỰ ĐỘNG CẬP NHẬT VECTOR PROFILE
+        # 6. TỰ ĐỘNG CẬP NHẬT VECTOR PROFILE + CACHE CONTEXT HỒ SƠ
+        # bulk_create không bắn signal nên đánh dấu thủ công; mọi lần đánh dấu
+        # trong transaction này được gộp lại thành 1 lần tính sau commit.
         # =========================================================
-        try:
-            user = instance.user
-            current_interests = UserInterest.objects.filter(user=user)
-            interests_str = ", ".join([i.keyword for i in current_interests])
-            
-            current_skills = UserSkill.objects.filter(user=user)
-            skills_str = ", ".join([f"{s.skill_name} (Lv {s.proficiency_level})" for s in current_skills])
-
-            text_content = f"""
-            Job: {instance.current_job_title or 'Unknown'}
-            Edu: {instance.get_education_level_display() or 'Unknown'}
-            Bio: {instance.bio or ''}
-            Skills: {skills_str}
-            Interests: {interests_str}
-            MBTI: {instance.mbti_result or ''}
-            Holland: {instance.holland_result or ''}
-            """.strip()
-
-            vector = get_embedding(text_content, task_type="retrieval_document")
-            
-            if vector:
-                instance.profile_vector = vector
-                instance.save(update_fields=['profile_vector'])
-
-        except Exception as e:
-            print(f"Lỗi tạo embedding profile: {e}")
+        mark_profile_dirty(instance.user_id)
+        invalidate_profile_context(instance.user_id)
 
         return instance
\ No newline at end of file
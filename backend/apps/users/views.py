@@ -6,7 +6,6 @@ from rest_framework.response import Response
 from rest_framework import status
 from apps.users.services.test_service import HollandTestService, MBTITestService, TestResultService
 from utils.permissions import IsAdminUser, IsAdminOrUser
-from apps.ai.services.ai_service import get_embedding
 from apps.custom_auth.services.auth_service import check_user_onboarding_status
 
 
@@ -105,40 +104,8 @@ def profile(request):
         serializer = UserProfileSerializer(profile_instance, data=request.data, partial=True)
         
         if serializer.is_valid():
-            updated_profile = serializer.save()
-            
-            try:
-                # 1. Lấy chuỗi sở thích
-                interests_qs = user.interests.all()
-                interests_str = ", ".join([i.keyword for i in interests_qs])
-
-                # 2. Lấy chuỗi Kỹ năng (MỚI THÊM)
-                skills_qs = UserSkill.objects.filter(user=user)
-                skills_str = ", ".join([f"{s.skill_name} (Level {s.proficiency_level}/5)" for s in skills_qs])
-                
-                # 3. Tạo nội dung để embed
-                text_content = f"""
-                Job Title: {updated_profile.current_job_title or 'Unknown'}
-                Education: {updated_profile.get_education_level_display() or 'Unknown'}
-                Bio: {updated_profile.bio or ''}
-                Skills: {skills_str} 
-                Interests: {interests_str}
-                MBTI: {updated_profile.mbti_result or ''}
-                Holland Code: {updated_profile.holland_result or ''}
-                """.strip()
-
-                print(f"Embedding Content for {user.email}:\n{text_content}") # Debug xem nội dung đúng chưa
-
-                # 4. Gọi AI tạo Vector
-                vector = get_embedding(text_content, task_type="retrieval_document")
-                
-                if vector:
-                    updated_profile.profile_vector = vector
-                    updated_profile.save(update_fields=['profile_vector'])
-                    print(f"Updated vector for user {user.email}")
-                    
-            except Exception as e:
-                print(f"Error updating vector: {e}")
+            # profile_vector được tính lại 1 lần sau commit (xem mark_profile_dirty)
+            serializer.save()
 
             return Response(serializer.data, status=status.HTTP_200_OK)
         
@@ -0,0 +1,21 @@
+import threading
+
+from django.db import connections
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Chạy 1 tác vụ dài (embedding, gọi AI...) trong thread riêng để request trả về ngay.
+    Thread tự đóng DB connection của nó khi xong.
+    """
+    def runner():
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            print(f"Background task error ({getattr(func, '__name__', func)}): {e}")
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=runner, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS
+
+# Backend chỉ nằm trong từng process: mỗi worker gunicorn có bản riêng,
+# version / invalidation ghi ở worker này không tới được worker khác
+_PROCESS_LOCAL_BACKENDS = ('LocMemCache', 'DummyCache')
+
+
+def is_shared_cache(alias=DEFAULT_CACHE_ALIAS):
+    """True nếu cache được chia sẻ giữa các process (Redis, Memcached, DB...), xem REDIS_URL."""
+    backend = settings.CACHES[alias]['BACKEND']
+    return not backend.endswith(_PROCESS_LOCAL_BACKENDS)
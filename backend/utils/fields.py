@@ -0,0 +1,23 @@
+from django.conf import settings
+from pgvector.django import VectorField
+
+# Số chiều ghi trong migration (text-embedding-004 gốc). Cột thật trong DB đổi theo
+# AI_EMBEDDING_DIMENSIONS bằng `manage.py resize_embeddings`, không qua migration.
+SCHEMA_DIMENSIONS = 768
+
+
+class EmbeddingField(VectorField):
+    """
+    VectorField có số chiều = settings.AI_EMBEDDING_DIMENSIONS khi chạy (query, Cast...).
+    deconstruct() luôn trả về VectorField(dimensions=768) -> migration không phụ thuộc setting
+    của môi trường chạy makemigrations / migrate.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('dimensions', settings.AI_EMBEDDING_DIMENSIONS)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['dimensions'] = SCHEMA_DIMENSIONS
+        return name, 'pgvector.django.vector.VectorField', args, kwargs